@@ -0,0 +1,267 @@
+"""
+Test obciążeniowy całej aplikacji FastAPI z mieszanym ruchem:
+wyznaczanie tras oraz operacje administracyjne (update-roads, update-flood).
+
+Domyślnie skrypt sam uruchamia serwery zastępcze Overpass i WMS
+(benchmarks.standins) oraz aplikację (uvicorn w wątku), wstrzykując
+adresy usług przez OVERPASS_URL i SENTINELHUB_WMS_URL:
+
+    python -m benchmarks.load --duration 30 --concurrency 16 --upstream-latency-ms 300
+
+Z --target obciążana jest już działająca instancja (np. kontener) –
+wtedy to ona musi mieć ustawione adresy serwerów zastępczych:
+
+    python -m benchmarks.load --target http://127.0.0.1:8000 --mix route=100
+
+UWAGA: update-flood zapisuje data/flood.geojson, tak jak w normalnej pracy aplikacji.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks import standins
+
+logger = logging.getLogger(__name__)
+
+# bbox ruchu testowego: (south, west, north, east)
+DEFAULT_BBOX = (52.20, 20.95, 52.26, 21.05)
+DEFAULT_MIX = "route=90,update-roads=5,update-flood=5"
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in ("route", "update-roads", "update-flood"):
+            raise ValueError(f"Nieznany rodzaj zapytania: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class LoadDriver:
+    """Wysyła zapytania z `concurrency` wątków przez `duration` sekund i zbiera czasy."""
+
+    def __init__(self, base_url: str, bbox, mix: Dict[str, float], seed: int = 0):
+        self.base_url = base_url.rstrip("/")
+        self.bbox = bbox
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _random_point(self, rng: random.Random) -> str:
+        south, west, north, east = self.bbox
+        return f"{rng.uniform(south, north):.6f},{rng.uniform(west, east):.6f}"
+
+    def _bbox_payload(self) -> Dict[str, float]:
+        south, west, north, east = self.bbox
+        return {"south": south, "west": west, "north": north, "east": east}
+
+    def request(self, session: requests.Session, kind: str, rng: random.Random) -> Tuple[int, float]:
+        t0 = time.perf_counter()
+        if kind == "route":
+            resp = session.get(
+                f"{self.base_url}/api/evac/route",
+                params={"start": self._random_point(rng), "end": self._random_point(rng)},
+                timeout=120,
+            )
+        else:
+            resp = session.post(
+                f"{self.base_url}/api/admin/{kind}",
+                json=self._bbox_payload(),
+                timeout=300,
+            )
+        return resp.status_code, time.perf_counter() - t0
+
+    def _worker(self, worker_id: int, deadline: float) -> None:
+        rng = random.Random(self.seed * 1000 + worker_id)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            kind = rng.choices(self.kinds, self.weights)[0]
+            try:
+                status, elapsed = self.request(session, kind, rng)
+            except requests.RequestException as e:
+                logger.warning("%s: %s", kind, e)
+                status, elapsed = 0, 0.0
+            with self._lock:
+                self.statuses[kind][status] += 1
+                if status:
+                    self.latencies[kind].append(elapsed)
+
+    def run(self, duration: float, concurrency: int) -> float:
+        deadline = time.perf_counter() + duration
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(concurrency):
+                pool.submit(self._worker, i, deadline)
+        return time.perf_counter() - t0
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        kinds = {}
+        total = 0
+        for kind in self.kinds:
+            lat = sorted(self.latencies.get(kind, []))
+            count = sum(self.statuses[kind].values())
+            total += count
+            kinds[kind] = {
+                "requests": count,
+                "statuses": {str(k): v for k, v in sorted(self.statuses[kind].items())},
+                "throughput_rps": count / elapsed if elapsed else 0.0,
+                "mean_ms": statistics.fmean(lat) * 1000 if lat else 0.0,
+                "p50_ms": percentile(lat, 0.50) * 1000,
+                "p90_ms": percentile(lat, 0.90) * 1000,
+                "p99_ms": percentile(lat, 0.99) * 1000,
+                "max_ms": lat[-1] * 1000 if lat else 0.0,
+            }
+        return {
+            "elapsed_s": elapsed,
+            "requests": total,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "kinds": kinds,
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port: int):
+    """Uruchamia aplikację (uvicorn) w wątku w tle i czeka na start."""
+    import uvicorn
+
+    # import dopiero tutaj – adresy usług muszą być już w zmiennych środowiskowych
+    from src.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Nie udało się uruchomić aplikacji")
+        time.sleep(0.05)
+    return server, thread
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test obciążeniowy API tras ewakuacji")
+    parser.add_argument("--target", help="adres działającej aplikacji (domyślnie uruchamiana lokalnie)")
+    parser.add_argument("--duration", type=float, default=20.0, help="czas trwania [s]")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="wagi ruchu, np. route=90,update-flood=10")
+    parser.add_argument("--bbox", default=",".join(str(v) for v in DEFAULT_BBOX),
+                        help="south,west,north,east")
+    parser.add_argument("--upstream-latency-ms", type=float, default=200.0,
+                        help="opóźnienie serwerów zastępczych")
+    parser.add_argument("--upstream-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--overpass-replay", type=Path, help="nagrana odpowiedź Overpass (XML)")
+    parser.add_argument("--wms-replay", type=Path, help="nagrana odpowiedź WMS (PNG)")
+    parser.add_argument("--edges", type=int, default=5000, help="wielkość syntetycznej sieci dróg")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="plik JSON z wynikami")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    bbox = tuple(float(v) for v in args.bbox.split(","))
+    mix = parse_mix(args.mix)
+
+    servers = []
+    app_server = None
+    try:
+        if args.target:
+            base_url = args.target
+        else:
+            overpass = standins.overpass_server(
+                latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms,
+                replay=args.overpass_replay, edges=args.edges, seed=args.seed,
+            ).start()
+            wms = standins.wms_server(
+                latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms,
+                replay=args.wms_replay, seed=args.seed,
+            ).start()
+            servers = [overpass, wms]
+
+            os.environ["OVERPASS_URL"] = overpass.url
+            os.environ["SENTINELHUB_WMS_URL"] = wms.url
+            os.environ.setdefault("SENTINELHUB_INSTANCE_ID", "standin")
+
+            port = _free_port()
+            app_server, _ = start_app(port)
+            base_url = f"http://127.0.0.1:{port}"
+
+        driver = LoadDriver(base_url, bbox, mix, seed=args.seed)
+
+        # rozgrzewka: graf dróg i flood muszą istnieć, zanim ruszą trasy
+        with requests.Session() as session:
+            for kind in ("update-roads", "update-flood"):
+                status, elapsed = driver.request(session, kind, random.Random(args.seed))
+                logger.info("Rozgrzewka %s: HTTP %d w %.2f s", kind, status, elapsed)
+                if status != 200:
+                    logger.error("Rozgrzewka nie powiodła się – przerywam")
+                    return 1
+
+        logger.info(
+            "Obciążenie: %d wątków przez %.0f s, mix=%s", args.concurrency, args.duration, mix
+        )
+        elapsed = driver.run(args.duration, args.concurrency)
+        report = driver.report(elapsed)
+        report["config"] = {
+            "target": base_url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": mix,
+            "bbox": bbox,
+            "upstream_latency_ms": None if args.target else args.upstream_latency_ms,
+        }
+    finally:
+        if app_server is not None:
+            app_server.should_exit = True
+        for server in servers:
+            server.stop()
+
+    print(f"\n{'rodzaj':<14}{'zapytań':>9}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  statusy")
+    for kind, row in report["kinds"].items():
+        print(
+            f"{kind:<14}{row['requests']:>9}{row['throughput_rps']:>9.1f}"
+            f"{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+            f"  {row['statuses']}"
+        )
+    print(f"\nrazem: {report['requests']} zapytań, {report['throughput_rps']:.1f} rps")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info("Zapisano wyniki: %s", args.out)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
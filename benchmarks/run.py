@@ -0,0 +1,250 @@
+"""
+Benchmarki głównych etapów przetwarzania na syntetycznych danych.
+
+Przykład:
+    python -m benchmarks.run --scales 10000,100000 --out bench/results.json
+    python -m benchmarks.run --scales 10000 --compare bench/results.json
+
+Mierzone operacje (dla każdego układu sieci i skali):
+    osm_to_roads_geojson   – parsowanie XML z Overpass,
+    build_graph            – RoadGraphBuilder.build_graph (z pliku GeoJSON),
+    mark_blocked_edges     – nałożenie poligonów flood na graf,
+    find_route             – EvacRouter.find_route (losowe pary punktów),
+    mask_to_polygons       – SentinelOGCFloodClient._mask_to_polygons.
+
+Wyniki (mediana i wszystkie powtórzenia w sekundach) zapisywane są jako JSON;
+--compare porównuje je z wcześniejszym plikiem i zgłasza regresje.
+"""
+import argparse
+import gc
+import json
+import logging
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks import synthetic
+from src.core.flood_intersector import mark_blocked_edges
+from src.core.graph_builder import RoadGraphBuilder
+from src.core.osm_to_geojson import osm_to_roads_geojson
+from src.core.router import EvacRouter
+from src.core.sentinel_flood_ogc_client import SentinelOGCConfig, SentinelOGCFloodClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCALES = (10_000, 100_000)
+ROUTE_QUERIES = 20
+# dopuszczalne spowolnienie względem wyników porównawczych
+REGRESSION_THRESHOLD = 1.25
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "runs_s": times,
+        "result": result,
+    }
+
+
+def _mask_side(n_edges: int) -> int:
+    # rozmiar maski po downsamplingu rośnie z obszarem sieci
+    return max(32, min(512, int(math.sqrt(n_edges) / 2)))
+
+
+def bench_layout(layout: str, scale: int, repeat: int, seed: int, workdir: Path) -> List[Dict[str, Any]]:
+    roads = synthetic.roads(layout, scale, seed=seed)
+    bbox = synthetic.roads_bbox(roads)
+    rows: List[Dict[str, Any]] = []
+
+    def record(op: str, timing: Dict[str, Any], **extra: Any) -> None:
+        row = {"layout": layout, "scale": scale, "op": op}
+        row.update(extra)
+        row.update({k: v for k, v in timing.items() if k != "result"})
+        rows.append(row)
+        logger.info("%-7s %8d %-20s %.4f s", layout, scale, op, timing["median_s"])
+
+    # 1. XML z Overpass -> GeoJSON
+    osm_xml = synthetic.roads_to_osm_xml(roads)
+    record(
+        "osm_to_roads_geojson",
+        _timed(lambda: osm_to_roads_geojson(osm_xml), repeat),
+        xml_bytes=len(osm_xml),
+    )
+    del osm_xml
+
+    # 2. Budowa grafu z pliku
+    roads_path = workdir / f"roads-{layout}-{scale}.geojson"
+    roads_path.write_text(json.dumps(roads), encoding="utf-8")
+    timing = _timed(lambda: RoadGraphBuilder(roads_path).build_graph(), repeat)
+    graph = timing["result"]
+    record(
+        "build_graph",
+        timing,
+        nodes=graph.number_of_nodes(),
+        edges=graph.number_of_edges(),
+    )
+
+    # 3. Nałożenie flood (graf modyfikowany w miejscu – każde powtórzenie
+    #    oznacza te same krawędzie, więc wynik jest powtarzalny)
+    flood = synthetic.flood_polygons(bbox, count=20, seed=seed)
+    timing = _timed(lambda: mark_blocked_edges(graph, flood), repeat)
+    record("mark_blocked_edges", timing, polygons=len(flood["features"]), blocked=timing["result"])
+
+    # 4. Wyszukiwanie tras między losowymi węzłami sieci (przy nałożonym
+    #    flood część par leży w odciętych fragmentach – liczba w "found")
+    rng = random.Random(seed)
+    nodes = list(graph.nodes)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(ROUTE_QUERIES)]
+    t0 = time.perf_counter()
+    router = EvacRouter(graph)
+    setup_s = time.perf_counter() - t0
+
+    def run_routes() -> int:
+        found = 0
+        for start, end in pairs:
+            if router.find_route(start, end) is not None:
+                found += 1
+        return found
+
+    timing = _timed(run_routes, repeat)
+    found = timing["result"]
+    # czasy na jedno zapytanie
+    timing = {
+        "median_s": timing["median_s"] / ROUTE_QUERIES,
+        "min_s": timing["min_s"] / ROUTE_QUERIES,
+        "runs_s": [t / ROUTE_QUERIES for t in timing["runs_s"]],
+    }
+    record(
+        "find_route",
+        timing,
+        queries=ROUTE_QUERIES,
+        found=found,
+        router_setup_s=setup_s,
+    )
+    del router, graph
+
+    # 5. Maska wody -> poligony
+    side = _mask_side(scale)
+    mask = synthetic.flood_mask((side, side), seed=seed)
+    client = SentinelOGCFloodClient(
+        SentinelOGCConfig(instance_id="benchmark"),
+        flood_path=workdir / "flood.geojson",
+    )
+    timing = _timed(lambda: client._mask_to_polygons(mask, bbox), repeat)
+    record(
+        "mask_to_polygons",
+        timing,
+        mask_shape=[side, side],
+        water_pixels=int(mask.sum()),
+        polygons=len(timing["result"]),
+    )
+
+    return rows
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: List[Dict[str, Any]], baseline_path: Path, threshold: float) -> List[str]:
+    """Lista opisów regresji (mediana wolniejsza niż threshold x bazowa)."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    base = {(r["layout"], r["scale"], r["op"]): r["median_s"] for r in baseline["results"]}
+
+    regressions = []
+    for row in current:
+        key = (row["layout"], row["scale"], row["op"])
+        old = base.get(key)
+        if not old:
+            continue
+        ratio = row["median_s"] / old
+        line = f"{key[0]:<7} {key[1]:>8} {key[2]:<20} {old:.4f}s -> {row['median_s']:.4f}s (x{ratio:.2f})"
+        print(line)
+        if ratio > threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarki na syntetycznych sieciach dróg")
+    parser.add_argument(
+        "--scales",
+        default=",".join(str(s) for s in DEFAULT_SCALES),
+        help="liczby krawędzi oddzielone przecinkami (np. 10000,100000,1000000)",
+    )
+    parser.add_argument(
+        "--layouts",
+        default=",".join(synthetic.LAYOUTS),
+        help="układy sieci: grid, radial, rural",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="liczba powtórzeń każdej operacji")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="plik JSON z wynikami")
+    parser.add_argument("--compare", type=Path, help="wcześniejszy plik wyników do porównania")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # logi modułów src są zbyt gadatliwe przy pomiarach
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    layouts = [s.strip() for s in args.layouts.split(",") if s.strip()]
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            for layout in layouts:
+                results.extend(bench_layout(layout, scale, args.repeat, args.seed, Path(tmp)))
+
+    report = {
+        "meta": {
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info("Zapisano wyniki: %s", args.out)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\nRegresje (> x{args.threshold:.2f}):")
+            for line in regressions:
+                print("  " + line)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
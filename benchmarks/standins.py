@@ -0,0 +1,270 @@
+"""
+Lokalne serwery zastępcze dla Overpass API i Sentinel Hub WMS.
+
+Pozwalają uruchomić /api/admin/update-roads i /api/admin/update-flood
+bez dostępu do sieci: odpowiedzi są albo odtwarzane z nagranych plików
+(XML / PNG), albo generowane syntetycznie dla zapytanego bboxa.
+Opóźnienie odpowiedzi (latency + losowy jitter) jest konfigurowalne,
+żeby symulować czas odpowiedzi prawdziwych usług.
+
+Samodzielnie:
+    python -m benchmarks.standins --overpass-port 8081 --wms-port 8082 --latency-ms 300
+
+i w aplikacji:
+    OVERPASS_URL=http://127.0.0.1:8081/api/interpreter
+    SENTINELHUB_WMS_URL=http://127.0.0.1:8082/ogc/wms
+    SENTINELHUB_INSTANCE_ID=standin
+"""
+import argparse
+import io
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from PIL import Image
+
+from benchmarks import synthetic
+
+logger = logging.getLogger(__name__)
+
+# ile różnych bboxów trzymamy w pamięci podręcznej odpowiedzi
+RESPONSE_CACHE_SIZE = 16
+
+_BBOX_RE = re.compile(r"\(\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*\)")
+
+BBox = Tuple[float, float, float, float]
+
+
+class _Latency:
+    def __init__(self, latency_ms: float, jitter_ms: float, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self) -> None:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        delay = (self.latency_ms + jitter) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _ResponseCache:
+    """Mała pamięć LRU odpowiedzi po bboxie – generowanie dużych sieci trwa."""
+
+    def __init__(self, build: Callable[[BBox], bytes]):
+        self._build = build
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[BBox, bytes]" = OrderedDict()
+
+    def get(self, bbox: BBox) -> bytes:
+        with self._lock:
+            body = self._items.get(bbox)
+            if body is not None:
+                self._items.move_to_end(bbox)
+                return body
+
+        body = self._build(bbox)
+        with self._lock:
+            self._items[bbox] = body
+            while len(self._items) > RESPONSE_CACHE_SIZE:
+                self._items.popitem(last=False)
+        return body
+
+
+def synthetic_overpass_xml(bbox: BBox, layout: str = "grid", edges: int = 5000, seed: int = 0) -> bytes:
+    """Syntetyczna odpowiedź Overpass (XML) z siecią dróg wypełniającą bbox."""
+    roads = synthetic.fit_to_bbox(synthetic.roads(layout, edges, seed=seed), bbox)
+    return synthetic.roads_to_osm_xml(roads).encode("utf-8")
+
+
+def synthetic_wms_png(width: int, height: int, seed: int = 0) -> bytes:
+    """Syntetyczny obraz WMS: woda na niebiesko (0, 0, 255), reszta przezroczysta."""
+    mask = synthetic.flood_mask((height, width), seed=seed).astype(bool)
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    rgba[mask] = (0, 0, 255, 255)
+    out = io.BytesIO()
+    Image.fromarray(rgba, mode="RGBA").save(out, format="PNG")
+    return out.getvalue()
+
+
+def _make_handler(name: str, respond: Callable[[BaseHTTPRequestHandler, bytes], None]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            respond(self, b"")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            respond(self, self.rfile.read(length) if length else b"")
+
+        def log_message(self, fmt, *args):
+            logger.debug("%s: " + fmt, name, *args)
+
+    return Handler
+
+
+def _send(handler: BaseHTTPRequestHandler, status: int, content_type: str, body: bytes) -> None:
+    handler.send_response(status)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class StandinServer:
+    """Serwer HTTP w wątku w tle; `url` to adres bazowy do wstrzyknięcia w aplikację."""
+
+    def __init__(self, name: str, handler_cls, port: int = 0, path: str = ""):
+        self.name = name
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler_cls)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=name, daemon=True)
+        self.path = path
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}{self.path}"
+
+    def start(self) -> "StandinServer":
+        self._thread.start()
+        logger.info("Serwer zastępczy %s: %s", self.name, self.url)
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def overpass_server(
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    replay: Optional[Path] = None,
+    layout: str = "grid",
+    edges: int = 5000,
+    seed: int = 0,
+) -> StandinServer:
+    """
+    Zastępczy Overpass API (POST /api/interpreter, pole formularza 'data').
+    replay – plik XML odpowiedzi zwracany dla każdego zapytania;
+    bez niego sieć jest generowana dla bboxa z zapytania.
+    """
+    latency = _Latency(latency_ms, jitter_ms, seed)
+    recorded = replay.read_bytes() if replay else None
+    cache = _ResponseCache(lambda bbox: synthetic_overpass_xml(bbox, layout, edges, seed))
+
+    def respond(handler: BaseHTTPRequestHandler, body: bytes) -> None:
+        latency.sleep()
+        if recorded is not None:
+            _send(handler, 200, "application/osm3s+xml", recorded)
+            return
+
+        form = parse_qs(body.decode("utf-8")) if body else parse_qs(urlparse(handler.path).query)
+        match = _BBOX_RE.search((form.get("data") or [""])[0])
+        if match is None:
+            _send(handler, 400, "text/plain", b"Brak bboxa w zapytaniu Overpass")
+            return
+        bbox = tuple(float(v) for v in match.groups())
+        _send(handler, 200, "application/osm3s+xml", cache.get(bbox))
+
+    return StandinServer("overpass", _make_handler("overpass", respond), port, "/api/interpreter")
+
+
+def wms_server(
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    replay: Optional[Path] = None,
+    seed: int = 0,
+) -> StandinServer:
+    """
+    Zastępczy Sentinel Hub OGC WMS (GET /ogc/wms/{instance_id}?REQUEST=GetMap...).
+    replay – plik PNG zwracany dla każdego zapytania; bez niego obraz
+    z plamami wody jest generowany (deterministycznie dla bboxa).
+    """
+    latency = _Latency(latency_ms, jitter_ms, seed)
+    recorded = replay.read_bytes() if replay else None
+
+    def build(key) -> bytes:
+        width, height, bbox_text, time_text = key
+        # różne TIME dają różne obrazy – jak kolejne przeloty satelity
+        return synthetic_wms_png(
+            width, height, seed=seed + zlib.crc32((bbox_text + time_text).encode()) % 1000
+        )
+
+    cache = _ResponseCache(build)
+
+    def respond(handler: BaseHTTPRequestHandler, body: bytes) -> None:
+        latency.sleep()
+        if recorded is not None:
+            _send(handler, 200, "image/png", recorded)
+            return
+
+        params = {k.upper(): v[0] for k, v in parse_qs(urlparse(handler.path).query).items()}
+        if params.get("REQUEST") != "GetMap":
+            _send(handler, 400, "text/plain", b"Obslugiwane jest tylko REQUEST=GetMap")
+            return
+        key = (
+            int(params.get("WIDTH", 512)),
+            int(params.get("HEIGHT", 512)),
+            params.get("BBOX", ""),
+            params.get("TIME", ""),
+        )
+        _send(handler, 200, "image/png", cache.get(key))
+
+    return StandinServer("wms", _make_handler("wms", respond), port, "/ogc/wms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Zastępcze serwery Overpass i Sentinel Hub WMS")
+    parser.add_argument("--overpass-port", type=int, default=8081)
+    parser.add_argument("--wms-port", type=int, default=8082)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--overpass-replay", type=Path, help="nagrana odpowiedź Overpass (XML)")
+    parser.add_argument("--wms-replay", type=Path, help="nagrana odpowiedź WMS (PNG)")
+    parser.add_argument("--layout", default="grid", choices=synthetic.LAYOUTS)
+    parser.add_argument("--edges", type=int, default=5000, help="wielkość syntetycznej sieci dróg")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    overpass = overpass_server(
+        args.overpass_port, args.latency_ms, args.jitter_ms,
+        args.overpass_replay, args.layout, args.edges,
+    ).start()
+    wms = wms_server(args.wms_port, args.latency_ms, args.jitter_ms, args.wms_replay).start()
+
+    print(f"OVERPASS_URL={overpass.url}")
+    print(f"SENTINELHUB_WMS_URL={wms.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        overpass.stop()
+        wms.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Syntetyczne dane do benchmarków: sieci dróg w stylu OSM (GeoJSON / OSM XML)
+oraz warstwy flood (maska 0/1 jak z WMS i poligony).
+
+Wszystkie generatory są deterministyczne dla danego `seed`, więc wyniki
+z różnych rewizji kodu można ze sobą porównywać.
+"""
+import math
+import random
+from typing import Any, Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from shapely.geometry import Point, mapping
+
+# środek obszaru syntetycznych danych (okolice Warszawy)
+ORIGIN_LAT = 52.0
+ORIGIN_LON = 21.0
+
+# metry -> stopnie w okolicy ORIGIN_LAT
+_M_PER_DEG_LAT = 111_320.0
+_M_PER_DEG_LON = 111_320.0 * math.cos(math.radians(ORIGIN_LAT))
+
+LAYOUTS = ("grid", "radial", "rural")
+
+
+def _to_lonlat(x_m: float, y_m: float) -> Tuple[float, float]:
+    return (
+        round(ORIGIN_LON + x_m / _M_PER_DEG_LON, 7),
+        round(ORIGIN_LAT + y_m / _M_PER_DEG_LAT, 7),
+    )
+
+
+def _feature(coords: List[Tuple[float, float]], highway: str) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "properties": {"highway": highway},
+        "geometry": {"type": "LineString", "coordinates": coords},
+    }
+
+
+def _collection(features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"type": "FeatureCollection", "features": features}
+
+
+# ---------------- sieci dróg ----------------
+
+def grid_roads(n_edges: int, spacing_m: float = 100.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Siatka ulic k x k: każdy wiersz i każda kolumna to jedna droga (way)
+    złożona z k-1 odcinków. Węzły są lekko przesunięte, żeby ulice
+    nie były idealnie proste. Liczba krawędzi ≈ n_edges.
+    """
+    rng = random.Random(seed)
+    k = max(2, int(math.sqrt(n_edges / 2)) + 1)
+    jitter = spacing_m * 0.15
+
+    pts = [
+        [
+            _to_lonlat(
+                j * spacing_m + rng.uniform(-jitter, jitter),
+                i * spacing_m + rng.uniform(-jitter, jitter),
+            )
+            for j in range(k)
+        ]
+        for i in range(k)
+    ]
+
+    features = []
+    for i in range(k):
+        highway = "primary" if i % 10 == 0 else "residential"
+        features.append(_feature(pts[i], highway))
+    for j in range(k):
+        highway = "secondary" if j % 10 == 0 else "residential"
+        features.append(_feature([pts[i][j] for i in range(k)], highway))
+    return _collection(features)
+
+
+def radial_roads(n_edges: int, ring_spacing_m: float = 150.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Miasto promieniste: S ulic wylotowych i R obwodnic. Każda obwodnica
+    i każda ulica wylotowa to jedna droga. Liczba krawędzi ≈ 2 * R * S.
+    """
+    rng = random.Random(seed)
+    spokes = max(8, min(256, int(math.sqrt(n_edges / 2))))
+    rings = max(1, n_edges // (2 * spokes))
+
+    pts = []
+    for r in range(1, rings + 1):
+        radius = r * ring_spacing_m
+        row = []
+        for s in range(spokes):
+            angle = 2 * math.pi * s / spokes + rng.uniform(-0.2, 0.2) / spokes
+            row.append(_to_lonlat(radius * math.cos(angle), radius * math.sin(angle)))
+        pts.append(row)
+
+    center = _to_lonlat(0.0, 0.0)
+    features = []
+    for r, row in enumerate(pts):
+        highway = "primary" if r % 8 == 0 else "tertiary"
+        features.append(_feature(row + [row[0]], highway))
+    for s in range(spokes):
+        features.append(_feature([center] + [row[s] for row in pts], "secondary"))
+    return _collection(features)
+
+
+def rural_roads(
+    n_edges: int,
+    segment_m: float = 60.0,
+    chain_edges: int = 400,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Sieć wiejska: długie, kręte łańcuchy dróg (dużo węzłów stopnia 2),
+    każdy odchodzi od losowego punktu wcześniejszego łańcucha – graf
+    jest spójny i prawie drzewiasty.
+    """
+    rng = random.Random(seed)
+    features = []
+    anchors: List[Tuple[float, float]] = [(0.0, 0.0)]
+    remaining = n_edges
+
+    while remaining > 0:
+        length = min(chain_edges, remaining)
+        x, y = rng.choice(anchors)
+        heading = rng.uniform(0, 2 * math.pi)
+
+        xy = [(x, y)]
+        for _ in range(length):
+            heading += rng.uniform(-0.35, 0.35)
+            x += segment_m * math.cos(heading)
+            y += segment_m * math.sin(heading)
+            xy.append((x, y))
+
+        # punkty zaczepienia kolejnych łańcuchów (co ~50 odcinków)
+        anchors.extend(xy[::50][1:])
+        highway = "unclassified" if rng.random() < 0.7 else "track"
+        features.append(_feature([_to_lonlat(px, py) for px, py in xy], highway))
+        remaining -= length
+
+    return _collection(features)
+
+
+def roads(layout: str, n_edges: int, seed: int = 0) -> Dict[str, Any]:
+    if layout == "grid":
+        return grid_roads(n_edges, seed=seed)
+    if layout == "radial":
+        return radial_roads(n_edges, seed=seed)
+    if layout == "rural":
+        return rural_roads(n_edges, seed=seed)
+    raise ValueError(f"Nieznany układ sieci: {layout} (dostępne: {', '.join(LAYOUTS)})")
+
+
+def roads_bbox(geojson: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """BBOX (south, west, north, east) wszystkich dróg."""
+    lons = []
+    lats = []
+    for feature in geojson["features"]:
+        for lon, lat in feature["geometry"]["coordinates"]:
+            lons.append(lon)
+            lats.append(lat)
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def fit_to_bbox(
+    geojson: Dict[str, Any],
+    bbox: Tuple[float, float, float, float],
+) -> Dict[str, Any]:
+    """Przeskalowuje drogi tak, żeby wypełniały bbox (south, west, north, east)."""
+    src_south, src_west, src_north, src_east = roads_bbox(geojson)
+    south, west, north, east = bbox
+    sx = (east - west) / ((src_east - src_west) or 1.0)
+    sy = (north - south) / ((src_north - src_south) or 1.0)
+
+    features = []
+    for feature in geojson["features"]:
+        coords = [
+            (round(west + (lon - src_west) * sx, 7), round(south + (lat - src_south) * sy, 7))
+            for lon, lat in feature["geometry"]["coordinates"]
+        ]
+        features.append(_feature(coords, feature["properties"].get("highway", "road")))
+    return _collection(features)
+
+
+def roads_to_osm_xml(geojson: Dict[str, Any]) -> str:
+    """
+    Zamienia drogi na XML w formacie odpowiedzi Overpass (node + way + tag),
+    jako wejście dla osm_to_roads_geojson.
+    """
+    node_ids: Dict[Tuple[float, float], int] = {}
+    node_lines = []
+    way_lines = []
+
+    for way_id, feature in enumerate(geojson["features"], start=1):
+        refs = []
+        for lon, lat in feature["geometry"]["coordinates"]:
+            key = (lon, lat)
+            nid = node_ids.get(key)
+            if nid is None:
+                nid = len(node_ids) + 1
+                node_ids[key] = nid
+                node_lines.append(f'  <node id="{nid}" lat="{lat}" lon="{lon}"/>')
+            refs.append(f'    <nd ref="{nid}"/>')
+
+        highway = escape(feature["properties"].get("highway", "road"))
+        way_lines.append(f'  <way id="{way_id}">')
+        way_lines.extend(refs)
+        way_lines.append(f'    <tag k="highway" v="{highway}"/>')
+        way_lines.append("  </way>")
+
+    return "\n".join(
+        ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+        + node_lines
+        + way_lines
+        + ["</osm>"]
+    )
+
+
+# ---------------- warstwy flood ----------------
+
+def flood_mask(
+    shape: Tuple[int, int],
+    coverage: float = 0.15,
+    blobs: int = 12,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Maska 0/1 (wiersz 0 = północ, jak obraz z WMS) z kilkoma eliptycznymi
+    plamami wody i odrobiną szumu. coverage – docelowy ułamek pikseli wody.
+    """
+    rng = np.random.default_rng(seed)
+    h, w = shape
+    yy, xx = np.mgrid[0:h, 0:w]
+
+    # promień plam tak, żeby łącznie pokryły ok. coverage obszaru
+    radius = math.sqrt(coverage * h * w / (blobs * math.pi))
+    mask = np.zeros(shape, dtype=bool)
+    for _ in range(blobs):
+        cy, cx = rng.uniform(0, h), rng.uniform(0, w)
+        ry, rx = radius * rng.uniform(0.6, 1.4), radius * rng.uniform(0.6, 1.4)
+        mask |= ((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2 <= 1.0
+
+    # pojedyncze piksele – szum, który klient i tak odfiltruje
+    mask |= rng.random(shape) < 0.002
+    return mask.astype(np.uint8)
+
+
+def flood_polygons(
+    bbox: Tuple[float, float, float, float],
+    count: int = 20,
+    coverage: float = 0.15,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    FeatureCollection z `count` nieregularnymi poligonami zalania
+    w obrębie bbox (south, west, north, east), pokrywającymi ok. coverage bboxa.
+    """
+    rng = random.Random(seed)
+    south, west, north, east = bbox
+    width = east - west
+    height = north - south
+    radius = math.sqrt(coverage * width * height / (count * math.pi))
+
+    features = []
+    for _ in range(count):
+        center = Point(rng.uniform(west, east), rng.uniform(south, north))
+        # buffer + losowe skalowanie osi -> nieregularne elipsy o wielu wierzchołkach
+        blob = center.buffer(radius * rng.uniform(0.5, 1.5), quad_segs=16)
+        coords = [
+            (
+                center.x + (x - center.x) * rng.uniform(0.85, 1.15),
+                center.y + (y - center.y) * rng.uniform(0.85, 1.15),
+            )
+            for x, y in blob.exterior.coords[:-1]
+        ]
+        coords.append(coords[0])
+        features.append({
+            "type": "Feature",
+            "properties": {"source": "synthetic"},
+            "geometry": mapping(type(blob)(coords).buffer(0)),
+        })
+
+    return _collection(features)
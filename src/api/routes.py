@@ -1,16 +1,52 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
-from shapely.geometry import box, mapping
+import asyncio
 import json
+import sys
+from datetime import date
+from urllib.parse import quote
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import APIRouter, Body, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 from pathlib import Path
-from fastapi import HTTPException
-from src.services.evac_service import evac_service_singleton
-from src.core.osm_downloader import download_osm_roads
-from src.core.osm_to_geojson import osm_to_roads_geojson
-from src.core.sentinel_flood_ogc_client import create_default_ogc_client
+from src.core.metrics import StageTimer, stage
+from src.core.single_flight import SingleFlight, bbox_key
+
+# Ciężkie zależności (geopandas, shapely, numpy, networkx, PIL) importowane są
+# dopiero w miejscach użycia, żeby import aplikacji był szybki.
 
 router = APIRouter(tags=["evacuation"])
 
+_SERVICE_MODULE = "src.services.evac_service"
+
+
+def get_evac_service():
+    """Serwis tras; pierwszy import wczytuje zależności geo (bez wczytywania grafu)."""
+    from src.services.evac_service import evac_service_singleton
+    return evac_service_singleton
+
+
+def get_region_registry():
+    from src.services.region_registry import region_registry_singleton
+    return region_registry_singleton
+
+
+def service_for(points):
+    """Serwis regionu zawierającego wszystkie punkty (lat, lon) albo serwis domyślny."""
+    registry = get_region_registry()
+    region_id = registry.find(points)
+    if region_id is None:
+        return get_evac_service()
+    return registry.get(region_id)
+
+
+def is_service_ready() -> bool:
+    """Czy graf dróg jest wczytany – bez wymuszania importu i wczytania."""
+    module = sys.modules.get(_SERVICE_MODULE)
+    service = getattr(module, "evac_service_singleton", None)
+    return service is not None and service.is_ready
+
 
 # ========= pomocnicze: parsowanie lat,lon =========
 
@@ -30,48 +66,460 @@ def parse_latlon(param: str) -> tuple[float, float]:
         )
 
 
+def with_time(scenario: Optional[str], time: Optional[str]) -> Optional[str]:
+    """
+    Parametr time wybiera warstwę serii czasowej flood – wewnętrznie to
+    scenariusz "time:<time>", więc reszta (cache, bitsety) działa bez zmian.
+    """
+    if time is None:
+        return scenario
+    if scenario not in (None, "live"):
+        raise HTTPException(status_code=400, detail="Parametry scenario i time wykluczają się")
+
+    from src.services.evac_service import TIME_SCENARIO_PREFIX
+    return TIME_SCENARIO_PREFIX + time
+
+
+TIME_QUERY_DESCRIPTION = (
+    "Warstwa serii czasowej flood: przedział 'YYYY-MM-DD/YYYY-MM-DD' albo data w nim "
+    "(zob. /api/admin/update-flood-series)"
+)
+
+
 # ========= 1) Wyznaczanie trasy =========
 
 @router.get("/evac/route")
 def get_evac_route(
     start: str = Query(..., description="Punkt startowy w formacie 'lat,lon'"),
     end: str = Query(..., description="Punkt końcowy w formacie 'lat,lon'"),
+    scenario: Optional[str] = Query(
+        None, description="Nazwa scenariusza flood (domyślnie aktualny flood)"
+    ),
+    k: int = Query(1, ge=1, le=5, description="Liczba tras (najkrótsza + alternatywy)"),
+    time: Optional[str] = Query(None, description=TIME_QUERY_DESCRIPTION),
+    encoding: Literal["geojson", "polyline"] = Query(
+        "geojson", description="Kodowanie geometrii: GeoJSON albo encoded polyline"
+    ),
+    precision: Optional[int] = Query(
+        None, ge=1, le=7,
+        description="Liczba miejsc po przecinku współrzędnych (polyline domyślnie 5, GeoJSON pełna)",
+    ),
+    simplify_m: float = Query(
+        0.0, ge=0.0, le=100.0, description="Tolerancja upraszczania Douglas-Peucker [m], 0 = bez"
+    ),
+    profile: Optional[Literal["foot", "car", "emergency"]] = Query(
+        None, description="Profil ruchu – trasa najszybsza zamiast najkrótszej (domyślnie najkrótsza)"
+    ),
+    accept_encoding: Optional[str] = Header(None),
 ):
     """
     Wyznacza trasę ewakuacji między punktami start i end, omijając flood zones.
-    Zwraca GeoJSON linii + metadane.
+    Zwraca GeoJSON linii + metadane. Przy k > 1 dodatkowo "alternatives" –
+    do k-1 tras alternatywnych, wyraźnie różnych od najkrótszej.
+
+    Z profile (foot / car / emergency) trasa minimalizuje czas przejazdu
+    wg klasy drogi i maxspeed, a properties zawierają "duration_s".
+
+    encoding=polyline, precision i simplify_m zmniejszają odpowiedź dla
+    klientów na słabym łączu; przy Accept-Encoding: gzip większe
+    odpowiedzi są kompresowane.
     """
+    from src.services.evac_service import UnknownScenario
+
     start_lat, start_lon = parse_latlon(start)
     end_lat, end_lon = parse_latlon(end)
+    scenario = with_time(scenario, time)
 
-    result = evac_service_singleton.get_route((start_lat, start_lon), (end_lat, end_lon))
+    service = service_for([(start_lat, start_lon), (end_lat, end_lon)])
+
+    timer = StageTimer()
+    try:
+        with timer:
+            result = service.get_route(
+                (start_lat, start_lon), (end_lat, end_lon), scenario=scenario, k=k, profile=profile
+            )
+    except UnknownScenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nie ma scenariusza flood '{scenario}'"
+        )
 
     if result is None:
+        # etykiety składowych są już policzone – to tylko odczyt z tablicy
         raise HTTPException(
             status_code=404,
-            detail="Nie udało się znaleźć trasy między zadanymi punktami"
+            detail={
+                "message": "Nie udało się znaleźć trasy między zadanymi punktami",
+                "start_component": service.locate_component(
+                    (start_lat, start_lon), scenario=scenario
+                ),
+                "end_component": service.locate_component(
+                    (end_lat, end_lon), scenario=scenario
+                ),
+            },
         )
 
     route_line, meta = result
 
-    geojson_feature = {
-        "type": "Feature",
-        "geometry": route_line.__geo_interface__,
-        "properties": {
-            "length_m": meta["length_m"],
-            "segments": meta["segments"],
+    with timer, stage("serialization"):
+        response = _route_response(
+            route_line, meta, scenario, k,
+            encoding=encoding, precision=precision, simplify_m=simplify_m,
+        )
+        # etapy zmierzone do tej pory (bez samej serializacji)
+        response["meta"]["timings_ms"] = {
+            name: round(ms, 3) for name, ms in timer.stages_ms.items()
+        }
+        body = json.dumps(response).encode("utf-8")
+        body, response_headers = _compress(body, accept_encoding)
+
+    response_headers["Server-Timing"] = timer.server_timing()
+    return Response(content=body, media_type="application/json", headers=response_headers)
+
+
+# mniejszych odpowiedzi nie opłaca się kompresować
+GZIP_MIN_BYTES = 1024
+
+
+def _compress(body: bytes, accept_encoding: Optional[str]):
+    """Kompresuje ciało gzipem, jeśli klient to akceptuje i ciało jest duże."""
+    headers = {"Vary": "Accept-Encoding"}
+    accepted = {
+        part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")
+    }
+    if len(body) < GZIP_MIN_BYTES or "gzip" not in accepted:
+        return body, headers
+
+    import gzip
+
+    headers["Content-Encoding"] = "gzip"
+    return gzip.compress(body, compresslevel=6), headers
+
+
+def _route_feature(
+    line, meta: Dict[str, Any], encoding: str, precision: Optional[int], simplify_m: float
+) -> Dict[str, Any]:
+    properties = {
+        "length_m": meta["length_m"],
+        "segments": meta["segments"],
+    }
+    if "duration_s" in meta:
+        properties["duration_s"] = meta["duration_s"]
+    if encoding == "geojson" and precision is None and not simplify_m:
+        return {
+            "type": "Feature",
+            "geometry": line.__geo_interface__,
+            "properties": properties,
+        }
+
+    from src.core.route_encoding import (
+        DEFAULT_PRECISION,
+        encode_polyline,
+        line_latlon,
+        simplify_line,
+    )
+
+    line = simplify_line(line, simplify_m)
+    if encoding == "polyline":
+        return {
+            "polyline": encode_polyline(line_latlon(line), precision or DEFAULT_PRECISION),
+            "properties": properties,
+        }
+
+    geometry = line.__geo_interface__
+    if precision is not None:
+        geometry = {
+            "type": geometry["type"],
+            "coordinates": [
+                [round(x, precision), round(y, precision)] for x, y in geometry["coordinates"]
+            ],
+        }
+    return {"type": "Feature", "geometry": geometry, "properties": properties}
+
+
+def _route_response(
+    route_line,
+    meta: Dict[str, Any],
+    scenario: Optional[str],
+    k: int,
+    encoding: str = "geojson",
+    precision: Optional[int] = None,
+    simplify_m: float = 0.0,
+) -> Dict[str, Any]:
+    response = {
+        "route": _route_feature(route_line, meta, encoding, precision, simplify_m),
+        "meta": {
+            "calc_time_ms": meta["calc_time_ms"],
+            "blocked_edges_count": meta["blocked_edges_count"],
+            "scenario": scenario or "live",
         },
     }
+    if "profile" in meta:
+        response["meta"]["profile"] = meta["profile"]
+    if encoding == "polyline":
+        from src.core.route_encoding import DEFAULT_PRECISION
+
+        response["meta"]["encoding"] = {
+            "format": "polyline",
+            "precision": precision or DEFAULT_PRECISION,
+        }
+    if simplify_m:
+        response["meta"]["simplify_m"] = simplify_m
+
+    if k > 1:
+        response["alternatives"] = [
+            _route_feature(alt_line, alt_meta, encoding, precision, simplify_m)
+            for alt_line, alt_meta in meta["alternatives"]
+        ]
+
+    return response
+
+
+# ========= 1a) Subskrypcja trasy (SSE) =========
+
+# co ile sekund komentarz podtrzymujący połączenie, gdy nie ma zdarzeń
+SSE_KEEPALIVE_S = 15.0
+
+
+_route_watcher_wired = False
+
+
+def get_route_watcher():
+    """Watcher subskrypcji tras; zamyka subskrypcje regionów zwalnianych z pamięci."""
+    global _route_watcher_wired
+    from src.services.route_watch import route_watcher_singleton
+
+    if not _route_watcher_wired:
+        get_region_registry().add_evict_listener(route_watcher_singleton.drop_service)
+        _route_watcher_wired = True
+    return route_watcher_singleton
+
+
+@router.get("/evac/route/subscribe")
+async def subscribe_evac_route(
+    start: str = Query(..., description="Punkt startowy w formacie 'lat,lon'"),
+    end: str = Query(..., description="Punkt końcowy w formacie 'lat,lon'"),
+):
+    """
+    Server-Sent Events z trasą ewakuacji: pierwsze zdarzenie od razu, kolejne
+    tylko wtedy, gdy zmiana flood zablokuje krawędź tej trasy (albo odblokuje
+    drogę, gdy trasy nie było). Zdarzenie `route` ma trasę jako GeoJSON
+    Feature (lub null) i powód przeliczenia w polu "reason". Zdarzenie
+    `closed` (region trasy zwolniony z pamięci) kończy strumień – klient
+    może zasubskrybować trasę ponownie.
+    """
+    start_point = parse_latlon(start)
+    end_point = parse_latlon(end)
+
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+    def notify(event: Dict[str, Any]) -> None:
+        # wołane z wątku przeliczeń – do kolejki pętli zdarzeń
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, event)
+        except RuntimeError:
+            pass  # pętla zamknięta
+
+    watcher = get_route_watcher()
+
+    def subscribe():
+        service = service_for([start_point, end_point])
+        return watcher.subscribe(service, start_point, end_point, notify)
+
+    try:
+        subscription = await run_in_threadpool(subscribe)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "closed":
+                    break
+        finally:
+            watcher.unsubscribe(subscription.sub_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ========= 1b) Trasa do najbliższego schronu =========
+
+@router.get("/evac/nearest-shelter")
+def get_nearest_shelter_route(
+    start: str = Query(..., description="Punkt startowy w formacie 'lat,lon'"),
+    scenario: Optional[str] = Query(
+        None, description="Nazwa scenariusza flood (domyślnie aktualny flood)"
+    ),
+):
+    """
+    Wyznacza trasę z punktu start do najbliższego osiągalnego schronu.
+    Korzysta z drzewa najkrótszych ścieżek liczonego raz na generację
+    grafu i flood – samo zapytanie to tylko przejście po drzewie.
+    """
+    from src.services.evac_service import UnknownScenario
+
+    start_lat, start_lon = parse_latlon(start)
+
+    try:
+        result = service_for([(start_lat, start_lon)]).route_to_nearest_shelter(
+            (start_lat, start_lon), scenario=scenario
+        )
+    except UnknownScenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nie ma scenariusza flood '{scenario}'"
+        )
+
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Brak schronu osiągalnego z zadanego punktu"
+        )
+
+    route_line, meta = result
 
     return {
-        "route": geojson_feature,
+        "route": {
+            "type": "Feature",
+            "geometry": route_line.__geo_interface__,
+            "properties": {
+                "length_m": meta["length_m"],
+                "segments": meta["segments"],
+                "shelter": meta["shelter"],
+            },
+        },
         "meta": {
             "calc_time_ms": meta["calc_time_ms"],
             "blocked_edges_count": meta["blocked_edges_count"],
+            "scenario": scenario or "live",
         },
     }
 
 
+# ========= 1c) Trasy wsadowe / macierz odległości =========
+
+class BatchRouteRequest(BaseModel):
+    origins: list[tuple[float, float]]
+    destinations: list[tuple[float, float]]
+    mode: Literal["matrix", "routes"] = "matrix"
+    scenario: Optional[str] = None
+    stream: bool = False
+
+
+@router.post("/evac/batch")
+def post_evac_batch(req: BatchRouteRequest):
+    """
+    Trasy lub macierz odległości [m] dla wszystkich par origin × destination
+    (punkty jako [lat, lon]). null w macierzy = brak trasy.
+
+    stream=true zwraca NDJSON: pierwsza linia to nagłówek, a potem po jednej
+    linii na każdy origin – cała macierz nie jest trzymana w pamięci.
+    """
+    from src.services.evac_service import UnknownScenario
+
+    try:
+        rows = service_for(req.origins + req.destinations).batch_routes(
+            req.origins,
+            req.destinations,
+            scenario=req.scenario,
+            with_geometry=req.mode == "routes",
+        )
+    except UnknownScenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nie ma scenariusza flood '{req.scenario}'"
+        )
+
+    header = {
+        "mode": req.mode,
+        "origins": len(req.origins),
+        "destinations": len(req.destinations),
+        "scenario": req.scenario or "live",
+    }
+
+    if req.stream:
+        def ndjson():
+            yield json.dumps(header) + "\n"
+            for row in rows:
+                yield json.dumps(row) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    rows = list(rows)
+    key = "routes" if req.mode == "routes" else "lengths"
+    return {**header, req.mode: [row[key] for row in rows]}
+
+
+# ========= 1d) Zasięg w budżecie odległości (izochrona) =========
+
+@router.get("/evac/reachable")
+def get_reachable(
+    start: str = Query(..., description="Punkt startowy w formacie 'lat,lon'"),
+    max_m: float = Query(..., gt=0, le=100_000, description="Budżet odległości [m]"),
+    output: Literal["edges", "hull"] = Query("edges", description="Krawędzie albo otoczka"),
+    scenario: Optional[str] = Query(
+        None, description="Nazwa scenariusza flood (domyślnie aktualny flood)"
+    ),
+):
+    """
+    Obszar osiągalny z punktu start w max_m metrów przy aktualnym flood.
+
+    Zwraca strumieniowany GeoJSON FeatureCollection (krawędzie albo jeden
+    poligon otoczki). Liczba rozliczonych węzłów (koszt przeszukiwania)
+    jest w nagłówku X-Settled-Nodes i w polu "meta".
+    """
+    from src.services.evac_service import UnknownScenario
+
+    start_lat, start_lon = parse_latlon(start)
+    service = service_for([(start_lat, start_lon)])
+
+    try:
+        if output == "hull":
+            hull, meta = service.reachable_hull(
+                (start_lat, start_lon), max_m, scenario=scenario
+            )
+            features = iter(
+                [{"type": "Feature", "geometry": hull.__geo_interface__, "properties": {}}]
+                if hull is not None else []
+            )
+        else:
+            edges, meta = service.reachable_edges(
+                (start_lat, start_lon), max_m, scenario=scenario
+            )
+            features = (
+                {"type": "Feature", "geometry": geom.__geo_interface__, "properties": {"eid": eid}}
+                for eid, geom in edges
+            )
+    except UnknownScenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nie ma scenariusza flood '{scenario}'"
+        )
+
+    def geojson_stream():
+        yield '{"type": "FeatureCollection", "features": ['
+        for i, feature in enumerate(features):
+            yield ("," if i else "") + json.dumps(feature)
+        yield '], "meta": ' + json.dumps(meta) + "}"
+
+    return StreamingResponse(
+        geojson_stream(),
+        media_type="application/geo+json",
+        headers={"X-Settled-Nodes": str(meta["settled_nodes"])},
+    )
+
+
 # ========= 2) Admin – update dróg (Overpass) =========
 
 class BBOX(BaseModel):
@@ -79,20 +527,34 @@ class BBOX(BaseModel):
     west: float
     north: float
     east: float
+    region: Optional[str] = None
 
 
 @router.post("/admin/update-roads")
 async def update_roads(bbox: BBOX):
     """
     Pobiera nowe dane drogowe z Overpass API i przeładowuje graf w pamięci.
+    Z polem "region" drogi trafiają do osobnego regionu (graf domyślny
+    zostaje bez zmian); trasy w obrębie bboxa regionu liczone są na jego grafie.
     """
+    from src.core.osm_downloader import download_osm_roads
+    from src.core.osm_to_geojson import osm_to_roads_geojson
+
     osm_xml = download_osm_roads(
         (bbox.south, bbox.west, bbox.north, bbox.east)
     )
 
     geojson = osm_to_roads_geojson(osm_xml)
 
-    evac_service_singleton.reload_graph(geojson)
+    if bbox.region:
+        try:
+            get_region_registry().put(
+                bbox.region, (bbox.south, bbox.west, bbox.north, bbox.east), geojson
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        get_evac_service().reload_graph(geojson)
 
     return {
         "status": "OK",
@@ -106,6 +568,8 @@ def set_test_flood_rect(bbox: BBOX):
     Zapisuje testowy, średniej wielkości prostokąt jako flood zones
     (1 poligon) w środku aktualnego BBOX.
     """
+    from shapely.geometry import box, mapping
+
     # “Średni” prostokąt: zostawiamy margines 25% z każdej strony
     dx = (bbox.east - bbox.west) * 0.25
     dy = (bbox.north - bbox.south) * 0.25
@@ -128,20 +592,37 @@ def set_test_flood_rect(bbox: BBOX):
         ],
     }
 
-    out = Path("data/flood.geojson")
+    # plik, z którego serwis czyta flood (w testach – katalog tymczasowy)
+    service = get_evac_service()
+    out = Path(service.flood_path)
     out.parent.mkdir(parents=True, exist_ok=True)
     out.write_text(json.dumps(fc, ensure_ascii=False), encoding="utf-8")
 
-    return {"status": "OK", "polygons": 1, "bbox": bbox}
+    diff = service.refresh_flood()
+    get_region_registry().refresh_flood()
+
+    return {
+        "status": "OK",
+        "polygons": 1,
+        "bbox": bbox,
+        "flipped_edges": diff.flipped if diff else 0,
+    }
 
 # ========= 3) Admin – update flood (Sentinel Hub OGC) =========
 
 _sentinel_flood_client = None
 
+# aktualizacje flood w toku – ten sam bbox (i przedziały) pobierany jest raz,
+# równoległe identyczne wywołania dostają ten sam wynik
+_flood_updates = SingleFlight("flood")
+_flood_series_updates = SingleFlight("flood_series")
+
 
 def get_sentinel_client():
     global _sentinel_flood_client
     if _sentinel_flood_client is None:
+        from src.core.sentinel_flood_ogc_client import create_default_ogc_client
+
         _sentinel_flood_client = create_default_ogc_client()
     return _sentinel_flood_client
 
@@ -159,10 +640,19 @@ def update_flood(bbox: BBOX):
         # Brak INSTANCE_ID – ładny komunikat dla użytkownika
         raise HTTPException(status_code=500, detail=str(e))
 
+    bounds = (bbox.south, bbox.west, bbox.north, bbox.east)
+
+    def update():
+        count = client.update_flood_for_bbox(bounds)
+        # przelicza tylko krawędzie w okolicy zmienionych poligonów; wczytane
+        # regiony od razu, żeby ich subskrybenci dostali zmianę bez czekania
+        # na zapytanie do regionu
+        diff = get_evac_service().refresh_flood()
+        get_region_registry().refresh_flood()
+        return count, diff.flipped if diff else 0
+
     try:
-        count = client.update_flood_for_bbox(
-            (bbox.south, bbox.west, bbox.north, bbox.east)
-        )
+        (count, flipped), coalesced = _flood_updates.do(bbox_key(bounds), update)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -173,9 +663,187 @@ def update_flood(bbox: BBOX):
         "status": "OK",
         "polygons": count,
         "bbox": bbox,
+        "flipped_edges": flipped,
+        "coalesced": coalesced,
     }
 
 
+# ========= 3b) Admin – seria czasowa flood =========
+
+# górna granica liczby warstw w jednej serii (każda to osobne zapytanie WMS)
+MAX_SERIES_SLICES = 52
+
+
+class FloodSeriesRequest(BBOX):
+    times: Optional[List[str]] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    step_days: int = 7
+
+
+@router.post("/admin/update-flood-series")
+def update_flood_series(req: FloodSeriesRequest):
+    """
+    Pobiera serię map zalania dla kolejnych przedziałów czasu (równolegle)
+    i zapisuje maski jako upakowany bitowo stos (memmap) na wspólnej
+    siatce bboxa. Przedziały: lista `times` albo `start`/`end`/`step_days`.
+    Warstwę wybiera potem parametr `time` tras i blocked-edges.
+    """
+    from src.core.flood_series import time_slices
+    from src.services.evac_service import FLOOD_SERIES_DIR
+
+    if req.times:
+        times = req.times
+    elif req.start and req.end:
+        try:
+            times = time_slices(req.start, req.end, req.step_days)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        raise HTTPException(status_code=400, detail="Podaj times albo start i end")
+    if len(times) > MAX_SERIES_SLICES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Za dużo warstw: {len(times)} (maksymalnie {MAX_SERIES_SLICES})",
+        )
+
+    try:
+        client = get_sentinel_client()
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    bounds = (req.south, req.west, req.north, req.east)
+
+    def update():
+        series = client.fetch_time_series(bounds, times, FLOOD_SERIES_DIR)
+        # bitsety warstw liczone od razu – zapytania z time tylko je wybierają
+        get_evac_service().warm_flood_series()
+        return series
+
+    try:
+        series, coalesced = _flood_series_updates.do((bbox_key(bounds), tuple(times)), update)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Nie udało się pobrać serii flood z Sentinel Hub: {e}",
+        )
+
+    return {"status": "OK", **series.summary(), "coalesced": coalesced}
+
+
+@router.get("/admin/flood-series")
+def get_flood_series():
+    series = get_evac_service().flood_series()
+    if series is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Brak serii flood – najpierw wywołaj /api/admin/update-flood-series",
+        )
+    return series.summary()
+
+
+# ========= 4) Admin – schrony =========
+
+class Shelter(BaseModel):
+    name: str
+    lat: float
+    lon: float
+
+
+@router.get("/admin/shelters")
+def list_shelters():
+    return {"shelters": get_evac_service().shelters}
+
+
+@router.put("/admin/shelters")
+def put_shelters(shelters: list[Shelter]):
+    """
+    Podmienia listę schronów używaną przez /evac/nearest-shelter.
+    """
+    items = [sh.model_dump() for sh in shelters]
+    get_evac_service().set_shelters(items)
+    get_region_registry().set_shelters(items)
+    return {"status": "OK", "shelters": len(shelters)}
+
+
+# ========= 4b) Admin – regiony =========
+
+@router.get("/admin/regions")
+def list_regions():
+    """Regiony (osobne grafy dróg) – wczytane i zwolnione do zrzutów na dysku."""
+    registry = get_region_registry()
+    return {
+        "regions": registry.summaries(),
+        "loaded_mb": round(registry.loaded_bytes / 2**20, 2),
+        "budget_mb": round(registry.memory_budget_bytes / 2**20, 2),
+    }
+
+
+@router.delete("/admin/regions/{region_id}")
+def delete_region(region_id: str):
+    if not get_region_registry().delete(region_id):
+        raise HTTPException(status_code=404, detail=f"Nie ma regionu '{region_id}'")
+    return {"status": "OK", "region": region_id}
+
+
+# ========= 4c) Admin – pamięć =========
+
+@router.get("/admin/memory")
+def get_memory():
+    """
+    Szacowana pamięć grafu (networkx, geometrie krawędzi, GraphIndex –
+    bajty łącznie, na węzeł i na krawędź), flood i cache'y oraz RSS procesu.
+    Przy EVAC_TRACEMALLOC=1 także ostatnie diffy tracemalloc wokół
+    wczytania grafu i aktualizacji flood.
+    """
+    from src.core.memory_report import TRACEMALLOC, trace_diffs
+
+    report = get_evac_service().memory_report()
+    report["regions_estimated_bytes"] = get_region_registry().loaded_bytes
+    report["tracemalloc"] = {"enabled": TRACEMALLOC, "diffs": trace_diffs()}
+    return report
+
+
+# ========= 5) Admin – scenariusze flood ("what-if") =========
+
+@router.get("/admin/scenarios")
+def list_scenarios():
+    """Lista scenariuszy flood trzymanych w pamięci."""
+    return {"scenarios": get_evac_service().list_scenarios()}
+
+
+@router.put("/admin/scenarios/{name}")
+def put_scenario(
+    name: str,
+    flood: Dict[str, Any] = Body(..., description="GeoJSON FeatureCollection z poligonami zalania"),
+):
+    """
+    Tworzy lub podmienia scenariusz flood. Żywy graf nie jest modyfikowany –
+    scenariusz to osobny bitset zablokowanych krawędzi.
+    """
+    if flood.get("type") != "FeatureCollection":
+        raise HTTPException(status_code=422, detail="Oczekiwano GeoJSON FeatureCollection")
+
+    try:
+        sc = get_evac_service().set_scenario(name, flood)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "status": "OK",
+        "scenario": sc.name,
+        "blocked_edges_count": sc.blocked.count(),
+        "bytes": sc.blocked.nbytes,
+    }
+
+
+@router.delete("/admin/scenarios/{name}")
+def delete_scenario(name: str):
+    if not get_evac_service().delete_scenario(name):
+        raise HTTPException(status_code=404, detail=f"Nie ma scenariusza flood '{name}'")
+    return {"status": "OK", "scenario": name}
+
+
 @router.get("/debug/flood-geojson")
 def get_flood_geojson():
     path = Path("data/flood.geojson")
@@ -184,4 +852,126 @@ def get_flood_geojson():
             status_code=404,
             detail="Brak pliku flood.geojson – najpierw wywołaj /api/admin/update-flood"
         )
-    return json.loads(path.read_text(encoding="utf-8"))
\ No newline at end of file
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def parse_bbox(param: str) -> tuple[float, float, float, float]:
+    """Parsuje string 'south,west,north,east' na krotkę."""
+    try:
+        south, west, north, east = (float(v.strip()) for v in param.split(","))
+    except Exception:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Nieprawidłowy bbox: {param}. Oczekiwano 'south,west,north,east'"
+        )
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail=f"Pusty bbox: {param}")
+    return south, west, north, east
+
+
+@router.get("/debug/blocked-edges")
+def get_blocked_edges(
+    scenario: Optional[str] = Query(
+        None, description="Nazwa scenariusza flood (domyślnie aktualny flood)"
+    ),
+    bbox: Optional[str] = Query(
+        None, description="Tylko krawędzie w 'south,west,north,east'"
+    ),
+    format: Literal["geojson", "binary"] = Query(
+        "geojson", description="geojson albo zwięzły format binarny (src/core/blocked_export.py)"
+    ),
+    time: Optional[str] = Query(None, description=TIME_QUERY_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Zablokowane krawędzie grafu jako GeoJSON FeatureCollection (warstwa
+    debug na mapie). Ciało jest serializowane raz na stan flood; ETag
+    zmienia się razem z generacją grafu / flood, więc klient z aktualną
+    kopią dostaje 304 bez ciała.
+    """
+    from src.services.evac_service import UnknownScenario
+
+    scenario = with_time(scenario, time)
+    box = parse_bbox(bbox) if bbox is not None else None
+    if box is not None:
+        south, west, north, east = box
+        service = service_for([(south, west), (north, east)])
+    else:
+        service = get_evac_service()
+
+    try:
+        graph_index, export, key = service.blocked_edges_export(scenario)
+    except UnknownScenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nie ma scenariusza flood '{scenario}'"
+        )
+
+    graph_generation, name, generation = key
+    name = quote(name, safe="")
+    # id serwisu odróżnia regiony i restart procesu (generacje liczone są od nowa)
+    etag = f'W/"{id(service):x}-{graph_generation}-{name}-{generation}-{format}'
+    if box is not None:
+        etag += "-" + ",".join(f"{v:.6f}" for v in box)
+    etag += '"'
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    if box is None:
+        body = export.geojson if format == "geojson" else export.binary
+    else:
+        positions = export.select(graph_index, box)
+        body = (
+            export.geojson_subset(positions) if format == "geojson"
+            else export.binary_subset(positions)
+        )
+
+    media_type = "application/geo+json" if format == "geojson" else "application/octet-stream"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+# ========= Kafle wektorowe =========
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}")
+def get_tile(
+    layer: Literal["roads", "flood", "blocked"],
+    z: int,
+    x: int,
+    y: int,
+    scenario: Optional[str] = Query(
+        None, description="Nazwa scenariusza flood (domyślnie aktualny flood)"
+    ),
+    time: Optional[str] = Query(None, description=TIME_QUERY_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Kafel XYZ warstwy roads / flood / blocked jako GeoJSON FeatureCollection,
+    przycięty do kafla i uproszczony dla zoomu. Kafle są cache'owane per
+    generacja grafu / flood; ETag zmienia się razem z nią.
+    """
+    from src.core.tiles import is_valid_tile, tile_bounds
+    from src.services.evac_service import UnknownScenario
+
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail=f"Nieprawidłowy kafel {z}/{x}/{y}")
+    scenario = with_time(scenario, time)
+
+    west, south, east, north = tile_bounds(z, x, y)
+    service = service_for([(south, west), (north, east)])
+
+    try:
+        body, key = service.tile(layer, z, x, y, scenario=scenario)
+    except UnknownScenario:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nie ma scenariusza flood '{scenario}'"
+        )
+
+    # id serwisu odróżnia regiony i restart procesu (generacje liczone są od nowa)
+    etag = 'W/"%x-%s"' % (id(service), "-".join(quote(str(v), safe="") for v in key + (z, x, y)))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/geo+json", headers=headers)
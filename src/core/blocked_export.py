@@ -0,0 +1,129 @@
+"""
+Eksport zablokowanych krawędzi (GeoJSON / format binarny) dla jednego
+stanu flood – budowany raz na generację i serwowany z pamięci.
+
+Format binarny (little-endian), zwięzły odpowiednik GeoJSON:
+
+    magic     4 B       b"EVBE"
+    version   uint16    BINARY_VERSION
+    reserved  uint16    0
+    count     uint32    liczba krawędzi n
+    eids      uint32[n]                od bajtu HEADER_SIZE (12)
+    offsets   uint32[n + 1]  – krawędź i ma wierzchołki coords[offsets[i]:offsets[i + 1]]
+    coords    float32[offsets[n], 2]  – (lon, lat)
+
+Nagłówek ma 12 B, więc każda tablica zaczyna się na granicy 4 bajtów –
+w przeglądarce można ją czytać bez kopiowania, np.
+new Uint32Array(buf, 12, n) i new Float32Array(buf, 12 + 8 * n + 4, 2 * m),
+gdzie m = offsets[n].
+"""
+import struct
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, box
+
+from .edge_bitset import EdgeBitset
+from .graph_index import GraphIndex
+
+BINARY_MAGIC = b"EVBE"
+# 2: nagłówek wyrównany do 4 B (pole reserved)
+BINARY_VERSION = 2
+BINARY_HEADER = struct.Struct("<4sHHI")
+HEADER_SIZE = BINARY_HEADER.size
+
+
+@dataclass
+class BlockedEdgesExport:
+    """
+    Zablokowane krawędzie jednego stanu flood.
+
+    eids      – posortowane eid zablokowanych krawędzi,
+    features  – gotowe fragmenty JSON (Feature) w kolejności eids,
+    geojson   – pełne ciało odpowiedzi GeoJSON,
+    binary    – pełne ciało w formacie binarnym.
+    """
+    eids: np.ndarray
+    features: List[str]
+    coords: np.ndarray
+    offsets: np.ndarray
+    geojson: bytes
+    binary: bytes
+
+    def select(self, graph_index: GraphIndex, bbox: Tuple[float, float, float, float]) -> np.ndarray:
+        """
+        Pozycje (w eids) krawędzi w bboxie (south, west, north, east) –
+        kandydaci z STRtree krawędzi, bez przechodzenia po wszystkich.
+        """
+        south, west, north, east = bbox
+        in_bbox = graph_index.query_eids([box(west, south, east, north)])
+        return np.flatnonzero(np.isin(self.eids, in_bbox, assume_unique=True))
+
+    def geojson_subset(self, positions: np.ndarray) -> bytes:
+        return _feature_collection([self.features[i] for i in positions.tolist()])
+
+    def binary_subset(self, positions: np.ndarray) -> bytes:
+        starts = self.offsets[positions]
+        ends = self.offsets[positions + 1]
+        parts = [self.coords[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+        return _pack_binary(self.eids[positions], parts)
+
+
+def _feature_collection(features: List[str]) -> bytes:
+    return ('{"type":"FeatureCollection","features":[' + ",".join(features) + "]}").encode("utf-8")
+
+
+def _pack_binary(eids: np.ndarray, parts: List[np.ndarray]) -> bytes:
+    counts = np.fromiter((len(p) for p in parts), dtype=np.uint32, count=len(parts))
+    offsets = np.zeros(len(parts) + 1, dtype=np.uint32)
+    np.cumsum(counts, out=offsets[1:])
+    coords = (
+        np.concatenate(parts).astype("<f4")
+        if parts else np.zeros((0, 2), dtype="<f4")
+    )
+    return b"".join([
+        BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(parts)),
+        np.asarray(eids, dtype="<u4").tobytes(),
+        offsets.astype("<u4").tobytes(),
+        coords.tobytes(),
+    ])
+
+
+def build_blocked_export(graph_index: GraphIndex, blocked: Optional[EdgeBitset]) -> BlockedEdgesExport:
+    """Serializuje zablokowane krawędzie raz – kolejne zapytania tylko kopiują bajty."""
+    eids = (
+        np.flatnonzero(blocked.to_mask()) if blocked is not None
+        else np.zeros(0, dtype=np.int64)
+    )
+
+    geoms = []
+    for eid in eids.tolist():
+        geom = graph_index.edge_geoms[eid]
+        if geom is None:
+            u, v = graph_index.edges[eid]
+            geom = LineString([(u[1], u[0]), (v[1], v[0])])
+        geoms.append(geom)
+
+    geometry_json = shapely.to_geojson(np.asarray(geoms, dtype=object)).tolist() if geoms else []
+    features = [
+        '{"type":"Feature","geometry":%s,"properties":{"eid":%d,"length_m":%.2f}}'
+        % (g, eid, graph_index.edge_length[eid])
+        for g, eid in zip(geometry_json, eids.tolist())
+    ]
+
+    parts = [shapely.get_coordinates(g) for g in geoms]
+    counts = np.fromiter((len(p) for p in parts), dtype=np.int64, count=len(parts))
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    coords = np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.float64)
+
+    return BlockedEdgesExport(
+        eids=eids,
+        features=features,
+        coords=coords,
+        offsets=offsets,
+        geojson=_feature_collection(features),
+        binary=_pack_binary(eids, parts),
+    )
@@ -0,0 +1,68 @@
+from typing import Iterable, Iterator
+
+import numpy as np
+
+
+class EdgeBitset:
+    """
+    Zbiór zablokowanych krawędzi zapisany jako 1 bit na krawędź (po eid).
+
+    Sprawdzenie pojedynczej krawędzi to jedna operacja na bajcie, więc
+    bitset może zastąpić atrybut 'blocked' w trakcie wyszukiwania trasy,
+    bez modyfikowania współdzielonego grafu.
+    """
+
+    __slots__ = ("size", "_bits")
+
+    def __init__(self, size: int, bits: bytearray | None = None):
+        self.size = size
+        self._bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "EdgeBitset":
+        mask = np.asarray(mask, dtype=bool)
+        packed = np.packbits(mask, bitorder="little")
+        return cls(len(mask), bytearray(packed.tobytes()))
+
+    @classmethod
+    def from_eids(cls, size: int, eids: Iterable[int]) -> "EdgeBitset":
+        bitset = cls(size)
+        for eid in eids:
+            bitset.set(eid, True)
+        return bitset
+
+    def is_set(self, eid: int) -> bool:
+        return bool(self._bits[eid >> 3] >> (eid & 7) & 1)
+
+    __contains__ = is_set
+
+    def set(self, eid: int, value: bool) -> None:
+        if value:
+            self._bits[eid >> 3] |= 1 << (eid & 7)
+        else:
+            self._bits[eid >> 3] &= ~(1 << (eid & 7)) & 0xFF
+
+    def to_mask(self) -> np.ndarray:
+        packed = np.frombuffer(bytes(self._bits), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.size, bitorder="little").astype(bool)
+
+    def count(self) -> int:
+        return int(np.unpackbits(np.frombuffer(bytes(self._bits), dtype=np.uint8)).sum())
+
+    def iter_set(self) -> Iterator[int]:
+        return iter(np.flatnonzero(self.to_mask()).tolist())
+
+    def union(self, other: "EdgeBitset") -> "EdgeBitset":
+        """Nowy bitset z krawędziami zablokowanymi w self lub w other."""
+        bits = np.bitwise_or(
+            np.frombuffer(bytes(self._bits), dtype=np.uint8),
+            np.frombuffer(bytes(other._bits), dtype=np.uint8),
+        )
+        return EdgeBitset(self.size, bytearray(bits.tobytes()))
+
+    def copy(self) -> "EdgeBitset":
+        return EdgeBitset(self.size, bytearray(self._bits))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
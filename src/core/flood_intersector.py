@@ -1,25 +1,36 @@
 import logging
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Union, List, Tuple
 
 import geopandas as gpd
+import numpy as np
 from shapely.geometry.base import BaseGeometry
 from shapely.geometry import shape
 
+from .edge_bitset import EdgeBitset
+from .metrics import stage
+
 logger = logging.getLogger(__name__)
 
 
 def _load_flood_gdf(
-    flood_source: Optional[Union[str, Path, gpd.GeoDataFrame]] = None
+    flood_source: Optional[Union[str, Path, gpd.GeoDataFrame, dict]] = None
 ) -> gpd.GeoDataFrame:
     """
     Ładuje strefy zalania jako GeoDataFrame.
 
     - jeśli flood_source to GeoDataFrame -> zwraca ją bez zmian (po drobnej normalizacji),
+    - jeśli flood_source to dict (GeoJSON FeatureCollection) -> buduje z niego GeoDataFrame,
     - jeśli flood_source to ścieżka lub None -> czyta 'data/flood.geojson' (domyślnie).
     """
     if isinstance(flood_source, gpd.GeoDataFrame):
         gdf = flood_source.copy()
+    elif isinstance(flood_source, dict):
+        features = flood_source.get("features", [])
+        if not features:
+            return gpd.GeoDataFrame(geometry=[])
+        gdf = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
     else:
         if flood_source is None:
             flood_source = Path("data/flood.geojson")
@@ -62,6 +73,77 @@ def _load_flood_gdf(
     return gdf
 
 
+def _flood_sindex(gdf: gpd.GeoDataFrame):
+    try:
+        return gdf.sindex
+    except Exception as e:
+        logger.warning(
+            "Nie udało się utworzyć spatial index dla flood polygons: %s", e
+        )
+        return None
+
+
+def _is_edge_flooded(
+    geom: Optional[BaseGeometry],
+    gdf: gpd.GeoDataFrame,
+    sindex,
+    min_overlap_ratio: float,
+) -> bool:
+    """
+    Sprawdza, czy pojedyncza krawędź biegnie przez wodę na tyle długo,
+    żeby uznać ją za zalaną (patrz min_overlap_ratio w mark_blocked_edges).
+    """
+    if geom is None:
+        return False
+    if geom.is_empty:
+        return False
+
+    # Odrzucamy bardzo krótkie odcinki
+    if geom.length == 0:
+        return False
+
+    candidate_idxs = None
+    if sindex is not None:
+        try:
+            candidate_idxs = list(
+                sindex.intersection(geom.bounds)
+            )
+        except Exception:
+            candidate_idxs = None
+
+    if not candidate_idxs:
+        return False
+
+    max_ratio = 0.0
+    for idx in candidate_idxs:
+        poly = gdf.geometry.iloc[idx]
+        if poly is None or poly.is_empty:
+            continue
+
+        inter = geom.intersection(poly)
+        if inter.is_empty:
+            continue
+
+        try:
+            inter_length = inter.length
+        except Exception:
+
+            continue
+
+        if inter_length <= 0:
+            continue
+
+        ratio = inter_length / geom.length
+        if ratio > max_ratio:
+            max_ratio = ratio
+
+
+        if max_ratio >= min_overlap_ratio:
+            break
+
+    return max_ratio >= min_overlap_ratio
+
+
 def mark_blocked_edges(
     graph,
     flood: Optional[Union[str, Path, gpd.GeoDataFrame]] = None,
@@ -103,72 +185,168 @@ def mark_blocked_edges(
         return 0
 
 
-    try:
-        sindex = gdf.sindex
-    except Exception as e:
-        logger.warning(
-            "Nie udało się utworzyć spatial index dla flood polygons: %s", e
-        )
-        sindex = None
+    sindex = _flood_sindex(gdf)
 
     blocked_count = 0
 
     # Iterujemy po krawędziach i patrzymy tylko na poligony, które mają
     # przecinające się bounding boxy 
     for u, v, data in graph.edges(data=True):
-        geom: Optional[BaseGeometry] = data.get("geometry")
-        if geom is None:
-            continue
-        if geom.is_empty:
-            continue
+        if _is_edge_flooded(data.get("geometry"), gdf, sindex, min_overlap_ratio):
+            data["blocked"] = True
+            blocked_count += 1
 
-        # Odrzucamy bardzo krótkie odcinki
-        if geom.length == 0:
-            continue
+    logger.info("Zablokowano %d krawędzi grafu.", blocked_count)
+    return blocked_count
 
-        candidate_idxs = None
-        if sindex is not None:
-            try:
-                candidate_idxs = list(
-                    sindex.intersection(geom.bounds)
-                )
-            except Exception:
-                candidate_idxs = None
 
-        if not candidate_idxs:
+@dataclass
+class FloodDiff:
+    """
+    Wynik przyrostowej aktualizacji blokad (update_blocked_edges).
 
-            continue
+    newly_blocked / newly_unblocked to eid krawędzi, które zmieniły stan –
+    tylko je muszą unieważnić cache i indeksy routingu.
+    """
+    flood: gpd.GeoDataFrame
+    changed_polygons: int = 0
+    changed_bounds: Optional[Tuple[float, float, float, float]] = None
+    evaluated_edges: int = 0
+    newly_blocked: List[int] = field(default_factory=list)
+    newly_unblocked: List[int] = field(default_factory=list)
 
-        max_ratio = 0.0
-        for idx in candidate_idxs:
-            poly = gdf.geometry.iloc[idx]
-            if poly is None or poly.is_empty:
-                continue
+    @property
+    def flipped(self) -> int:
+        return len(self.newly_blocked) + len(self.newly_unblocked)
 
-            inter = geom.intersection(poly)
-            if inter.is_empty:
-                continue
 
-            try:
-                inter_length = inter.length
-            except Exception:
+def _geometry_keys(gdf: Optional[gpd.GeoDataFrame]) -> dict:
+    """WKB geometrii -> geometria; do porównywania dwóch warstw flood."""
+    if gdf is None or gdf.empty or "geometry" not in gdf:
+        return {}
+    return {geom.wkb: geom for geom in gdf.geometry if geom is not None}
 
-                continue
 
-            if inter_length <= 0:
+def update_blocked_edges(
+    graph,
+    edge_index,
+    old_flood: Optional[gpd.GeoDataFrame],
+    new_flood: Optional[Union[str, Path, gpd.GeoDataFrame]] = None,
+    min_overlap_ratio: float = 0.2,
+) -> FloodDiff:
+    """
+    Przyrostowa wersja mark_blocked_edges.
+
+    Porównuje starą i nową warstwę flood poligon po poligonie i ponownie
+    sprawdza tylko te krawędzie, których bounding box przecina poligon
+    dodany albo usunięty. Stan pozostałych krawędzi nie może się zmienić,
+    bo zależy wyłącznie od poligonów nachodzących na ich bounding box.
+
+    Parametry:
+    ----------
+    graph : networkx.Graph
+        Graf dróg z atrybutem 'blocked' ustawionym względem old_flood.
+    edge_index : GraphIndex
+        Indeks krawędzi tego grafu (eid + STRtree geometrii).
+    old_flood : GeoDataFrame / None
+        Warstwa nałożona poprzednio. None -> sprawdzamy wszystkie krawędzie.
+    new_flood : None / ścieżka / GeoDataFrame
+        Nowa warstwa, jak w mark_blocked_edges.
+
+    Zwraca:
+    -------
+    FloodDiff
+        Zmienione krawędzie oraz wczytaną nową warstwę (do kolejnego diffu).
+    """
+    with stage("flood_load"):
+        gdf = _load_flood_gdf(new_flood)
+    diff = FloodDiff(flood=gdf)
+
+    with stage("edge_marking"):
+        if old_flood is None:
+            candidate_eids = range(edge_index.edge_count)
+        else:
+            old_keys = _geometry_keys(old_flood)
+            new_keys = _geometry_keys(gdf)
+            changed = [
+                geom for key, geom in old_keys.items() if key not in new_keys
+            ] + [
+                geom for key, geom in new_keys.items() if key not in old_keys
+            ]
+            diff.changed_polygons = len(changed)
+
+            if not changed:
+                logger.info("Warstwa flood bez zmian – nie sprawdzam krawędzi.")
+                return diff
+
+            minx = min(g.bounds[0] for g in changed)
+            miny = min(g.bounds[1] for g in changed)
+            maxx = max(g.bounds[2] for g in changed)
+            maxy = max(g.bounds[3] for g in changed)
+            diff.changed_bounds = (minx, miny, maxx, maxy)
+
+            candidate_eids = edge_index.query_eids(changed).tolist()
+
+        has_flood = not gdf.empty and "geometry" in gdf
+        sindex = _flood_sindex(gdf) if has_flood else None
+
+        for eid in candidate_eids:
+            data = edge_index.edge_data(eid)
+            diff.evaluated_edges += 1
+
+            was_blocked = bool(data.get("blocked", False))
+            is_blocked = has_flood and _is_edge_flooded(
+                data.get("geometry"), gdf, sindex, min_overlap_ratio
+            )
+
+            if is_blocked == was_blocked:
                 continue
 
-            ratio = inter_length / geom.length
-            if ratio > max_ratio:
-                max_ratio = ratio
+            data["blocked"] = is_blocked
+            if is_blocked:
+                diff.newly_blocked.append(eid)
+            else:
+                diff.newly_unblocked.append(eid)
+
+    logger.info(
+        "Przyrostowa aktualizacja flood: %d zmienionych poligonów, "
+        "sprawdzono %d z %d krawędzi, zmieniono stan %d (+%d / -%d).",
+        diff.changed_polygons,
+        diff.evaluated_edges,
+        edge_index.edge_count,
+        diff.flipped,
+        len(diff.newly_blocked),
+        len(diff.newly_unblocked),
+    )
+    return diff
+
+
+def compute_blocked_bitset(
+    edge_index,
+    flood: Optional[Union[str, Path, gpd.GeoDataFrame]] = None,
+    min_overlap_ratio: float = 0.2,
+) -> EdgeBitset:
+    """
+    Liczy zablokowane krawędzie dla podanej warstwy flood, ale zamiast
+    ustawiać atrybut 'blocked' w grafie zwraca bitset po eid.
 
+    Graf pozostaje nietknięty, więc wiele takich bitsetów (scenariuszy
+    "what-if") może współistnieć nad jednym grafem dróg.
+    """
+    with stage("flood_load"):
+        gdf = _load_flood_gdf(flood)
+    mask = np.zeros(edge_index.edge_count, dtype=bool)
 
-            if max_ratio >= min_overlap_ratio:
-                break
+    if gdf.empty or "geometry" not in gdf:
+        return EdgeBitset.from_mask(mask)
 
-        if max_ratio >= min_overlap_ratio:
-            data["blocked"] = True
-            blocked_count += 1
+    with stage("edge_marking"):
+        sindex = _flood_sindex(gdf)
 
-    logger.info("Zablokowano %d krawędzi grafu.", blocked_count)
-    return blocked_count
+        # sprawdzamy tylko krawędzie, które w ogóle leżą w zasięgu poligonów
+        for eid in edge_index.query_eids(list(gdf.geometry)).tolist():
+            mask[eid] = _is_edge_flooded(
+                edge_index.edge_geoms[eid], gdf, sindex, min_overlap_ratio
+            )
+
+        return EdgeBitset.from_mask(mask)
@@ -0,0 +1,212 @@
+"""
+Szereg czasowy masek wody (kilka dat Sentinel) na wspólnej siatce.
+
+Na dysku (katalog serii):
+
+    series.json   – bbox (south, west, north, east), kształt maski (h, w)
+                    i lista przedziałów czasu (etykiety jak parametr TIME WMS),
+    masks.bin     – maski upakowane bitowo: uint8 (T, h, ceil(w / 8)),
+                    bit j bajtu k wiersza i = komórka (i, 8k + j); wiersz 0 = north.
+
+Wszystkie warstwy mają ten sam bbox i rozdzielczość, więc georeferencja
+jest jedna. masks.bin czytany jest przez np.memmap – wybór warstwy
+dotyka tylko jej stron pliku, bez wczytywania całego stosu.
+"""
+import json
+import shutil
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+BBox = Tuple[float, float, float, float]
+
+META_FILE = "series.json"
+MASKS_FILE = "masks.bin"
+
+
+def time_slices(start: date, end: date, step_days: int) -> List[str]:
+    """Kolejne przedziały 'YYYY-MM-DD/YYYY-MM-DD' po step_days dni."""
+    if step_days <= 0:
+        raise ValueError("step_days musi być dodatnie")
+    slices = []
+    current = start
+    while current <= end:
+        last = min(current + timedelta(days=step_days - 1), end)
+        slices.append(f"{current.isoformat()}/{last.isoformat()}")
+        current = last + timedelta(days=1)
+    return slices
+
+
+def _parse_window(label: str) -> Tuple[date, date]:
+    first, _, last = label.partition("/")
+    return date.fromisoformat(first[:10]), date.fromisoformat((last or first)[:10])
+
+
+class FloodSeries:
+    """Stos masek wody (T, h, w) zmapowany z pliku, z jedną georeferencją."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        meta = json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        self.bbox: BBox = tuple(meta["bbox"])
+        self.shape: Tuple[int, int] = tuple(meta["shape"])
+        self.times: List[str] = list(meta["times"])
+        self.generation: int = int(meta.get("generation", 1))
+
+        h, w = self.shape
+        self._masks = np.memmap(
+            self.path / MASKS_FILE, dtype=np.uint8, mode="r",
+            shape=(len(self.times), h, (w + 7) // 8),
+        )
+
+    @classmethod
+    def create(
+        cls,
+        path: Union[str, Path],
+        bbox: BBox,
+        shape: Tuple[int, int],
+        times: Sequence[str],
+        generation: int = 1,
+    ) -> np.memmap:
+        """
+        Zakłada pusty stos na dysku i zwraca memmap do zapisu warstw
+        (write_mask). Serię otwiera się potem przez FloodSeries(path).
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        h, w = shape
+        masks = np.memmap(
+            path / MASKS_FILE, dtype=np.uint8, mode="w+",
+            shape=(len(times), h, (w + 7) // 8),
+        )
+        (path / META_FILE).write_text(json.dumps({
+            "bbox": list(bbox),
+            "shape": [h, w],
+            "times": list(times),
+            "generation": generation,
+        }), encoding="utf-8")
+        return masks
+
+    @staticmethod
+    def write_mask(masks: np.memmap, index: int, mask: np.ndarray) -> None:
+        masks[index] = np.packbits(mask.astype(bool), axis=-1, bitorder="little")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return self._masks.nbytes
+
+    def mask(self, index: int) -> np.ndarray:
+        """Maska bool (h, w) warstwy index – rozpakowana tylko ta warstwa."""
+        return np.unpackbits(
+            self._masks[index], axis=-1, count=self.shape[1], bitorder="little"
+        ).astype(bool)
+
+    def index_of(self, time: str) -> int:
+        """
+        Numer warstwy dla etykiety przedziału albo daty 'YYYY-MM-DD'
+        mieszczącej się w przedziale. KeyError, jeśli brak.
+        """
+        if time in self.times:
+            return self.times.index(time)
+        try:
+            day = date.fromisoformat(time[:10])
+        except ValueError:
+            raise KeyError(time)
+        for i, label in enumerate(self.times):
+            first, last = _parse_window(label)
+            if first <= day <= last:
+                return i
+        raise KeyError(time)
+
+    def summary(self) -> dict:
+        return {
+            "bbox": list(self.bbox),
+            "shape": list(self.shape),
+            "times": self.times,
+            "generation": self.generation,
+            "bytes": self.nbytes,
+        }
+
+
+# ---- katalog serii: każda wersja osobno, "current" wskazuje najnowszą ----
+# (nowa seria nie nadpisuje pliku, który ktoś może mieć zmapowany)
+
+CURRENT_FILE = "current"
+KEEP_VERSIONS = 2
+
+
+# przełączanie "current" w obrębie procesu – per katalog serii
+_publish_locks: Dict[Path, threading.Lock] = {}
+_publish_locks_guard = threading.Lock()
+
+
+def _version_generations(base_dir: Path) -> List[int]:
+    return sorted(int(p.name) for p in base_dir.iterdir() if p.is_dir() and p.name.isdigit())
+
+
+def new_version_dir(base_dir: Union[str, Path]) -> Tuple[Path, int]:
+    """
+    Zakłada katalog na kolejną wersję serii i zwraca go z numerem (generacja).
+    Katalog tworzony jest atomowo (mkdir bez exist_ok), więc równoległe
+    pobrania serii – także z innych procesów – nigdy nie dostaną tego samego.
+    """
+    base_dir = Path(base_dir)
+    base_dir.mkdir(parents=True, exist_ok=True)
+    current = open_series(base_dir)
+    generation = max(
+        [current.generation if current is not None else 0] + _version_generations(base_dir)
+    ) + 1
+    while True:
+        version_dir = base_dir / f"{generation:06d}"
+        try:
+            version_dir.mkdir()
+        except FileExistsError:
+            generation += 1
+            continue
+        return version_dir, generation
+
+
+def discard_version(version_dir: Path) -> None:
+    """Usuwa nieopublikowaną wersję serii (np. po nieudanym pobieraniu)."""
+    shutil.rmtree(version_dir, ignore_errors=True)
+
+
+def publish_version(base_dir: Union[str, Path], version_dir: Path) -> bool:
+    """
+    Przełącza "current" na version_dir i usuwa najstarsze wersje.
+    Generacje tylko rosną: jeśli w międzyczasie opublikowano nowszą wersję
+    (równoległe pobranie), "current" zostaje bez zmian i zwracane jest False.
+    """
+    base_dir = Path(base_dir)
+    with _publish_locks_guard:
+        lock = _publish_locks.setdefault(base_dir.resolve(), threading.Lock())
+
+    with lock:
+        current = open_series(base_dir)
+        if current is not None and current.generation >= int(version_dir.name):
+            return False
+
+        tmp = base_dir / (CURRENT_FILE + ".tmp")
+        tmp.write_text(version_dir.name, encoding="utf-8")
+        tmp.replace(base_dir / CURRENT_FILE)
+
+        # wersje nowsze od opublikowanej mogą być jeszcze zapisywane – zostają
+        published = int(version_dir.name)
+        older = [g for g in _version_generations(base_dir) if g <= published]
+        for generation in older[:-KEEP_VERSIONS]:
+            shutil.rmtree(base_dir / f"{generation:06d}", ignore_errors=True)
+    return True
+
+
+def open_series(base_dir: Union[str, Path]) -> Optional[FloodSeries]:
+    """Aktualna seria z katalogu albo None, jeśli jeszcze jej nie pobrano."""
+    pointer = Path(base_dir) / CURRENT_FILE
+    if not pointer.exists():
+        return None
+    return FloodSeries(Path(base_dir) / pointer.read_text(encoding="utf-8").strip())
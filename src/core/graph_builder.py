@@ -1,22 +1,43 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 import json
 import networkx as nx
 from shapely.geometry import LineString, shape
 
+from .profiles import parse_maxspeed
 from .utils import haversine_distance_m
 
 
-def _add_linestring_to_graph(G: nx.Graph, line: LineString) -> None:
+def _road_attrs(properties: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Atrybuty drogi potrzebne profilom ruchu: highway i maxspeed [km/h]
+    (tylko te, które są w tagach – pozostałe tagi OSM nie trafiają do grafu).
+    """
+    attrs: Dict[str, Any] = {}
+    if not properties:
+        return attrs
+    if properties.get("highway"):
+        attrs["highway"] = str(properties["highway"])
+    maxspeed = parse_maxspeed(properties.get("maxspeed"))
+    if maxspeed is not None:
+        attrs["maxspeed"] = maxspeed
+    return attrs
+
+
+def _add_linestring_to_graph(
+    G: nx.Graph, line: LineString, properties: Optional[Dict[str, Any]] = None
+) -> None:
     """
     Dodaje do grafu kolejne odcinki z LineStringa.
     Węzły są identyfikowane przez współrzędne (lat, lon),
-    krawędzie mają długość w metrach i geometrię shapely.
+    krawędzie mają długość w metrach, geometrię shapely
+    i klasę drogi (highway, maxspeed) z properties.
     """
     coords = list(line.coords)
     if len(coords) < 2:
         return
+    attrs = _road_attrs(properties)
 
     for i in range(len(coords) - 1):
         lon1, lat1 = coords[i]      
@@ -40,6 +61,7 @@ def _add_linestring_to_graph(G: nx.Graph, line: LineString) -> None:
             length_m=length_m,
             geometry=segment,
             blocked=False,
+            **attrs,
         )
 
 
@@ -70,12 +92,13 @@ class RoadGraphBuilder:
                 continue
 
             geom = shape(geom_dict)
+            properties = feature.get("properties")
 
             if isinstance(geom, LineString):
-                _add_linestring_to_graph(G, geom)
+                _add_linestring_to_graph(G, geom, properties)
             elif geom.geom_type == "MultiLineString":
                 for line in geom.geoms:
-                    _add_linestring_to_graph(G, line)
+                    _add_linestring_to_graph(G, line, properties)
 
         return G
 
@@ -100,11 +123,125 @@ class RoadGraphBuilderWithDict:
                 continue
 
             geom = shape(geom_dict)
+            properties = feature.get("properties")
 
             if isinstance(geom, LineString):
-                _add_linestring_to_graph(G, geom)
+                _add_linestring_to_graph(G, geom, properties)
             elif geom.geom_type == "MultiLineString":
                 for line in geom.geoms:
-                    _add_linestring_to_graph(G, line)
+                    _add_linestring_to_graph(G, line, properties)
 
         return G
+
+
+def contract_degree2_chains(G: nx.Graph) -> nx.Graph:
+    """
+    Zwraca nowy graf, w którym łańcuchy węzłów stopnia 2 (punkty pośrednie
+    drogi bez skrzyżowań) są ściągnięte do pojedynczych krawędzi.
+
+    Ściągnięta krawędź ma zsumowaną długość, sklejoną geometrię (w kolejności
+    od pierwszego do ostatniego węzła łańcucha) i blocked=True, jeśli którykolwiek
+    odcinek był zablokowany. Łańcuchy, które dałyby pętlę albo drugą krawędź
+    między tymi samymi węzłami, są dzielone w środkowym węźle (nx.Graph nie ma
+    multikrawędzi).
+    """
+    H = nx.Graph()
+    H.add_nodes_from(G.nodes(data=True))
+
+    visited = set()
+    # ściągnięte łańcuchy po parze końców – do ponownego podziału
+    contracted: Dict[frozenset, List] = {}
+
+    def road_class(u, v):
+        data = G.edges[u, v]
+        return data.get("highway"), data.get("maxspeed")
+
+    def walk(start, first):
+        """
+        Idzie od węzła start przez first aż do węzła stopnia != 2
+        albo do zmiany klasy drogi (inna prędkość dla profili ruchu).
+        """
+        chain = [start, first]
+        while G.degree(chain[-1]) == 2 and chain[-1] != start:
+            nxt = [n for n in G.neighbors(chain[-1]) if n != chain[-2]]
+            if not nxt or road_class(chain[-1], nxt[0]) != road_class(chain[-2], chain[-1]):
+                break
+            chain.append(nxt[0])
+        return chain
+
+    def add_chain(chain):
+        edges = list(zip(chain, chain[1:]))
+        for u, v in edges:
+            visited.add(frozenset((u, v)))
+
+        if len(chain) == 2:
+            u, v = chain
+            earlier = contracted.pop(frozenset((u, v)), None)
+            if earlier is not None:
+                # ściągnięty wcześniej łańcuch między tymi samymi węzłami –
+                # zostawiamy jego węzeł środkowy, zamiast nadpisać krawędź
+                H.remove_edge(u, v)
+                mid = len(earlier) // 2
+                add_chain(earlier[:mid + 1])
+                add_chain(earlier[mid:])
+            H.add_edge(u, v, **G.edges[u, v])
+            return
+
+        a, b = chain[0], chain[-1]
+        if a == b:
+            # pętla – zostawiamy dwa węzły pośrednie, żeby nie powstały
+            # dwie krawędzie między tą samą parą węzłów
+            n = len(edges)
+            i, j = max(1, n // 3), max(2, 2 * n // 3)
+            add_chain(chain[:i + 1])
+            add_chain(chain[i:j + 1])
+            add_chain(chain[j:])
+            return
+        if H.has_edge(a, b):
+            # druga droga między tymi samymi węzłami – zostawiamy węzeł środkowy
+            mid = len(chain) // 2
+            add_chain(chain[:mid + 1])
+            add_chain(chain[mid:])
+            return
+
+        coords = []
+        length_m = 0.0
+        blocked = False
+        for u, v in edges:
+            data = G.edges[u, v]
+            length_m += data.get("length_m", 0.0)
+            blocked = blocked or data.get("blocked", False)
+
+            geom = data.get("geometry")
+            seg = list(geom.coords) if geom is not None else [(u[1], u[0]), (v[1], v[0])]
+            if seg[0] != (u[1], u[0]):
+                seg.reverse()
+            coords.extend(seg if not coords else seg[1:])
+
+        first = G.edges[edges[0]]
+        contracted[frozenset((a, b))] = chain
+        H.add_edge(
+            a,
+            b,
+            length_m=length_m,
+            geometry=LineString(coords),
+            blocked=blocked,
+            **{key: first[key] for key in ("highway", "maxspeed") if key in first},
+        )
+
+    for node in G.nodes:
+        if G.degree(node) == 2:
+            continue
+        for nbr in G.neighbors(node):
+            if frozenset((node, nbr)) in visited:
+                continue
+            add_chain(walk(node, nbr))
+
+    # izolowane cykle złożone wyłącznie z węzłów stopnia 2
+    for u, v in G.edges:
+        if frozenset((u, v)) not in visited:
+            add_chain(walk(u, v))
+
+    # węzły pośrednie, które zniknęły ze wszystkich krawędzi, usuwamy
+    H.remove_nodes_from([n for n in list(H.nodes) if H.degree(n) == 0 and G.degree(n) > 0])
+    return H
@@ -0,0 +1,285 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Any, Optional
+
+import numpy as np
+import networkx as nx
+import shapely
+from shapely.strtree import STRtree
+from shapely.geometry import LineString, box
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import substring
+
+from .edge_bitset import EdgeBitset
+from .profiles import PROFILES, edge_weights
+
+
+@dataclass
+class EdgeSnap:
+    """
+    Punkt dociągnięty do krawędzi ("wirtualny węzeł").
+
+    offset_m – odległość [m] wzdłuż krawędzi od jej węzła u,
+    point    – rzut punktu na krawędź jako (lat, lon).
+    """
+    eid: int
+    offset_m: float
+    point: Tuple[float, float]
+    distance_deg: float
+
+
+def scaled_line(geom: BaseGeometry) -> Tuple[float, BaseGeometry]:
+    """
+    Geometria w układzie (lon * cos(lat), lat) i użyta skala – ułamki długości
+    liczone w tym układzie odpowiadają ułamkom długości w metrach.
+    """
+    lat0 = (geom.bounds[1] + geom.bounds[3]) / 2
+    scale = float(np.cos(np.radians(lat0)))
+    return scale, shapely.transform(geom, lambda xy: xy * [scale, 1.0])
+
+
+def line_substring(
+    geom: BaseGeometry, length: float, forward: bool, start_m: float, end_m: float
+) -> LineString:
+    """
+    Fragment geometrii krawędzi o długości length [m] między start_m a end_m
+    metrów od węzła u (forward: czy geometria biegnie od u do v).
+    Wynik zawsze biegnie w stronę od u do v.
+    """
+    scale, scaled = scaled_line(geom)
+    if length <= 0:
+        return shapely.transform(scaled, lambda xy: xy / [scale, 1.0])
+
+    a = min(max(start_m / length, 0.0), 1.0)
+    b = min(max(end_m / length, 0.0), 1.0)
+
+    if forward:
+        piece = substring(scaled, a, b, normalized=True)
+    else:
+        piece = shapely.reverse(substring(scaled, 1.0 - b, 1.0 - a, normalized=True))
+
+    return shapely.transform(piece, lambda xy: xy / [scale, 1.0])
+
+
+class GraphIndex:
+    """
+    Indeks grafu dróg w postaci zwartych tablic.
+
+    Każdy węzeł dostaje numer (node id), a każda krawędź stały numer 'eid'
+    (zapisywany też jako atrybut krawędzi w grafie). Indeks trzyma:
+    - listy sąsiedztwa po numerach węzłów (do szybkich przeszukiwań),
+    - długości krawędzi i wagi profili ruchu (czas przejazdu [s] pieszo /
+      samochodem / pojazdem ratunkowym) – tablice obok siebie po eid,
+    - STRtree geometrii krawędzi – do szybkiego znajdowania krawędzi
+      leżących w zadanym obszarze zamiast przechodzenia po całym grafie.
+    """
+
+    def __init__(self, graph: nx.Graph):
+        self.graph = graph
+
+        self.nodes: List[Any] = list(graph.nodes)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+
+        # węzły identyfikowane są przez (lat, lon)
+        coords = np.array(self.nodes, dtype=np.float64).reshape(-1, 2)
+        self.node_lat = coords[:, 0]
+        self.node_lon = coords[:, 1]
+
+        self.edges: List[Tuple[Any, Any]] = []
+        self.edge_geoms: List[BaseGeometry] = []
+        self.edge_length: List[float] = []
+        # czy geometria krawędzi biegnie od u do v (w grafie nieskierowanym
+        # kolejność (u, v) z graph.edges nie musi zgadzać się z geometrią)
+        self.edge_forward: List[bool] = []
+        self.adj: List[List[Tuple[int, int]]] = [[] for _ in self.nodes]
+        highways: List[Optional[str]] = []
+        maxspeeds: List[Optional[float]] = []
+
+        for u, v, data in graph.edges(data=True):
+            eid = len(self.edges)
+            data["eid"] = eid
+            self.edges.append((u, v))
+            self.edge_geoms.append(data.get("geometry"))
+            self.edge_length.append(float(data.get("length_m", 0.0)))
+            highways.append(data.get("highway"))
+            maxspeeds.append(data.get("maxspeed"))
+            geom = data.get("geometry")
+            self.edge_forward.append(
+                geom is None or tuple(geom.coords[0]) == (u[1], u[0])
+            )
+
+            ui = self.node_ids[u]
+            vi = self.node_ids[v]
+            self.adj[ui].append((vi, eid))
+            self.adj[vi].append((ui, eid))
+
+        # wagi profili (listy – w pętli Dijkstry szybsze niż numpy) i krawędzie,
+        # którymi profil nie może jechać (do dociągania punktów)
+        self.profile_weights: Dict[str, List[float]] = {
+            profile: edge_weights(profile, self.edge_length, highways, maxspeeds)
+            for profile in PROFILES
+        }
+        self.profile_forbidden: Dict[str, EdgeBitset] = {
+            profile: EdgeBitset.from_mask(np.isinf(np.asarray(weights, dtype=np.float64)))
+            for profile, weights in self.profile_weights.items()
+        }
+
+        # STRtree nie przyjmuje None – krawędzie bez geometrii pomijamy,
+        # a numery w drzewie mapujemy z powrotem na eid
+        self._tree_eids = np.array(
+            [eid for eid, geom in enumerate(self.edge_geoms) if geom is not None],
+            dtype=np.int64,
+        )
+        self._tree = STRtree([self.edge_geoms[eid] for eid in self._tree_eids])
+
+        # STRtree węzłów budujemy dopiero przy pierwszym dociąganiu punktu
+        self._nodes_tree = None
+        self._lon_scale = 1.0
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edges)
+
+    def edge_data(self, eid: int) -> dict:
+        u, v = self.edges[eid]
+        return self.graph.edges[u, v]
+
+    def edge_nodes(self, eid: int) -> Tuple[int, int]:
+        """Numery węzłów (u, v) krawędzi."""
+        u, v = self.edges[eid]
+        return self.node_ids[u], self.node_ids[v]
+
+    def _edge_geom(self, eid: int) -> BaseGeometry:
+        geom = self.edge_geoms[eid]
+        if geom is None:
+            u, v = self.edges[eid]
+            geom = LineString([(u[1], u[0]), (v[1], v[0])])
+        return geom
+
+    def _scaled_edge(self, eid: int) -> Tuple[float, BaseGeometry]:
+        """Geometria krawędzi w układzie (lon * cos(lat), lat) – patrz scaled_line."""
+        return scaled_line(self._edge_geom(eid))
+
+    def edge_substring(self, eid: int, start_m: float, end_m: float) -> LineString:
+        """
+        Fragment geometrii krawędzi między start_m a end_m metrów, licząc
+        od węzła u krawędzi. Wynik zawsze biegnie w stronę od u do v.
+        """
+        return line_substring(
+            self._edge_geom(eid), self.edge_length[eid], self.edge_forward[eid], start_m, end_m
+        )
+
+    def _node_tree(self) -> STRtree:
+        # punkty węzłów w układzie (lon * cos(lat0), lat), żeby odległość
+        # w stopniach była w przybliżeniu proporcjonalna do metrów
+        if self._nodes_tree is None:
+            self._lon_scale = float(np.cos(np.radians(np.mean(self.node_lat))))
+            self._nodes_tree = STRtree(
+                shapely.points(self.node_lon * self._lon_scale, self.node_lat)
+            )
+        return self._nodes_tree
+
+    def nearest_node_ids(self, coords: List[Tuple[float, float]]) -> List[int]:
+        """
+        Numery węzłów najbliższych punktom (lat, lon) – jedno zapytanie
+        do STRtree węzłów dla wszystkich punktów naraz.
+        """
+        if not self.nodes:
+            raise ValueError("Graf nie zawiera żadnych węzłów")
+        if not coords:
+            return []
+
+        tree = self._node_tree()
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        query = shapely.points(pts[:, 1] * self._lon_scale, pts[:, 0])
+
+        input_idx, node_idx = tree.query_nearest(query, all_matches=False)
+        result = [0] * len(pts)
+        for i, n in zip(input_idx.tolist(), node_idx.tolist()):
+            result[i] = n
+        return result
+
+    def nearest_node_id(self, coord: Tuple[float, float]) -> int:
+        """Numer węzła najbliższego punktowi (lat, lon)."""
+        return self.nearest_node_ids([coord])[0]
+
+    def nearest_edge(
+        self,
+        coord: Tuple[float, float],
+        blocked=None,
+        max_radius_deg: float = 0.5,
+    ) -> Optional[EdgeSnap]:
+        """
+        Rzutuje punkt (lat, lon) na najbliższą niezablokowaną krawędź.
+
+        Kandydatów bierzemy z STRtree krawędzi w rosnącym oknie wokół punktu,
+        a odległość liczymy w układzie (lon * cos(lat), lat), żeby była
+        w przybliżeniu proporcjonalna do metrów.
+        """
+        if len(self._tree_eids) == 0:
+            return None
+
+        lat, lon = coord
+        scale = float(np.cos(np.radians(lat)))
+        point = shapely.points(lon * scale, lat)
+
+        def to_scaled(geom):
+            return shapely.transform(geom, lambda xy: xy * [scale, 1.0])
+
+        radius = 0.0005
+        while True:
+            window = box(lon - radius / scale, lat - radius, lon + radius / scale, lat + radius)
+            tree_idx = self._tree.query(window)
+
+            best = None
+            for eid in self._tree_eids[tree_idx].tolist():
+                if blocked is not None and blocked.is_set(eid):
+                    continue
+                scaled = to_scaled(self.edge_geoms[eid])
+                d = scaled.distance(point)
+                if best is None or d < best[0]:
+                    best = (d, eid, scaled)
+
+            # trafienie liczy się dopiero, gdy leży w promieniu okna – krawędź
+            # spoza okna (w rogu) mogłaby nie być najbliższa
+            if best is not None and best[0] <= radius:
+                break
+            if radius >= max_radius_deg:
+                if best is None:
+                    return None
+                break
+            radius *= 4
+
+        distance, eid, scaled = best
+        proj = scaled.interpolate(scaled.project(point))
+        proj_lat, proj_lon = proj.y, proj.x / scale
+
+        # ułamek długości liczymy w tej samej skali co edge_substring
+        edge_scale, edge_scaled = self._scaled_edge(eid)
+        length = self.edge_length[eid]
+        frac = (
+            edge_scaled.project(shapely.points(proj_lon * edge_scale, proj_lat), normalized=True)
+            if edge_scaled.length > 0 else 0.0
+        )
+        offset_m = frac * length if self.edge_forward[eid] else (1.0 - frac) * length
+
+        return EdgeSnap(
+            eid=eid,
+            offset_m=float(offset_m),
+            point=(proj_lat, proj_lon),
+            distance_deg=distance,
+        )
+
+    def query_eids(self, geoms: List[BaseGeometry]) -> np.ndarray:
+        """
+        Zwraca posortowane, unikalne eid krawędzi, których bounding box
+        przecina bounding box którejkolwiek z podanych geometrii.
+        """
+        if not geoms or len(self._tree_eids) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        _, tree_idx = self._tree.query(np.asarray(geoms, dtype=object))
+        return np.unique(self._tree_eids[tree_idx])
@@ -0,0 +1,186 @@
+"""
+Binarny zrzut grafu dróg (.npz) – szybkie wczytanie bez parsowania GeoJSON.
+
+Format (wersja 2), tablice numpy w jednym pliku .npz:
+
+    version       int64 ()          – wersja formatu (SNAPSHOT_VERSION),
+    node_lat      float64 (N,)      – szerokość geograficzna węzłów,
+    node_lon      float64 (N,)      – długość geograficzna węzłów,
+    edge_u        int32 (E,)        – numer węzła u krawędzi,
+    edge_v        int32 (E,)        – numer węzła v krawędzi,
+    edge_length   float64 (E,)      – długość krawędzi [m] (atrybut length_m),
+    geom_offsets  int64 (E + 1,)    – krawędź i ma wierzchołki
+                                      geom_coords[geom_offsets[i]:geom_offsets[i + 1]],
+    geom_coords   float64 (C, 2)    – wierzchołki geometrii (lon, lat),
+    highway_values  str (K,)        – klasy dróg (tag highway) występujące w grafie,
+    edge_highway  int16 (E,)        – numer klasy krawędzi w highway_values (-1 = brak),
+    edge_maxspeed float32 (E,)      – limit prędkości [km/h] (NaN = brak).
+
+Wersja 1 (bez klas dróg) nadal się wczytuje – krawędzie nie mają wtedy
+highway / maxspeed i profile ruchu traktują je jak zwykłe drogi.
+
+Węzły identyfikowane są jak w RoadGraphBuilder – krotką (lat, lon),
+więc graf wczytany ze zrzutu jest równoważny grafowi zbudowanemu z GeoJSON.
+Stan flood (atrybut 'blocked') nie jest zapisywany – po wczytaniu
+wszystkie krawędzie są przejezdne, a flood nakłada EvacService.
+"""
+import math
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import networkx as nx
+import numpy as np
+import shapely
+
+SNAPSHOT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+
+def save_snapshot(graph: nx.Graph, path: Union[str, Path]) -> Path:
+    """Zapisuje graf do pliku .npz (zapis atomowy przez plik tymczasowy)."""
+    path = Path(path)
+    nodes = list(graph.nodes)
+    node_ids = {node: i for i, node in enumerate(nodes)}
+    coords = np.array(nodes, dtype=np.float64).reshape(-1, 2)
+
+    n_edges = graph.number_of_edges()
+    edge_u = np.empty(n_edges, dtype=np.int32)
+    edge_v = np.empty(n_edges, dtype=np.int32)
+    edge_length = np.empty(n_edges, dtype=np.float64)
+    offsets = np.zeros(n_edges + 1, dtype=np.int64)
+    edge_highway = np.full(n_edges, -1, dtype=np.int16)
+    edge_maxspeed = np.full(n_edges, np.nan, dtype=np.float32)
+    highway_codes = {}
+    parts = []
+
+    for i, (u, v, data) in enumerate(graph.edges(data=True)):
+        edge_u[i] = node_ids[u]
+        edge_v[i] = node_ids[v]
+        edge_length[i] = float(data.get("length_m", 0.0))
+
+        highway = data.get("highway")
+        if highway is not None:
+            edge_highway[i] = highway_codes.setdefault(highway, len(highway_codes))
+        if data.get("maxspeed") is not None:
+            edge_maxspeed[i] = data["maxspeed"]
+
+        geom = data.get("geometry")
+        if geom is None:
+            xy = np.array([(u[1], u[0]), (v[1], v[0])], dtype=np.float64)
+        else:
+            xy = shapely.get_coordinates(geom)
+        parts.append(xy)
+        offsets[i + 1] = offsets[i] + len(xy)
+
+    geom_coords = np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.float64)
+
+    return write_snapshot(
+        path, coords[:, 0], coords[:, 1], edge_u, edge_v, edge_length, offsets, geom_coords,
+        highway_values=list(highway_codes), edge_highway=edge_highway, edge_maxspeed=edge_maxspeed,
+    )
+
+
+def write_snapshot(
+    path: Union[str, Path],
+    node_lat: np.ndarray,
+    node_lon: np.ndarray,
+    edge_u: np.ndarray,
+    edge_v: np.ndarray,
+    edge_length: np.ndarray,
+    geom_offsets: np.ndarray,
+    geom_coords: np.ndarray,
+    highway_values: Sequence[str] = (),
+    edge_highway: Optional[np.ndarray] = None,
+    edge_maxspeed: Optional[np.ndarray] = None,
+) -> Path:
+    """
+    Zapisuje gotowe tablice formatu (bez budowania grafu networkx –
+    np. przy imporcie całego wyciągu OSM). Zapis atomowy przez plik tymczasowy.
+    """
+    path = Path(path)
+    n_edges = len(edge_u)
+    if edge_highway is None:
+        edge_highway = np.full(n_edges, -1, dtype=np.int16)
+    if edge_maxspeed is None:
+        edge_maxspeed = np.full(n_edges, np.nan, dtype=np.float32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            version=np.int64(SNAPSHOT_VERSION),
+            node_lat=np.asarray(node_lat, dtype=np.float64),
+            node_lon=np.asarray(node_lon, dtype=np.float64),
+            edge_u=np.asarray(edge_u, dtype=np.int32),
+            edge_v=np.asarray(edge_v, dtype=np.int32),
+            edge_length=np.asarray(edge_length, dtype=np.float64),
+            geom_offsets=np.asarray(geom_offsets, dtype=np.int64),
+            geom_coords=np.asarray(geom_coords, dtype=np.float64).reshape(-1, 2),
+            highway_values=np.array(list(highway_values), dtype=str),
+            edge_highway=np.asarray(edge_highway, dtype=np.int16),
+            edge_maxspeed=np.asarray(edge_maxspeed, dtype=np.float32),
+        )
+    tmp.replace(path)
+    return path
+
+
+def load_snapshot(path: Union[str, Path]) -> nx.Graph:
+    """Wczytuje graf zapisany przez save_snapshot."""
+    with np.load(Path(path)) as data:
+        version = int(data["version"])
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Nieobsługiwana wersja zrzutu grafu: {version}")
+
+        node_lat = data["node_lat"]
+        node_lon = data["node_lon"]
+        edge_u = data["edge_u"]
+        edge_v = data["edge_v"]
+        edge_length = data["edge_length"]
+        offsets = data["geom_offsets"]
+        geom_coords = data["geom_coords"]
+        if version >= 2:
+            highway_values = data["highway_values"].tolist()
+            edge_highway = data["edge_highway"].tolist()
+            edge_maxspeed = data["edge_maxspeed"].tolist()
+        else:
+            highway_values = []
+            edge_highway = [-1] * len(edge_u)
+            edge_maxspeed = [float("nan")] * len(edge_u)
+
+    nodes = list(zip(node_lat.tolist(), node_lon.tolist()))
+
+    # wszystkie LineStringi naraz – indices mówią, do której krawędzi należy wierzchołek
+    counts = np.diff(offsets)
+    geoms = shapely.linestrings(
+        geom_coords,
+        indices=np.repeat(np.arange(len(counts)), counts),
+    ) if len(counts) else []
+
+    G = nx.Graph()
+    G.add_nodes_from((node, {"pos": node}) for node in nodes)
+    G.add_edges_from(
+        (
+            nodes[u],
+            nodes[v],
+            _edge_attrs(length, geom, highway_values, highway, maxspeed),
+        )
+        for u, v, length, geom, highway, maxspeed in zip(
+            edge_u.tolist(), edge_v.tolist(), edge_length.tolist(), geoms,
+            edge_highway, edge_maxspeed,
+        )
+    )
+    return G
+
+
+def _edge_attrs(length, geom, highway_values, highway, maxspeed) -> dict:
+    # highway / maxspeed tylko, gdy są – jak w grafie z RoadGraphBuilder
+    attrs = {"length_m": length, "geometry": geom, "blocked": False}
+    if highway >= 0:
+        attrs["highway"] = highway_values[highway]
+    if not math.isnan(maxspeed):
+        attrs["maxspeed"] = maxspeed
+    return attrs
+
+
+def is_snapshot(path: Union[str, Path]) -> bool:
+    return Path(path).suffix == ".npz"
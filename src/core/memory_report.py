@@ -0,0 +1,299 @@
+"""
+Szacowanie pamięci struktur grafu, flood i cache'y.
+
+sys.getsizeof nie widzi pamięci GEOS (geometrie shapely) ani tego, co leży
+w kontenerach, a dokładne przejście po grafie z milionami krawędzi trwałoby
+tyle, co jego budowa. Dlatego:
+
+- kontenery po węzłach / krawędziach mierzone są na próbce (MEMORY_SAMPLE
+  elementów) i wynik jest skalowany do całości,
+- geometrie liczone są z liczby wierzchołków (GEOS_COORD_BYTES na wierzchołek
+  + GEOS_GEOM_BYTES na obiekt), wektorowo przez shapely,
+- tablice numpy i bajty – dokładnie (nbytes / len).
+
+Wyniki to szacunek rzędu wielkości – wystarczający do doboru limitów pamięci
+kontenerów i wyłapania regresji, nie do rozliczania pojedynczych bajtów.
+
+Opcjonalnie (EVAC_TRACEMALLOC=1) traced(...) zbiera diff migawek tracemalloc
+wokół wczytania grafu i aktualizacji flood – najwięcej alokujące linie trafiają
+do logu i do /api/admin/memory.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import shapely
+
+logger = logging.getLogger(__name__)
+
+# ile węzłów / krawędzi mierzymy, żeby oszacować cały kontener
+MEMORY_SAMPLE = 2000
+
+# pamięć geometrii GEOS: wierzchołek (x, y jako double) i obiekt shapely
+# z nagłówkiem geometrii – zmierzone przez RSS dla LineStringów (GEOS 3.11)
+GEOS_COORD_BYTES = 16
+GEOS_GEOM_BYTES = 220
+# wpis STRtree: obwiednia (4 × double) i wskaźnik na geometrię
+STRTREE_ITEM_BYTES = 40
+
+TRACEMALLOC = os.getenv("EVAC_TRACEMALLOC", "0") == "1"
+# ramki stosu w tracemalloc i liczba linii w diffie
+TRACE_FRAMES = 1
+TRACE_TOP = 15
+# ile ostatnich diffów trzymamy dla /api/admin/memory
+TRACE_KEEP = 10
+
+MB = 2**20
+
+
+# ---------------- szacowanie rozmiarów ----------------
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Rozmiar obiektu razem z zawartością kontenerów (dict, list, tuple, set)
+    i atrybutami (__dict__ / __slots__). Obiekty liczone raz (seen).
+    Geometrie shapely liczone jak w geometry_bytes, tablice numpy przez nbytes.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, shapely.Geometry):
+        return geometry_bytes([obj])
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) if obj.base is None else obj.nbytes
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(
+            deep_sizeof(getattr(obj, name), seen)
+            for name in obj.__slots__ if hasattr(obj, name)
+        )
+    return size
+
+
+def sampled_sizeof(items: Sequence[Any], sample: int = MEMORY_SAMPLE) -> int:
+    """
+    Łączny rozmiar elementów sekwencji (deep_sizeof) oszacowany z próbki.
+    Sam kontener nie jest wliczany.
+    """
+    n = len(items)
+    if n == 0:
+        return 0
+    if n <= sample:
+        picked = items
+    else:
+        rng = random.Random(0)
+        picked = [items[i] for i in rng.sample(range(n), sample)]
+    measured = sum(deep_sizeof(item) for item in picked)
+    return int(measured * n / len(picked))
+
+
+def geometry_bytes(geoms: Iterable[Any]) -> int:
+    """Szacowana pamięć geometrii shapely (None pomijane)."""
+    arr = np.asarray([g for g in geoms if g is not None], dtype=object)
+    if len(arr) == 0:
+        return 0
+    coords = int(shapely.get_num_coordinates(arr).sum())
+    return len(arr) * GEOS_GEOM_BYTES + coords * GEOS_COORD_BYTES
+
+
+def flood_bytes(flood) -> int:
+    """
+    Warstwa flood: GeoDataFrame (kolumny – memory_usage deep – i geometrie)
+    albo GeoJSON / ścieżka, jak w scenariuszach.
+    """
+    if flood is None:
+        return 0
+    if not hasattr(flood, "memory_usage"):
+        return deep_sizeof(flood)
+    size = int(flood.memory_usage(deep=True, index=True).sum())
+    if "geometry" in flood:
+        size += geometry_bytes(flood.geometry.values)
+    return size
+
+
+def graph_bytes(graph) -> Dict[str, int]:
+    """
+    Graf networkx bez geometrii krawędzi, w podziale na część węzłów (klucze,
+    atrybuty, słowniki sąsiedztwa) i krawędzi (słowniki atrybutów – jeden
+    wspólny dla obu kierunków).
+    """
+    n_nodes, n_edges = graph.number_of_nodes(), graph.number_of_edges()
+
+    nodes = _sample(list(graph.nodes))
+    measured = 0
+    for node in nodes:
+        # pos w atrybutach to ta sama krotka co klucz – liczona raz
+        seen: set = set()
+        measured += deep_sizeof(node, seen) + deep_sizeof(graph._node[node], seen)
+        # wpisy sąsiedztwa: klucze to krotki innych węzłów, wartości – dane krawędzi
+        measured += sys.getsizeof(graph._adj[node])
+    node_bytes = sys.getsizeof(graph._node) + sys.getsizeof(graph._adj)
+    node_bytes += int(measured * n_nodes / max(len(nodes), 1))
+
+    edges = []
+    for _, _, data in graph.edges(data=True):
+        edges.append(data)
+        if len(edges) >= MEMORY_SAMPLE:
+            break
+    measured = sum(
+        sys.getsizeof(data)
+        + sum(deep_sizeof(value) for key, value in data.items() if key != "geometry")
+        for data in edges
+    )
+    edge_bytes = int(measured * n_edges / max(len(edges), 1))
+    return {"nodes": node_bytes, "edges": edge_bytes}
+
+
+def index_bytes(index) -> Dict[str, int]:
+    """
+    GraphIndex: tablice po numerach węzłów i po eid, wagi profili i STRtree.
+    Krotki węzłów i geometrie są wspólne z grafem – tu nie są liczone.
+    """
+    n_nodes, n_edges = index.node_count, index.edge_count
+    float_bytes = sys.getsizeof(1.0)
+
+    node_bytes = (
+        index.node_lat.nbytes + index.node_lon.nbytes
+        + sys.getsizeof(index.nodes) + sys.getsizeof(index.node_ids)
+        + sys.getsizeof(index.adj) + sampled_sizeof(index.adj)
+    )
+    if index._nodes_tree is not None:
+        node_bytes += n_nodes * (GEOS_GEOM_BYTES + GEOS_COORD_BYTES + STRTREE_ITEM_BYTES)
+
+    edge_bytes = (
+        sys.getsizeof(index.edges) + n_edges * sys.getsizeof((None, None))
+        + sys.getsizeof(index.edge_geoms)
+        + sys.getsizeof(index.edge_length) + n_edges * float_bytes
+        + sys.getsizeof(index.edge_forward)
+        + index._tree_eids.nbytes + len(index._tree_eids) * STRTREE_ITEM_BYTES
+    )
+    for weights in index.profile_weights.values():
+        edge_bytes += sys.getsizeof(weights) + n_edges * float_bytes
+    for bitset in index.profile_forbidden.values():
+        edge_bytes += bitset.nbytes
+    return {"nodes": node_bytes, "edges": edge_bytes}
+
+
+def footprint(node_bytes: int, edge_bytes: int, nodes: int, edges: int) -> Dict[str, Any]:
+    """Wpis raportu dla struktury grafu: bajty łącznie, na węzeł i na krawędź."""
+    return {
+        "bytes": int(node_bytes + edge_bytes),
+        "bytes_per_node": round(node_bytes / nodes, 1) if nodes else 0.0,
+        "bytes_per_edge": round(edge_bytes / edges, 1) if edges else 0.0,
+    }
+
+
+def _sample(items: List[Any]) -> List[Any]:
+    if len(items) <= MEMORY_SAMPLE:
+        return items
+    rng = random.Random(0)
+    return [items[i] for i in rng.sample(range(len(items)), MEMORY_SAMPLE)]
+
+
+def rss_bytes() -> Optional[int]:
+    """Bieżące RSS procesu (Linux: /proc/self/statm), None gdzie indziej."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def format_summary(report: Dict[str, Any]) -> str:
+    """Jedna linia logu z raportu EvacService.memory_report()."""
+    graph = report["graph"]
+    parts = ", ".join(
+        f"{name} {graph[name]['bytes'] / MB:.1f} MB"
+        for name in ("networkx", "edge_geometries", "graph_index")
+    )
+    line = (
+        f"graf {graph['total_bytes'] / MB:.1f} MB "
+        f"({graph['bytes_per_node']:.0f} B/węzeł, {graph['bytes_per_edge']:.0f} B/krawędź; {parts}), "
+        f"flood {report['flood']['total_bytes'] / MB:.1f} MB, "
+        f"cache {report['caches']['total_bytes'] / MB:.1f} MB"
+    )
+    if report.get("rss_bytes") is not None:
+        line += f", RSS {report['rss_bytes'] / MB:.1f} MB"
+    return line
+
+
+# ---------------- tracemalloc ----------------
+
+_trace_lock = threading.Lock()
+_trace_users = 0
+_trace_diffs: Deque[Dict[str, Any]] = deque(maxlen=TRACE_KEEP)
+
+
+@contextmanager
+def traced(operation: str, enabled: Optional[bool] = None) -> Iterator[None]:
+    """
+    Diff migawek tracemalloc wokół operacji (przy EVAC_TRACEMALLOC=1 albo
+    enabled=True). Śledzenie włączane jest tylko na czas operacji, więc diff
+    pokazuje, co operacja zaalokowała i nadal trzyma.
+    """
+    global _trace_users
+    if not (TRACEMALLOC if enabled is None else enabled):
+        yield
+        return
+
+    with _trace_lock:
+        _trace_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+    before = tracemalloc.take_snapshot()
+    t0 = time.time()
+    try:
+        yield
+    finally:
+        after = tracemalloc.take_snapshot()
+        with _trace_lock:
+            _trace_users -= 1
+            if _trace_users == 0:
+                tracemalloc.stop()
+
+        stats = after.compare_to(before, "lineno")
+        top = [
+            {
+                "where": str(stat.traceback),
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:TRACE_TOP]
+        ]
+        total = sum(stat.size_diff for stat in stats)
+        _trace_diffs.append({
+            "operation": operation,
+            "at": t0,
+            "size_diff_bytes": total,
+            "top": top,
+        })
+        logger.info(
+            "tracemalloc %s: %+.1f MB; najwięcej: %s",
+            operation, total / MB,
+            "; ".join(f"{s['where']} {s['size_diff_bytes'] / MB:+.1f} MB" for s in top[:3]),
+        )
+
+
+def trace_diffs() -> List[Dict[str, Any]]:
+    """Ostatnie diffy tracemalloc (najnowsze pierwsze)."""
+    with _trace_lock:
+        return list(reversed(_trace_diffs))
@@ -0,0 +1,172 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# granice kubełków histogramów czasu [s]
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Skumulowany histogram w stylu Prometheusa (kubełki le=...)."""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # [licznik per kubełek..., +Inf, suma]
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for key, series in items:
+                for bound, count in zip(self.buckets, series):
+                    lines.append(
+                        f"{self.name}_bucket{_labels(key, le=_fmt(bound))} {int(count)}"
+                    )
+                lines.append(f"{self.name}_bucket{_labels(key, le='+Inf')} {int(series[-2])}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_labels(key)} {int(series[-2])}")
+        return lines
+
+
+class Counter:
+    """Licznik w stylu Prometheusa."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            return self._series.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_labels(key)} {_fmt(value)}")
+        return lines
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+_registry_lock = threading.Lock()
+_registry: Dict[str, object] = {}
+
+
+def histogram(name: str, help_text: str) -> Histogram:
+    with _registry_lock:
+        return _registry.setdefault(name, Histogram(name, help_text))
+
+
+def counter(name: str, help_text: str) -> Counter:
+    with _registry_lock:
+        return _registry.setdefault(name, Counter(name, help_text))
+
+
+def render_prometheus() -> str:
+    """Wszystkie metryki w formacie tekstowym Prometheusa."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram(
+    "evac_stage_duration_seconds",
+    "Czas etapów obsługi zapytań (flood, blokady, graf, dociąganie, wyszukiwanie, serializacja)",
+)
+
+
+# --------------- pomiar etapów w obrębie jednego zapytania ----------------
+
+_current_timer: ContextVar[Optional["StageTimer"]] = ContextVar("evac_stage_timer", default=None)
+
+
+class StageTimer:
+    """
+    Zbiera czasy etapów jednego zapytania. Aktywny timer jest trzymany
+    w ContextVar, więc warstwy niżej (serwis, router) nie muszą go dostawać
+    w parametrach – wystarczy `with stage("..."):`.
+    """
+
+    def __init__(self):
+        self.stages_ms: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._token = None
+
+    def __enter__(self) -> "StageTimer":
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _current_timer.reset(self._token)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages_ms[name] = self.stages_ms.get(name, 0.0) + seconds * 1000.0
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000.0
+
+    def server_timing(self) -> str:
+        """Wartość nagłówka Server-Timing."""
+        parts = [f"{name};dur={ms:.2f}" for name, ms in self.stages_ms.items()]
+        parts.append(f"total;dur={self.total_ms:.2f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Mierzy etap: zapisuje go do histogramu evac_stage_duration_seconds
+    i do aktywnego StageTimer (jeśli jest).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.add(name, elapsed)
@@ -1,6 +1,7 @@
 import logging
+import os
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 import requests
 
@@ -9,7 +10,8 @@ from .osm_to_geojson import osm_to_roads_geojson, save_geojson
 logger = logging.getLogger(__name__)
 
 
-OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+# adres można podmienić (np. na lokalny serwer zastępczy w testach obciążeniowych)
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
 
 
 def build_overpass_query(bbox: Tuple[float, float, float, float]) -> str:
@@ -30,16 +32,21 @@ def build_overpass_query(bbox: Tuple[float, float, float, float]) -> str:
     return query.strip()
 
 
-def download_osm_roads(bbox: Tuple[float, float, float, float]) -> str:
+def download_osm_roads(
+    bbox: Tuple[float, float, float, float],
+    url: Optional[str] = None,
+) -> str:
     """
     Pobiera dane OSM (XML) dla dróg w zadanym bboxie.
     bbox: (south, west, north, east) w stopniach WGS84.
+    url: adres Overpass API (domyślnie OVERPASS_URL).
     Zwraca string z zawartością XML.
     """
     query = build_overpass_query(bbox)
-    logger.info("Wysyłam zapytanie do Overpass API dla bbox=%s", bbox)
+    url = url or OVERPASS_URL
+    logger.info("Wysyłam zapytanie do Overpass API (%s) dla bbox=%s", url, bbox)
 
-    response = requests.post(OVERPASS_URL, data={"data": query})
+    response = requests.post(url, data={"data": query})
     response.raise_for_status()
 
     logger.info("Odebrano dane z Overpass, długość odpowiedzi: %d znaków", len(response.text))
@@ -0,0 +1,307 @@
+"""
+Import lokalnego wyciągu OSM (.osm, .osm.bz2, .osm.gz – np. z Geofabrik)
+prosto do binarnego zrzutu grafu (.npz, format z graph_snapshot.py).
+
+Plik czytany jest strumieniowo (iterparse, przetworzone elementy są od razu
+zwalniane) w dwóch przebiegach:
+
+    1. drogi  – z przejezdnych way zapamiętywane są tylko numery węzłów
+                (tablica int64, bez słowników i obiektów na element)
+                oraz klasa drogi (highway, maxspeed) dla profili ruchu,
+    2. węzły  – współrzędne zapisywane są tylko dla węzłów użytych przez drogi.
+
+Pamięć zależy więc od liczby węzłów dróg, a nie od rozmiaru pliku – bez
+drzewa XML, GeoJSON-a i grafu networkx. Krawędzie są takie jak w
+RoadGraphBuilder (odcinek między kolejnymi węzłami drogi), więc graf
+wczytany ze zrzutu jest równoważny grafowi z Overpass dla tego samego obszaru.
+
+Użycie:
+
+    python -m src.core.osm_ingest mazowieckie-latest.osm.bz2 data/roads.npz
+    python -m src.core.osm_ingest extract.osm.gz --region warszawa --bbox 52.1 20.85 52.37 21.27
+"""
+import argparse
+import bz2
+import gzip
+import logging
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .graph_snapshot import write_snapshot
+from .profiles import parse_maxspeed
+
+logger = logging.getLogger(__name__)
+
+BBox = Tuple[float, float, float, float]  # (south, west, north, east)
+
+# wartości highway=*, po których da się przejść lub przejechać; pozostałe
+# (proposed, construction, abandoned, platform, raceway, bus_stop, ...)
+# to drogi nieistniejące albo obiekty, które tylko noszą tag highway
+ROUTABLE_HIGHWAYS = frozenset({
+    "motorway", "motorway_link", "trunk", "trunk_link",
+    "primary", "primary_link", "secondary", "secondary_link",
+    "tertiary", "tertiary_link", "unclassified", "residential",
+    "living_street", "service", "road", "track",
+    "pedestrian", "footway", "path", "cycleway", "bridleway", "steps",
+})
+
+# co ile węzłów dopasowujemy bufor do potrzebnych węzłów (searchsorted)
+NODE_CHUNK = 500_000
+
+_EARTH_RADIUS_M = 6371000.0
+
+
+def is_routable(tags: Dict[str, str]) -> bool:
+    """Czy way z tymi tagami jest przejezdną drogą (a nie np. placem)."""
+    if tags.get("highway") not in ROUTABLE_HIGHWAYS:
+        return False
+    # highway=pedestrian + area=yes to plac – obrys, nie oś drogi
+    return tags.get("area") != "yes"
+
+
+def open_extract(path: Union[str, Path]) -> BinaryIO:
+    """Otwiera wyciąg OSM – kompresja rozpoznawana po rozszerzeniu."""
+    path = Path(path)
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _iter_elements(path: Union[str, Path], tag: str) -> Iterator[ET.Element]:
+    """
+    Kolejne elementy <tag> najwyższego poziomu. Po każdym elemencie
+    najwyższego poziomu korzeń jest czyszczony – w pamięci jest
+    zawsze tylko bieżący element.
+    """
+    with open_extract(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or elem.tag not in ("node", "way", "relation"):
+                continue
+            if elem.tag == tag:
+                yield elem
+            root.clear()
+
+
+@dataclass
+class _Ways:
+    """
+    Przejezdne drogi z przebiegu 1: numery węzłów jedna za drugą (refs),
+    końce kolejnych dróg w refs (ends) i klasa drogi każdej z nich
+    (numer w highway_values oraz maxspeed [km/h], NaN = brak).
+    """
+    refs: np.ndarray
+    ends: np.ndarray
+    highway: np.ndarray
+    maxspeed: np.ndarray
+    highway_values: List[str]
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+
+def _read_ways(path: Union[str, Path]) -> _Ways:
+    """Przebieg 1: przejezdne drogi – tylko numery węzłów i klasa drogi."""
+    refs = array("q")
+    way_ends = array("q")
+    highway = array("h")
+    maxspeed = array("d")
+    highway_codes: Dict[str, int] = {}
+    for way in _iter_elements(path, "way"):
+        tags = {t.get("k"): t.get("v") for t in way.iter("tag")}
+        if not is_routable(tags):
+            continue
+        nds = [int(nd.get("ref")) for nd in way.iter("nd")]
+        if len(nds) < 2:
+            continue
+        refs.extend(nds)
+        way_ends.append(len(refs))
+        highway.append(highway_codes.setdefault(tags["highway"], len(highway_codes)))
+        speed = parse_maxspeed(tags.get("maxspeed"))
+        maxspeed.append(speed if speed is not None else np.nan)
+    return _Ways(
+        refs=np.array(refs, dtype=np.int64),
+        ends=np.array(way_ends, dtype=np.int64),
+        highway=np.array(highway, dtype=np.int16),
+        maxspeed=np.array(maxspeed, dtype=np.float32),
+        highway_values=list(highway_codes),
+    )
+
+
+def _read_nodes(path: Union[str, Path], needed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Przebieg 2: współrzędne węzłów z needed (posortowane numery OSM);
+    NaN dla węzłów, których nie ma w wyciągu (drogi przycięte na granicy).
+    """
+    lat = np.full(len(needed), np.nan)
+    lon = np.full(len(needed), np.nan)
+    if len(needed) == 0:
+        return lat, lon
+
+    ids, lats, lons = array("q"), array("d"), array("d")
+
+    def flush():
+        # kopie – bufory array wyczyścimy po dopasowaniu
+        chunk = np.array(ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(needed, chunk), len(needed) - 1)
+        hit = needed[pos] == chunk
+        lat[pos[hit]] = np.array(lats, dtype=np.float64)[hit]
+        lon[pos[hit]] = np.array(lons, dtype=np.float64)[hit]
+        del ids[:], lats[:], lons[:]
+
+    for node in _iter_elements(path, "node"):
+        ids.append(int(node.get("id")))
+        lats.append(float(node.get("lat")))
+        lons.append(float(node.get("lon")))
+        if len(ids) >= NODE_CHUNK:
+            flush()
+    if ids:
+        flush()
+    return lat, lon
+
+
+def _haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Wektorowa wersja utils.haversine_distance_m."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lon2 - lon1)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return _EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+@dataclass
+class IngestResult:
+    path: Path
+    bbox: BBox
+    ways: int
+    nodes: int
+    edges: int
+
+
+def ingest_osm_extract(
+    input_path: Union[str, Path],
+    output_path: Union[str, Path],
+    bbox: Optional[BBox] = None,
+) -> IngestResult:
+    """
+    Buduje zrzut grafu dróg z lokalnego wyciągu OSM. Z bbox zostają
+    tylko odcinki, których oba końce leżą w bboxie.
+    """
+    t0 = time.perf_counter()
+    ways = _read_ways(input_path)
+    refs = ways.refs
+    logger.info(
+        "Przebieg 1: %d przejezdnych dróg, %d odwołań do węzłów (%.1f s)",
+        len(ways), len(refs), time.perf_counter() - t0,
+    )
+
+    t1 = time.perf_counter()
+    needed = np.unique(refs)
+    lat, lon = _read_nodes(input_path, needed)
+    present = ~np.isnan(lat)
+    logger.info(
+        "Przebieg 2: %d z %d węzłów dróg w wyciągu (%.1f s)",
+        int(present.sum()), len(needed), time.perf_counter() - t1,
+    )
+    if bbox is not None:
+        south, west, north, east = bbox
+        present &= (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+
+    # odcinki = pary kolejnych odwołań, bez par na styku dwóch dróg
+    idx = np.searchsorted(needed, refs)
+    a, b = idx[:-1], idx[1:]
+    way_of = np.repeat(np.arange(len(ways)), np.diff(ways.ends, prepend=0))[:-1]
+    valid = np.ones(len(a), dtype=bool)
+    valid[ways.ends[:-1] - 1] = False
+    valid &= present[a] & present[b]
+    valid &= (lat[a] != lat[b]) | (lon[a] != lon[b])
+    a, b, way_of = a[valid], b[valid], way_of[valid]
+
+    # ta sama para węzłów (np. z dwóch nakładających się dróg) – jedna krawędź
+    # z atrybutami ostatniej drogi, jak w nx.Graph budowanym przez RoadGraphBuilder
+    key = np.minimum(a, b) * len(needed) + np.maximum(a, b)
+    _, last = np.unique(key[::-1], return_index=True)
+    keep = np.sort(len(key) - 1 - last)
+    a, b, way_of = a[keep], b[keep], way_of[keep]
+
+    # numeracja tylko użytych węzłów
+    used, inverse = np.unique(np.concatenate([a, b]), return_inverse=True)
+    edge_u = inverse[:len(a)]
+    edge_v = inverse[len(a):]
+    node_lat, node_lon = lat[used], lon[used]
+
+    n_edges = len(edge_u)
+    geom_coords = np.empty((2 * n_edges, 2), dtype=np.float64)
+    geom_coords[0::2, 0] = node_lon[edge_u]
+    geom_coords[0::2, 1] = node_lat[edge_u]
+    geom_coords[1::2, 0] = node_lon[edge_v]
+    geom_coords[1::2, 1] = node_lat[edge_v]
+
+    path = write_snapshot(
+        output_path,
+        node_lat,
+        node_lon,
+        edge_u,
+        edge_v,
+        _haversine_m(node_lat[edge_u], node_lon[edge_u], node_lat[edge_v], node_lon[edge_v]),
+        np.arange(0, 2 * n_edges + 1, 2, dtype=np.int64),
+        geom_coords,
+        highway_values=ways.highway_values,
+        edge_highway=ways.highway[way_of],
+        edge_maxspeed=ways.maxspeed[way_of],
+    )
+
+    if bbox is None:
+        bbox = (
+            (float(node_lat.min()), float(node_lon.min()), float(node_lat.max()), float(node_lon.max()))
+            if len(used) else (0.0, 0.0, 0.0, 0.0)
+        )
+    result = IngestResult(path, bbox, len(ways), len(used), n_edges)
+    logger.info(
+        "Zapisano zrzut %s: %d węzłów, %d krawędzi (razem %.1f s)",
+        path, result.nodes, result.edges, time.perf_counter() - t0,
+    )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m src.core.osm_ingest",
+        description="Import lokalnego wyciągu OSM do zrzutu grafu dróg (.npz).",
+    )
+    parser.add_argument("input", type=Path, help="plik .osm, .osm.bz2 albo .osm.gz")
+    parser.add_argument("output", type=Path, nargs="?", help="plik .npz (niepotrzebny z --region)")
+    parser.add_argument(
+        "--bbox", type=float, nargs=4, metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+        help="przytnij drogi do bboxa",
+    )
+    parser.add_argument(
+        "--region",
+        help="zapisz jako region (data/regions/<region>.npz, widoczny po restarcie aplikacji)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.region:
+        from src.services.region_registry import region_registry_singleton as registry
+
+        output = registry.snapshot_path(args.region)
+    elif args.output:
+        output = args.output
+    else:
+        parser.error("podaj plik wyjściowy albo --region")
+
+    result = ingest_osm_extract(args.input, output, tuple(args.bbox) if args.bbox else None)
+    if args.region:
+        registry.register_snapshot(args.region, result.bbox, result.path, result.nodes, result.edges)
+    print("Gotowe. Zapisano do:", result.path)
@@ -0,0 +1,189 @@
+import asyncio
+import cProfile
+import functools
+import inspect
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# ile ostatnich profili trzymamy w pamięci
+DEFAULT_KEEP = 20
+
+
+@dataclass
+class RequestProfile:
+    """Profil cProfile jednego zapytania HTTP."""
+    id: int
+    method: str
+    path: str
+    query: str
+    started_at: float
+    duration_ms: float = 0.0
+    status_code: Optional[int] = None
+    stats: Optional[Dict[Any, Any]] = field(default=None, repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "status_code": self.status_code,
+            "has_stats": self.stats is not None,
+        }
+
+    def dump(self) -> bytes:
+        """
+        Statystyki w formacie pliku .prof (marshal, jak cProfile.dump_stats) –
+        do otwarcia przez pstats.Stats(...) albo snakeviz.
+        """
+        return marshal.dumps(self.stats or {})
+
+    def text(self, limit: int = 40, sort: str = "cumulative") -> str:
+        """Czytelne podsumowanie pstats (najdroższe funkcje)."""
+        if not self.stats:
+            return ""
+        out = io.StringIO()
+        stats = pstats.Stats(_StatsSource(self.stats), stream=out)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class _StatsSource:
+    # pstats.Stats przyjmuje obiekt z metodą create_stats() i atrybutem stats
+    def __init__(self, stats: Dict[Any, Any]):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "evac_request_profile", default=None
+)
+
+
+class RequestProfiler:
+    """
+    Opcjonalny profiler wybranych endpointów.
+
+    Middleware (src/main.py) decyduje, czy zapytanie ma być profilowane,
+    i zakłada dla niego RequestProfile w ContextVar. Samo profilowanie
+    odbywa się w opakowanej funkcji endpointu – synchroniczne endpointy
+    FastAPI wykonują się w puli wątków, a cProfile widzi tylko wątek,
+    w którym został włączony. ContextVar jest kopiowany do wątku puli,
+    więc opakowanie wie, czy ma profilować. Endpointy async profilowane są
+    we własnej pętli zdarzeń w osobnym wątku, żeby profil nie obejmował
+    innych zapytań obsługiwanych w trakcie ich await.
+
+    Ostatnie `keep` profili trzymane są w buforze cyklicznym.
+    """
+
+    def __init__(self, keep: int = DEFAULT_KEEP):
+        self._lock = threading.Lock()
+        self._profiles: Deque[RequestProfile] = deque(maxlen=max(1, keep))
+        self._ids = itertools.count(1)
+
+    # ---------- cykl życia profilu zapytania ----------
+
+    @contextmanager
+    def session(self, method: str, path: str, query: str) -> Iterator[RequestProfile]:
+        """
+        Zakłada profil zapytania na czas obsługi żądania; po wyjściu profil
+        trafia do bufora (status_code ustawia wołający).
+        """
+        profile = RequestProfile(
+            id=next(self._ids),
+            method=method,
+            path=path,
+            query=query,
+            started_at=time.time(),
+        )
+        token = _current_profile.set(profile)
+        t0 = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+            profile.duration_ms = (time.perf_counter() - t0) * 1000.0
+            with self._lock:
+                self._profiles.append(profile)
+
+    # ---------- opakowanie endpointów ----------
+
+    def wrap(self, call: Callable) -> Callable:
+        """
+        Opakowuje funkcję endpointu tak, żeby przy aktywnym profilu
+        zapytania wykonywała się pod cProfile.
+        """
+        if inspect.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def async_wrapper(**kwargs):
+                profile = _current_profile.get()
+                if profile is None:
+                    return await call(**kwargs)
+                # cProfile włączony w wątku pętli zdarzeń zliczałby też inne
+                # korutyny działające w trakcie await – profilowany endpoint
+                # dostaje więc własną pętlę w osobnym wątku
+                return await asyncio.to_thread(
+                    _run_profiled, profile, lambda: asyncio.run(call(**kwargs))
+                )
+
+            return async_wrapper
+
+        @functools.wraps(call)
+        def wrapper(**kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return call(**kwargs)
+            return _run_profiled(profile, lambda: call(**kwargs))
+
+        return wrapper
+
+    # ---------- odczyt ----------
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+def _run_profiled(profile: RequestProfile, fn: Callable[[], Any]) -> Any:
+    """Wykonuje fn pod cProfile w bieżącym wątku i zapisuje statystyki w profilu."""
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # inny profiler już działa (od Pythona 3.12 jeden na proces) –
+        # zapytanie wykonuje się bez profilu (has_stats = False)
+        return fn()
+    try:
+        return fn()
+    finally:
+        prof.disable()
+        _store_stats(profile, prof)
+
+
+def _store_stats(profile: RequestProfile, prof: cProfile.Profile) -> None:
+    prof.create_stats()
+    profile.stats = prof.stats
@@ -0,0 +1,107 @@
+"""
+Profile ruchu (pieszo / samochód / pojazd ratunkowy) – wagi krawędzi
+jako czas przejazdu [s] wyliczany z klasy drogi (highway) i maxspeed.
+
+Wagi wszystkich profili liczone są raz przy budowie GraphIndex i leżą
+obok siebie nad tymi samymi tablicami węzłów i krawędzi – profil to tylko
+inna tablica wag, bez kopii topologii czy geometrii. Krawędź niedostępna
+dla profilu ma wagę inf (Dijkstra nigdy jej nie rozluźni).
+"""
+import math
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PROFILES = ("foot", "car", "emergency")
+
+# krawędź bez tagu highway (np. GeoJSON bez properties) traktujemy jak "road"
+DEFAULT_HIGHWAY = "road"
+
+# prędkości [km/h] wg klasy drogi; brak klasy = droga niedostępna dla profilu
+_CAR_SPEEDS = {
+    "motorway": 120, "motorway_link": 60,
+    "trunk": 90, "trunk_link": 50,
+    "primary": 70, "primary_link": 40,
+    "secondary": 60, "secondary_link": 40,
+    "tertiary": 50, "tertiary_link": 30,
+    "unclassified": 40, "residential": 30, "road": 30,
+    "living_street": 10, "service": 15,
+}
+
+SPEEDS_KMH: Dict[str, Dict[str, float]] = {
+    "foot": {
+        **{hw: 5.0 for hw in _CAR_SPEEDS if not hw.startswith(("motorway", "trunk"))},
+        "track": 5.0, "pedestrian": 5.0, "footway": 5.0, "path": 5.0,
+        "cycleway": 5.0, "bridleway": 5.0, "steps": 2.5,
+    },
+    "car": dict(_CAR_SPEEDS, track=15),
+    # pojazd uprzywilejowany: szybciej niż limit i także po deptakach / drogach gruntowych
+    "emergency": dict(
+        {hw: speed * 1.2 for hw, speed in _CAR_SPEEDS.items()},
+        track=20, pedestrian=10,
+    ),
+}
+
+# maxspeed uwzględniają profile jezdne – pieszy idzie tak samo wszędzie
+MAXSPEED_FACTOR = {"foot": None, "car": 1.0, "emergency": 1.2}
+
+# limity strefowe (np. "PL:urban") – wartości z polskiego kodeksu drogowego
+_ZONE_SPEEDS = {
+    "urban": 50.0,
+    "rural": 90.0,
+    "expressway": 120.0,
+    "motorway": 140.0,
+    "living_street": 20.0,
+    "walk": 5.0,
+}
+
+_NUMBER_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(mph|km/h|kmh)?\s*$")
+
+
+def parse_maxspeed(value) -> Optional[float]:
+    """
+    Limit prędkości z tagu OSM maxspeed w km/h ("50", "30 mph",
+    "PL:urban", "50;70" – pierwsza wartość). None, gdy brak albo "none".
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 and math.isfinite(value) else None
+
+    text = str(value).split(";")[0].strip().lower()
+    match = _NUMBER_RE.match(text)
+    if match:
+        speed = float(match.group(1))
+        if match.group(2) == "mph":
+            speed *= 1.609344
+        return speed if speed > 0 else None
+    return _ZONE_SPEEDS.get(text.rpartition(":")[2])
+
+
+def speed_kmh(profile: str, highway: Optional[str], maxspeed: Optional[float]) -> Optional[float]:
+    """Prędkość profilu na drodze klasy highway; None = droga niedostępna."""
+    speed = SPEEDS_KMH[profile].get(highway or DEFAULT_HIGHWAY)
+    if speed is None:
+        return None
+    factor = MAXSPEED_FACTOR[profile]
+    if factor is not None and maxspeed is not None:
+        speed = maxspeed * factor
+    return speed
+
+
+def edge_weights(
+    profile: str,
+    lengths: Sequence[float],
+    highways: Sequence[Optional[str]],
+    maxspeeds: Sequence[Optional[float]],
+) -> List[float]:
+    """Czas przejazdu [s] każdej krawędzi (inf, gdy profil nie może nią jechać)."""
+    # klas (highway, maxspeed) jest kilkadziesiąt – prędkość liczymy raz na klasę
+    speeds: Dict[Tuple[Optional[str], Optional[float]], float] = {}
+    weights = []
+    for length, highway, maxspeed in zip(lengths, highways, maxspeeds):
+        key = (highway, maxspeed)
+        speed = speeds.get(key)
+        if speed is None:
+            speed = speeds[key] = speed_kmh(profile, highway, maxspeed) or 0.0
+        weights.append(length * 3.6 / speed if speed > 0 else math.inf)
+    return weights
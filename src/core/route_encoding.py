@@ -0,0 +1,74 @@
+"""
+Zwięzłe kodowanie geometrii tras dla klientów na słabym łączu:
+encoded polyline (algorytm Google) z konfigurowalną precyzją oraz
+upraszczanie linii (Douglas-Peucker) z tolerancją w metrach.
+"""
+from typing import List, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+
+# precyzja jak w Google Maps / OSRM (polyline5) i Valhalla (polyline6)
+DEFAULT_PRECISION = 5
+
+# metry na stopień szerokości geograficznej (w przybliżeniu)
+_M_PER_DEG = 111_320.0
+
+
+def encode_polyline(coords: np.ndarray, precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Koduje punkty (lat, lon) jako encoded polyline. Kolejne punkty
+    zapisywane są jako różnice, więc gęste trasy dają krótkie ciągi.
+    """
+    factor = 10 ** precision
+    ints = np.round(np.asarray(coords, dtype=np.float64) * factor).astype(np.int64)
+    if len(ints) == 0:
+        return ""
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+
+    out: List[str] = []
+    for value in deltas.ravel().tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            out.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        out.append(chr(value + 63))
+    return "".join(out)
+
+
+def decode_polyline(text: str, precision: int = DEFAULT_PRECISION) -> List[Tuple[float, float]]:
+    """Odwrotność encode_polyline – lista punktów (lat, lon)."""
+    values = []
+    value = shift = 0
+    for ch in text:
+        byte = ord(ch) - 63
+        value |= (byte & 0x1F) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+
+    ints = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0)
+    return [tuple(p) for p in (ints / 10 ** precision).tolist()]
+
+
+def simplify_line(line: LineString, tolerance_m: float) -> LineString:
+    """
+    Douglas-Peucker z tolerancją w metrach – liczony w układzie
+    (lon * cos(lat), lat), w którym stopnie odpowiadają metrom
+    jednakowo w obu osiach. Końce trasy zostają bez zmian.
+    """
+    if tolerance_m <= 0 or line.is_empty:
+        return line
+    lat0 = (line.bounds[1] + line.bounds[3]) / 2
+    scale = np.array([float(np.cos(np.radians(lat0))), 1.0])
+
+    scaled = shapely.transform(line, lambda xy: xy * scale)
+    simplified = shapely.simplify(scaled, tolerance_m / _M_PER_DEG, preserve_topology=False)
+    return shapely.transform(simplified, lambda xy: xy / scale)
+
+
+def line_latlon(line: LineString) -> np.ndarray:
+    """Wierzchołki linii (lon, lat) jako tablica (lat, lon)."""
+    return shapely.get_coordinates(line)[:, ::-1]
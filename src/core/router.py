@@ -1,103 +1,507 @@
-from typing import Tuple, Optional, Dict, Any
+import time
+from typing import Tuple, Optional, Dict, Any, List
 
 import networkx as nx
+import numpy as np
+import shapely
 from shapely.geometry import LineString
 
-from .utils import haversine_distance_m
+from .edge_bitset import EdgeBitset
+from .graph_index import GraphIndex, EdgeSnap
+from .metrics import stage
+from .search import SearchTree, multi_source_dijkstra
 
 
 class EvacRouter:
     """
     Odpowiada za wyznaczenie trasy z wykorzystaniem grafu dróg,
     z pominięciem krawędzi z atrybutem blocked=True.
+
+    Jeśli podano bitset `blocked` (np. scenariusz flood), to on decyduje
+    o blokadzie krawędzi (po atrybucie 'eid'), a atrybut 'blocked' w grafie
+    jest ignorowany. Graf nie jest w żaden sposób modyfikowany.
+
+    Punkty start / end są dociągane do najbliższej niezablokowanej krawędzi
+    (a nie węzła), a wyszukiwanie startuje z "wirtualnego węzła" na tej
+    krawędzi. Dzięki temu trasa jest poprawna także na długich odcinkach
+    i na grafie ze ściągniętymi łańcuchami węzłów stopnia 2.
+
+    Z `weights` (czasy przejazdu krawędzi [s] po eid – profil ruchu z
+    GraphIndex.profile_weights) wyszukiwana jest trasa najszybsza zamiast
+    najkrótszej, a meta zawiera dodatkowo "duration_s". Krawędzie niedostępne
+    dla profilu powinny być też w `blocked`, żeby nie dociągać do nich punktów.
     """
 
-    def __init__(self, graph: nx.Graph):
+    def __init__(
+        self,
+        graph: nx.Graph,
+        blocked: Optional[EdgeBitset] = None,
+        index: Optional[GraphIndex] = None,
+        components: Optional[np.ndarray] = None,
+        weights: Optional[List[float]] = None,
+    ):
         self.graph = graph
+        self.weights = weights
+        self.index = index if index is not None else GraphIndex(graph)
+
+        if blocked is None:
+            # brak bitsetu – blokady bierzemy z atrybutu 'blocked' krawędzi
+            blocked = EdgeBitset.from_eids(
+                self.index.edge_count,
+                (
+                    data["eid"]
+                    for _, _, data in graph.edges(data=True)
+                    if data.get("blocked", False)
+                ),
+            )
+        self.blocked = blocked
+
+        # etykiety spójnych składowych (po numerach węzłów z index) –
+        # pozwalają odrzucić parę bez trasy bez uruchamiania wyszukiwania
+        self.components = components
+
+    def _cost(self, eid: int, length_m: float) -> float:
+        """Koszt przejazdu length_m metrów krawędzi eid (metry albo sekundy profilu)."""
+        if self.weights is None:
+            return length_m
+        edge_length = self.index.edge_length[eid]
+        if edge_length <= 0:
+            return 0.0
+        return length_m * self.weights[eid] / edge_length
+
+    # --------------- składanie geometrii ----------------
+
+    def _piece(self, eid: int, from_m: float, to_m: float) -> Optional[LineString]:
+        """
+        Fragment krawędzi od from_m do to_m (metry od węzła u), skierowany
+        od from_m do to_m. None dla fragmentu zerowej długości.
+        """
+        if from_m == to_m:
+            return None
+        if from_m < to_m:
+            return self.index.edge_substring(eid, from_m, to_m)
+        return shapely.reverse(self.index.edge_substring(eid, to_m, from_m))
+
+    def _assemble(
+        self,
+        start: EdgeSnap,
+        end: EdgeSnap,
+        exit_root: Optional[int],
+        steps: List[Tuple[int, int]],
+        entry_node: Optional[int],
+        with_geometry: bool = True,
+    ) -> Tuple[Optional[LineString], float, int]:
+        """
+        Składa trasę: dojazd ze start do węzła wyjściowego, kolejne krawędzie
+        (steps = pary (węzeł, z którego wjeżdżamy, eid)) i dojazd z węzła
+        wejściowego do end. exit_root=None oznacza jazdę bezpośrednią, gdy
+        start i end leżą na tej samej krawędzi.
+
+        Zwraca (linia, długość, segmenty); bez with_geometry linia to None,
+        a wycinanie geometrii krawędzi jest pomijane.
+        """
+        index = self.index
+        # odcinki trasy: (eid, od [m], do [m]) licząc od węzła u krawędzi
+        spans: List[Tuple[int, float, float]] = []
+
+        if exit_root is None:
+            spans.append((start.eid, start.offset_m, end.offset_m))
+        else:
+            # exit_root mówi, przez który koniec krawędzi startowej wyjechaliśmy
+            s_len = index.edge_length[start.eid]
+            spans.append((start.eid, start.offset_m, 0.0 if exit_root == 0 else s_len))
+
+            for from_node, eid in steps:
+                length = index.edge_length[eid]
+                u_id, _ = index.edge_nodes(eid)
+                if u_id == from_node:
+                    spans.append((eid, 0.0, length))
+                else:
+                    spans.append((eid, length, 0.0))
+
+            t_len = index.edge_length[end.eid]
+            t_u, _ = index.edge_nodes(end.eid)
+            spans.append((end.eid, 0.0 if entry_node == t_u else t_len, end.offset_m))
+
+        total_length = sum(abs(to_m - from_m) for _, from_m, to_m in spans)
+        if not with_geometry:
+            # fragment zerowej długości nie daje segmentu (jak w _piece)
+            return None, total_length, sum(1 for _, from_m, to_m in spans if from_m != to_m)
+
+        coords: List[Tuple[float, float]] = []
+        segments = 0
+
+        for eid, from_m, to_m in spans:
+            line = self._piece(eid, from_m, to_m)
+            if line is None or line.is_empty:
+                continue
+            segments += 1
+            for xy in line.coords:
+                if not coords or coords[-1] != tuple(xy):
+                    coords.append(tuple(xy))
+
+        if not coords:
+            lat, lon = start.point
+            coords.append((lon, lat))
+        if len(coords) == 1:
+            coords.append(coords[0])
+
+        return LineString(coords), total_length, segments
 
-    def _find_nearest_node(self, coord: Tuple[float, float]) -> Tuple[float, float]:
+    @staticmethod
+    def _tree_steps(tree: SearchTree, node_id: int) -> List[Tuple[int, int]]:
+        """Kroki (węzeł, eid) od źródła drzewa do node_id."""
+        node_ids, eids = tree.path_to_root(node_id)
+        return list(zip(reversed(node_ids[1:]), reversed(eids)))
+
+    # --------------- wyszukiwanie ----------------
+
+    def _virtual_sources(self, snap: EdgeSnap) -> List[Tuple[int, float]]:
         """
-        Znajdź najbliższy węzeł w grafie do zadanych współrzędnych (lat, lon).
-        Prosta implementacja – przejście po wszystkich węzłach.
+        Wirtualny węzeł na krawędzi = oba jej końce z kosztem dojazdu od punktu
+        rzutu. Kolejność (u, v) odpowiada tree.root_of() 0 / 1.
         """
-        lat, lon = coord
-        best_node = None
-        best_dist = float("inf")
+        u, v = self.index.edge_nodes(snap.eid)
+        tail_m = self.index.edge_length[snap.eid] - snap.offset_m
+        return [(u, self._cost(snap.eid, snap.offset_m)), (v, self._cost(snap.eid, tail_m))]
+
+    def _direct_cost(self, start: EdgeSnap, end: EdgeSnap) -> float:
+        """Koszt jazdy bezpośredniej, gdy start i end leżą na tej samej krawędzi."""
+        return self._cost(start.eid, abs(end.offset_m - start.offset_m))
 
-        for node in self.graph.nodes:
-            node_lat, node_lon = node  # bo używamy (lat, lon) jako identyfikatora
-            d = haversine_distance_m((lat, lon), (node_lat, node_lon))
-            if d < best_dist:
-                best_dist = d
-                best_node = node
+    def snap(self, start_coord, end_coord) -> Optional[Tuple[EdgeSnap, EdgeSnap]]:
+        """
+        Punkty start / end dociągnięte do krawędzi albo None, gdy trasy
+        na pewno nie ma (brak krawędzi, różne spójne składowe). Wynik można
+        podać jako snapped do find_route / find_alternatives.
+        """
+        index = self.index
+        if self.blocked.count() >= index.edge_count:
+            return None
+
+        start = index.nearest_edge(start_coord, self.blocked)
+        end = index.nearest_edge(end_coord, self.blocked)
+        if start is None or end is None:
+            return None
 
-        if best_node is None:
-            raise ValueError("Graf nie zawiera żadnych węzłów")
+        # niezablokowana krawędź leży w jednej składowej, więc wystarczy u
+        if self.components is not None:
+            s_u, _ = index.edge_nodes(start.eid)
+            t_u, _ = index.edge_nodes(end.eid)
+            if self.components[s_u] != self.components[t_u]:
+                return None
 
-        return best_node
+        return start, end
 
     def find_route(
-        self, start_coord: Tuple[float, float], end_coord: Tuple[float, float]
-    ) -> Optional[Tuple[LineString, Dict[str, Any]]]:
+        self,
+        start_coord: Tuple[float, float],
+        end_coord: Tuple[float, float],
+        with_geometry: bool = True,
+        snapped: Optional[Tuple[EdgeSnap, EdgeSnap]] = None,
+    ) -> Optional[Tuple[Optional[LineString], Dict[str, Any]]]:
         """
         Znajduje trasę z punktu start do end, omijając blocked edges.
         Zwraca: (geometry LineString, meta) lub None jeśli nie ma ścieżki.
+        Bez with_geometry geometria to None – liczone są tylko długość
+        i segmenty (np. dla tras wsadowych). snapped: wynik snap(), jeśli
+        punkty zostały już dociągnięte.
         """
-        # budujemy podgraf z odblokowanych krawędzi
-        G_walkable = nx.Graph()
-        G_walkable.add_nodes_from(self.graph.nodes(data=True))
+        t0 = time.perf_counter()
+        index = self.index
+        blocked_edges_count = self.blocked.count()
 
-        blocked_edges_count = 0
+        if snapped is None:
+            with stage("snap"):
+                snapped = self.snap(start_coord, end_coord)
+        if snapped is None:
+            return None
+        start, end = snapped
+        t_u, t_v = index.edge_nodes(end.eid)
+
+        with stage("search"):
+            result = self._search(start, end, t_u, t_v, with_geometry)
+        if result is None:
+            return None
+        route_line, total_length, segments, edge_ids, cost = result
 
-        for u, v, data in self.graph.edges(data=True):
-            if data.get("blocked", False):
-                blocked_edges_count += 1
+        meta = {
+            "length_m": total_length,
+            "segments": segments,
+            "calc_time_ms": (time.perf_counter() - t0) * 1000.0,
+            "blocked_edges_count": blocked_edges_count,
+            "edge_ids": edge_ids,
+        }
+        if self.weights is not None:
+            meta["duration_s"] = cost
+
+        return route_line, meta
+
+    def _search(
+        self, start: EdgeSnap, end: EdgeSnap, t_u: int, t_v: int, with_geometry: bool = True
+    ) -> Optional[Tuple[Optional[LineString], float, int, List[int], float]]:
+        """
+        Najkrótsza (najtańsza) trasa: (linia, długość, segmenty,
+        eid użytych krawędzi, koszt).
+        """
+        tree = self.search_from([start], targets=[t_u, t_v])
+        return self.route_from_tree(tree, start, end, with_geometry)
+
+    def search_from(
+        self,
+        snaps: List[EdgeSnap],
+        targets: Optional[List[int]] = None,
+        cutoff: Optional[float] = None,
+    ) -> SearchTree:
+        """
+        Drzewo najkrótszych ścieżek z wirtualnych węzłów na krawędziach snaps
+        (jednego startu albo np. wszystkich schronów naraz). tree.root_of(n) // 2
+        to pozycja na liście snaps, tree.root_of(n) % 2 – koniec krawędzi,
+        przez który wyjechano (0 = u, 1 = v).
+        """
+        sources = [source for snap in snaps for source in self._virtual_sources(snap)]
+        return multi_source_dijkstra(
+            self.index,
+            sources,
+            blocked=self.blocked,
+            weights=self.weights,
+            targets=targets,
+            cutoff=cutoff,
+        )
+
+    def route_from_tree(
+        self, tree: SearchTree, start: EdgeSnap, end: EdgeSnap, with_geometry: bool = True
+    ) -> Optional[Tuple[Optional[LineString], float, int, List[int], float]]:
+        """
+        Trasa ze start do end po drzewie search_from([start]) – jedno drzewo
+        obsługuje wiele celów (np. wiersz macierzy tras wsadowych).
+        Zwraca (linia, długość, segmenty, eid użytych krawędzi, koszt) albo None.
+        """
+        best_cost = float("inf")
+        best_entry: Optional[int] = None
+
+        if start.eid == end.eid:
+            best_cost = self._direct_cost(start, end)
+
+        for entry, tail in self._virtual_sources(end):
+            if not tree.reachable(entry):
                 continue
-            G_walkable.add_edge(u, v, **data)
+            cost = tree.distance(entry) + tail
+            if cost < best_cost:
+                best_cost = cost
+                best_entry = entry
 
-        if G_walkable.number_of_edges() == 0:
+        if best_cost == float("inf"):
             return None
 
-        start_node = self._find_nearest_node(start_coord)
-        end_node = self._find_nearest_node(end_coord)
+        if best_entry is None:
+            return self._assemble(start, end, None, [], None, with_geometry) + ([start.eid], best_cost)
 
-        try:
-            path_nodes = nx.shortest_path(
-                G_walkable,
-                source=start_node,
-                target=end_node,
-                weight="length_m",
-            )
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
+        steps = self._tree_steps(tree, best_entry)
+        edge_ids = list(dict.fromkeys(
+            [start.eid] + [eid for _, eid in steps] + [end.eid]
+        ))
+        return self._assemble(
+            start,
+            end,
+            tree.root_of(best_entry),
+            steps,
+            best_entry,
+            with_geometry,
+        ) + (edge_ids, best_cost)
+
+    def route_to_tree(
+        self, tree: SearchTree, start: EdgeSnap, ends: List[EdgeSnap], with_geometry: bool = True
+    ) -> Optional[Tuple[Optional[LineString], float, int, List[int], float, int]]:
+        """
+        Trasa ze start do najbliższego z ends po drzewie search_from(ends)
+        (drzewo od celów – graf jest nieskierowany). Nie uruchamia
+        przeszukiwania, tylko idzie po poprzednikach.
+        Zwraca (linia, długość, segmenty, eid krawędzi, koszt, pozycja celu
+        na liście ends) albo None.
+        """
+        best_cost = float("inf")
+        best_exit: Optional[int] = None
+        best_end: Optional[int] = None
+
+        for i, end in enumerate(ends):
+            if end.eid == start.eid and self._direct_cost(start, end) < best_cost:
+                best_cost, best_end = self._direct_cost(start, end), i
+
+        for exit_root, (node, head) in enumerate(self._virtual_sources(start)):
+            if not tree.reachable(node):
+                continue
+            cost = head + tree.distance(node)
+            if cost < best_cost:
+                best_cost, best_exit, best_end = cost, exit_root, None
+
+        if best_cost == float("inf"):
             return None
 
+        if best_end is not None:
+            end = ends[best_end]
+            return self._assemble(start, end, None, [], None, with_geometry) + (
+                [start.eid], best_cost, best_end,
+            )
 
-        coords = []
-        total_length = 0.0
+        node = self._virtual_sources(start)[best_exit][0]
+        node_ids, eids = tree.path_to_root(node)
+        end_index = tree.root_of(node) // 2
+        end = ends[end_index]
+        edge_ids = list(dict.fromkeys([start.eid] + eids + [end.eid]))
+        return self._assemble(
+            start,
+            end,
+            best_exit,
+            list(zip(node_ids[:-1], eids)),
+            node_ids[-1],
+            with_geometry,
+        ) + (edge_ids, best_cost, end_index)
 
-        for i in range(len(path_nodes) - 1):
-            curr_node = path_nodes[i]
-            next_node = path_nodes[i + 1]
+    def find_alternatives(
+        self,
+        start_coord: Tuple[float, float],
+        end_coord: Tuple[float, float],
+        k: int = 3,
+        max_overlap: float = 0.6,
+        max_stretch: float = 1.4,
+        snapped: Optional[Tuple[EdgeSnap, EdgeSnap]] = None,
+    ) -> List[Tuple[LineString, Dict[str, Any]]]:
+        """
+        Do k tras alternatywnych (pierwsza = najkrótsza) metodą "via node".
 
-            # dodajemy koordynaty w formie (lon, lat) do LineString
-            curr_lat, curr_lon = curr_node
-            coords.append((curr_lon, curr_lat))
+        Liczymy tylko dwa przeszukiwania: drzewo od startu i drzewo od celu,
+        oba ograniczone do max_stretch × długość najkrótszej trasy. Każdy węzeł v
+        osiągalny z obu stron wyznacza kandydata start → v → cel o długości
+        d_start(v) + d_cel(v); kandydatów sprawdzamy od najkrótszych i
+        odrzucamy te z pętlą albo dzielące z już wybraną trasą więcej niż
+        max_overlap swojej długości. Kolejne alternatywy nie wymagają więc
+        nowych przeszukiwań.
+        """
+        t0 = time.perf_counter()
+        index = self.index
+        blocked_edges_count = self.blocked.count()
 
-            edge_data = G_walkable.get_edge_data(curr_node, next_node)
-            if edge_data:
-                total_length += edge_data.get("length_m", 0.0)
+        if snapped is None:
+            with stage("snap"):
+                snapped = self.snap(start_coord, end_coord)
+        if snapped is None:
+            return []
 
+        with stage("search"):
+            routes = self._search_alternatives(
+                snapped, k, max_overlap, max_stretch, blocked_edges_count
+            )
 
-        last_lat, last_lon = path_nodes[-1]
-        coords.append((last_lon, last_lat))
+        calc_time_ms = (time.perf_counter() - t0) * 1000.0
+        for _, meta in routes:
+            meta["calc_time_ms"] = calc_time_ms
+        return routes
 
-        route_line = LineString(coords)
+    def _search_alternatives(
+        self,
+        snapped: Tuple[EdgeSnap, EdgeSnap],
+        k: int,
+        max_overlap: float,
+        max_stretch: float,
+        blocked_edges_count: int,
+    ) -> List[Tuple[LineString, Dict[str, Any]]]:
+        index = self.index
+        start, end = snapped
+        t_u, t_v = index.edge_nodes(end.eid)
 
-        meta = {
-            "length_m": total_length,
-            "segments": len(path_nodes) - 1,
-            "calc_time_ms": 0,
-            "blocked_edges_count": blocked_edges_count,
-        }
+        forward = multi_source_dijkstra(
+            index,
+            self._virtual_sources(start),
+            blocked=self.blocked,
+            weights=self.weights,
+            targets=[t_u, t_v],
+            target_slack=max_stretch,
+        )
 
-        return route_line, meta
+        best_cost = min(
+            (forward.distance(n) + tail for n, tail in self._virtual_sources(end)),
+            default=float("inf"),
+        )
+        direct = start.eid == end.eid
+        if direct:
+            best_cost = min(best_cost, self._direct_cost(start, end))
+        if best_cost == float("inf"):
+            return []
+
+        backward = multi_source_dijkstra(
+            index,
+            self._virtual_sources(end),
+            blocked=self.blocked,
+            weights=self.weights,
+            cutoff=best_cost * max_stretch,
+        )
+
+        # węzły pośrednie osiągnięte z obu stron, od najtańszego objazdu
+        limit = best_cost * max_stretch
+        total: Dict[int, float] = {}
+        for v, back_cost in zip(backward.nodes.tolist(), backward.dist.tolist()):
+            cost = forward.distance(v) + back_cost
+            if cost <= limit:
+                total[v] = cost
+        candidates = sorted(total, key=lambda v: (total[v], v))
+
+        routes: List[Tuple[LineString, Dict[str, Any]]] = []
+        accepted_edges: List[Dict[int, float]] = []
+        covered = set()
+
+        def accept(line, length, segments, edges: Dict[int, float], cost: float) -> None:
+            meta = {
+                "length_m": length,
+                "segments": segments,
+                "calc_time_ms": 0,
+                "blocked_edges_count": blocked_edges_count,
+                "edge_ids": list(edges),
+            }
+            if self.weights is not None:
+                meta["duration_s"] = cost
+            routes.append((line, meta))
+            accepted_edges.append(edges)
+
+        if direct and self._direct_cost(start, end) <= best_cost:
+            line, length, segments = self._assemble(start, end, None, [], None)
+            accept(line, length, segments, {start.eid: length}, self._direct_cost(start, end))
+
+        for v in candidates:
+            if len(routes) >= k:
+                break
+            if v in covered:
+                continue
+
+            head = self._tree_steps(forward, v)
+            back_nodes, back_eids = backward.path_to_root(v)
+            tail = list(zip(back_nodes[:-1], back_eids))
+
+            # pętla: część od startu i część do celu mają wspólny węzeł
+            head_nodes = {n for n, _ in head}
+            if head_nodes.intersection(back_nodes[1:]):
+                continue
+
+            steps = head + tail
+            entry_node = back_nodes[-1]
+            edges = {eid: index.edge_length[eid] for _, eid in steps}
+            edges[start.eid] = edges.get(start.eid, 0.0) + index.edge_length[start.eid]
+            edges[end.eid] = edges.get(end.eid, 0.0) + index.edge_length[end.eid]
+
+            # wszystkie węzły tej ścieżki dają tę samą trasę – pomijamy je później
+            covered.update(head_nodes)
+            covered.update(back_nodes)
+
+            cand_length = sum(edges.values())
+            if any(
+                sum(length for eid, length in edges.items() if eid in other) > max_overlap * cand_length
+                for other in accepted_edges
+            ):
+                continue
+
+            line, length, segments = self._assemble(
+                start, end, forward.root_of(v), steps, entry_node
+            )
+            accept(line, length, segments, edges, total[v])
+
+        return routes
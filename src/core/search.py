@@ -0,0 +1,210 @@
+import heapq
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .edge_bitset import EdgeBitset
+from .graph_index import GraphIndex
+
+
+@dataclass
+class SearchTree:
+    """
+    Drzewo najkrótszych ścieżek – tylko węzły rozliczone w przeszukiwaniu,
+    w zwartych tablicach (pozycja k odpowiada węzłowi nodes[k]). Rozmiar
+    zależy od przeszukanego obszaru, a nie od całego grafu.
+
+    nodes[k]     – numer węzła (w kolejności rozliczania, rosnąco po dist),
+    dist[k]      – odległość [m] od najbliższego źródła,
+    pred_node[k] – poprzednik na ścieżce do źródła (-1 dla źródeł),
+    pred_edge[k] – eid krawędzi do poprzednika (-1 jw.),
+    root[k]      – numer źródła (pozycja na liście sources), z którego dotarto.
+    Węzły spoza drzewa są nieosiągalne (albo poza cutoff / celami).
+    """
+    nodes: np.ndarray
+    dist: np.ndarray
+    pred_node: np.ndarray
+    pred_edge: np.ndarray
+    root: np.ndarray
+    settled: int = 0
+    positions: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    def reachable(self, node_id: int) -> bool:
+        return node_id in self.positions
+
+    def distance(self, node_id: int) -> float:
+        """Odległość do węzła (inf, jeśli nie ma go w drzewie)."""
+        k = self.positions.get(node_id)
+        return float(self.dist[k]) if k is not None else float("inf")
+
+    def root_of(self, node_id: int) -> int:
+        """Numer źródła, z którego dotarto do węzła (-1, jeśli nie ma go w drzewie)."""
+        k = self.positions.get(node_id)
+        return int(self.root[k]) if k is not None else -1
+
+    def path_to_root(self, node_id: int) -> Tuple[List[int], List[int]]:
+        """
+        Idzie po poprzednikach od node_id do źródła.
+        Zwraca (numery węzłów, eid krawędzi) w kolejności od node_id.
+        """
+        nodes = [node_id]
+        edges: List[int] = []
+        positions = self.positions
+        pred_node = self.pred_node
+        pred_edge = self.pred_edge
+
+        k = positions.get(node_id)
+        while k is not None and pred_node[k] >= 0:
+            edges.append(int(pred_edge[k]))
+            nodes.append(int(pred_node[k]))
+            k = positions.get(nodes[-1])
+
+        return nodes, edges
+
+
+def multi_source_dijkstra(
+    index: GraphIndex,
+    sources: Iterable[Tuple[int, float]],
+    blocked: Optional[EdgeBitset] = None,
+    cutoff: Optional[float] = None,
+    weights: Optional[List[float]] = None,
+    targets: Optional[Iterable[int]] = None,
+    target_slack: float = 1.0,
+) -> SearchTree:
+    """
+    Dijkstra z wielu źródeł naraz po listach sąsiedztwa GraphIndex.
+
+    sources: pary (numer węzła, odległość początkowa) – odległość początkowa
+             pozwala startować np. ze środka krawędzi.
+    blocked: bitset krawędzi pomijanych w przeszukiwaniu.
+    cutoff:  maksymalna odległość – dalsze węzły nie są rozliczane.
+    weights: wagi krawędzi po eid (domyślnie długości w metrach).
+    targets: jeśli podane, przeszukiwanie kończy się po rozliczeniu
+             wszystkich tych węzłów (pozostałe mogą zostać nieosiągalne).
+    target_slack: przy targets > 1 przeszukiwanie nie kończy się od razu,
+             tylko rozlicza dalej węzły do odległości (d_celu * target_slack) –
+             np. pod trasy alternatywne nieco dłuższe od najkrótszej.
+
+    Stan przeszukiwania trzymany jest w słownikach po dotkniętych węzłach,
+    więc zapytanie ograniczone celem albo cutoff nie kosztuje O(n) czasu
+    ani pamięci.
+
+    Graf jest nieskierowany, więc drzewo z celów (np. schronów) jest zarazem
+    "odwrotnym" drzewem najkrótszych ścieżek do tych celów.
+    """
+    inf = float("inf")
+    # najlepsza znana odległość i (poprzednik, eid, źródło) dotkniętych węzłów
+    best: Dict[int, float] = {}
+    pred: Dict[int, Tuple[int, int, int]] = {}
+    # rozliczone węzły -> odległość, w kolejności rozliczania
+    dist: Dict[int, float] = {}
+
+    adj = index.adj
+    length = weights if weights is not None else index.edge_length
+    bits = blocked
+
+    heap = []
+    for i, (node_id, d0) in enumerate(sources):
+        if d0 < best.get(node_id, inf):
+            best[node_id] = d0
+            pred[node_id] = (-1, -1, i)
+            heapq.heappush(heap, (d0, node_id))
+
+    remaining = set(targets) if targets is not None else None
+    if remaining is not None and not remaining:
+        heap = []
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in dist:
+            continue
+        if cutoff is not None and d > cutoff:
+            break
+        dist[u] = d
+        root_u = pred[u][2]
+
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                if target_slack <= 1.0:
+                    break
+                slack_cutoff = d * target_slack
+                cutoff = slack_cutoff if cutoff is None else min(cutoff, slack_cutoff)
+                remaining = None
+
+        # rozliczone węzły mają best <= d, więc odpadają na porównaniu
+        for v, eid in adj[u]:
+            if bits is not None and bits.is_set(eid):
+                continue
+            nd = d + length[eid]
+            if nd < best.get(v, inf):
+                best[v] = nd
+                pred[v] = (u, eid, root_u)
+                heapq.heappush(heap, (nd, v))
+
+    # tablice tylko dla rozliczonych węzłów – dotknięte, ale nierozliczone
+    # (poza cutoff) traktujemy jak nieosiągalne
+    order = list(dist)
+    links = np.fromiter(
+        chain.from_iterable(map(pred.__getitem__, order)),
+        dtype=np.int32,
+        count=3 * len(order),
+    ).reshape(-1, 3)
+    return SearchTree(
+        nodes=np.array(order, dtype=np.int32),
+        dist=np.fromiter(dist.values(), dtype=np.float64, count=len(order)),
+        pred_node=links[:, 0],
+        pred_edge=links[:, 1],
+        root=links[:, 2],
+        settled=len(order),
+        positions=dict(zip(order, range(len(order)))),
+    )
+
+
+def connected_components(
+    index: GraphIndex,
+    blocked: Optional[EdgeBitset] = None,
+) -> np.ndarray:
+    """
+    Etykiety spójnych składowych grafu po pominięciu zablokowanych krawędzi.
+
+    labels[i] to numer składowej węzła i; składowe numerowane są od
+    największej (0) do najmniejszej, więc 0 to "główna" sieć dróg.
+    Dwa węzły o różnych etykietach na pewno nie mają między sobą trasy.
+    """
+    n = index.node_count
+    labels = [-1] * n
+    adj = index.adj
+    bits = blocked
+
+    current = 0
+    for seed in range(n):
+        if labels[seed] >= 0:
+            continue
+
+        labels[seed] = current
+        stack = [seed]
+        while stack:
+            u = stack.pop()
+            for v, eid in adj[u]:
+                if labels[v] >= 0:
+                    continue
+                if bits is not None and bits.is_set(eid):
+                    continue
+                labels[v] = current
+                stack.append(v)
+
+        current += 1
+
+    labels_arr = np.asarray(labels, dtype=np.int32)
+    if n == 0:
+        return labels_arr
+
+    # przenumerowanie: największa składowa dostaje 0
+    sizes = np.bincount(labels_arr)
+    order = np.argsort(-sizes, kind="stable")
+    remap = np.empty_like(order, dtype=np.int32)
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    return remap[labels_arr]
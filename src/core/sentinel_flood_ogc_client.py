@@ -1,9 +1,10 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import requests
@@ -12,6 +13,8 @@ from shapely.geometry import box, Polygon, MultiPolygon, mapping
 from shapely.ops import unary_union
 from dotenv import load_dotenv
 
+from .flood_series import FloodSeries, discard_version, new_version_dir, open_series, publish_version
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -29,6 +32,11 @@ GREEN_MAX = 30
 BLOCK_SIZE = 4
 MIN_FRACTION_IN_BLOCK = 0.1 
 
+DEFAULT_WMS_URL = "https://services.sentinel-hub.com/ogc/wms"
+
+# ile warstw czasowych pobieramy naraz
+SERIES_WORKERS = 4
+
 
 @dataclass
 class SentinelOGCConfig:
@@ -40,7 +48,7 @@ class SentinelOGCConfig:
     NIE client_id od OAuth!
     """
     instance_id: str
-    base_url: str = "https://services.sentinel-hub.com/ogc/wms"
+    base_url: str = DEFAULT_WMS_URL
     layer: str = "FLOOD"
     time: str = "2023-01-01/2025-12-31"
 
@@ -86,9 +94,72 @@ class SentinelOGCFloodClient:
 
         return len(polygons)
 
+    def fetch_time_series(
+        self,
+        bbox: Tuple[float, float, float, float],
+        times: Sequence[str],
+        series_dir: Path,
+        max_workers: int = SERIES_WORKERS,
+    ) -> FloodSeries:
+        """
+        Pobiera mapy zalania dla kolejnych przedziałów czasu (równolegle)
+        i zapisuje ich maski jako upakowany bitowo stos na wspólnej siatce
+        bboxa (src/core/flood_series.py). Zwraca nową, aktualną serię.
+        """
+        if not times:
+            raise ValueError("Pusta lista przedziałów czasu")
+
+        version_dir, generation = new_version_dir(series_dir)
+        shape = (WMS_HEIGHT // BLOCK_SIZE, WMS_WIDTH // BLOCK_SIZE)
+
+        def fetch(index: int) -> Tuple[int, np.ndarray]:
+            img = self._fetch_wms_png(bbox, time=times[index])
+            mask = self._image_to_water_mask(img)
+            return index, self._downsample_mask(mask, BLOCK_SIZE, MIN_FRACTION_IN_BLOCK)
+
+        logger.info(
+            "Pobieram %d warstw czasowych zalania (%d równolegle)", len(times), max_workers
+        )
+        try:
+            masks = FloodSeries.create(version_dir, bbox, shape, times, generation)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(fetch, i) for i in range(len(times))]
+                try:
+                    for future in as_completed(futures):
+                        index, coarse_mask = future.result()
+                        FloodSeries.write_mask(masks, index, coarse_mask)
+                except BaseException:
+                    # pozostałe warstwy i tak nie trafią do serii
+                    for future in futures:
+                        future.cancel()
+                    raise
+            masks.flush()
+            del masks
+        except BaseException:
+            # na dysku zostają tylko kompletne wersje serii
+            discard_version(version_dir)
+            raise
+
+        if not publish_version(series_dir, version_dir):
+            # równolegle pobrano i opublikowano nowszą serię – to ona jest aktualna
+            logger.info("Seria %s jest starsza niż opublikowana – pomijam", version_dir)
+            return open_series(series_dir)
+        series = FloodSeries(version_dir)
+        logger.info("Zapisano serię %d warstw (%d B) w %s", len(series), series.nbytes, version_dir)
+        return series
+
+    @classmethod
+    def mask_to_geojson(
+        cls, coarse_mask: np.ndarray, bbox: Tuple[float, float, float, float]
+    ) -> dict:
+        """Maska na siatce bboxa -> GeoJSON poligonów (jak w update_flood_for_bbox)."""
+        return cls._polygons_to_geojson(cls._mask_to_polygons(coarse_mask, bbox))
+
     # --------------- KROK 1 – WMS PNG ----------------
 
-    def _fetch_wms_png(self, bbox: Tuple[float, float, float, float]) -> Image.Image:
+    def _fetch_wms_png(
+        self, bbox: Tuple[float, float, float, float], time: Optional[str] = None
+    ) -> Image.Image:
         south, west, north, east = bbox
 
 
@@ -106,7 +177,7 @@ class SentinelOGCFloodClient:
             "BBOX": f"{south},{west},{north},{east}",
             "WIDTH": str(WMS_WIDTH),
             "HEIGHT": str(WMS_HEIGHT),
-            "TIME": self.config.time,
+            "TIME": time or self.config.time,
             "SHOWLOGO": "false",
         }
 
@@ -179,8 +250,9 @@ class SentinelOGCFloodClient:
 
        # --------------- KROK 4 – maska -> poligony ----------------
 
+    @classmethod
     def _mask_to_polygons(
-        self,
+        cls,
         coarse_mask: np.ndarray,
         bbox: Tuple[float, float, float, float],
     ) -> List[Polygon]:
@@ -236,7 +308,7 @@ class SentinelOGCFloodClient:
         logger.info("Po union() zostało %d poligonów (przed filtrowaniem).", len(polygons))
 
         # 🔹 NOWE: usuń bardzo małe plamki (pojedyncze 'kropki')
-        polygons = self._remove_small_polygons(
+        polygons = cls._remove_small_polygons(
             polygons,
             lat_step=lat_step,
             lon_step=lon_step,
@@ -249,7 +321,8 @@ class SentinelOGCFloodClient:
 
     # --------------- KROK 5 – zapis GeoJSON ----------------
 
-    def _polygons_to_geojson(self, polygons: List[Polygon]) -> dict:
+    @staticmethod
+    def _polygons_to_geojson(polygons: List[Polygon]) -> dict:
         features = []
         for idx, poly in enumerate(polygons):
             if poly.is_empty:
@@ -279,8 +352,8 @@ class SentinelOGCFloodClient:
         )
         logger.info("Zapisano flood.geojson do %s", self.flood_path)
 
+    @staticmethod
     def _remove_small_polygons(
-        self,
         polygons: List[Polygon],
         lat_step: float,
         lon_step: float,
@@ -312,6 +385,7 @@ class SentinelOGCFloodClient:
 def create_default_ogc_client() -> SentinelOGCFloodClient:
     """
     Tworzy klienta na podstawie SENTINELHUB_INSTANCE_ID / INSTANCE_ID z .env.
+    SENTINELHUB_WMS_URL pozwala wskazać inny serwer WMS (np. lokalny zastępczy).
     """
     instance_id = os.getenv("SENTINELHUB_INSTANCE_ID") or os.getenv("INSTANCE_ID")
     if not instance_id:
@@ -320,5 +394,8 @@ def create_default_ogc_client() -> SentinelOGCFloodClient:
             "ustaw tam ID instancji z Sentinel Hub (NIE client_id OAuth)."
         )
 
-    config = SentinelOGCConfig(instance_id=instance_id)
+    config = SentinelOGCConfig(
+        instance_id=instance_id,
+        base_url=os.getenv("SENTINELHUB_WMS_URL", DEFAULT_WMS_URL),
+    )
     return SentinelOGCFloodClient(config=config)
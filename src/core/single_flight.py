@@ -0,0 +1,77 @@
+"""
+Łączenie identycznych równoległych wywołań ("single flight").
+
+Pierwsze wywołanie dla danego klucza liczy wynik, a kolejne – przychodzące,
+zanim skończy – czekają na ten sam wynik (albo ten sam wyjątek) zamiast
+liczyć go jeszcze raz. Po zakończeniu klucz jest zwalniany, więc następne
+wywołanie liczy już od nowa (np. pobiera świeże dane).
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .metrics import counter
+
+COALESCED = counter(
+    "evac_coalesced_requests_total",
+    "Wywołania obsłużone wynikiem identycznego wywołania w toku (kind: route / flood / flood_series)",
+)
+
+# precyzja bboxa w kluczach (5 miejsc ≈ 1 m) – bboxy z mapy różnią się
+# zwykle w dalszych miejscach po przecinku
+BBOX_KEY_DECIMALS = 5
+
+
+def bbox_key(bbox: Tuple[float, float, float, float]) -> Tuple[float, ...]:
+    """Znormalizowany bbox (south, west, north, east) do klucza."""
+    return tuple(round(float(v), BBOX_KEY_DECIMALS) for v in bbox)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Wywołania w toku po kluczu; kind to etykieta w metryce COALESCED."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Wynik fn() dla klucza i flaga, czy był współdzielony (policzony
+        przez inne, równoległe wywołanie).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(kind=self.kind)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
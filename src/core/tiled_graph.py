@@ -0,0 +1,607 @@
+"""
+Graf dróg pocięty na kafle przestrzenne na dysku – dla zasięgu całego kraju,
+gdy sieć nie mieści się w pamięci jako jeden nx.Graph.
+
+    python -m src.core.tiled_graph data/regions/poland.npz data/tiles/poland --tile-deg 0.25
+
+Katalog kafli:
+
+    tiles.json                – rozmiar kafla [stopnie], liczby węzłów i krawędzi
+                                oraz lista kafli z zakresem numerów ich węzłów,
+    tile_<wiersz>_<kol>.npz   – węzły kafla (node_lat, node_lon) i wszystkie
+                                krawędzie, które się w nich kończą:
+                                edge_id, edge_u, edge_v, edge_length, edge_forward,
+                                geom_offsets, geom_coords (jak w graph_snapshot).
+
+Węzły ponumerowane są kaflami (węzły jednego kafla mają kolejne numery), więc
+kafel węzła to wyszukiwanie binarne po początkach zakresów. Krawędź przecinająca
+granicę zapisana jest w obu kaflach, a jej obcy koniec (węzeł graniczny) ma ten
+sam, globalny numer – przeszukiwanie przechodzi nim do sąsiedniego kafla bez
+osobnej tablicy zszyć. Numery krawędzi (eid) też są globalne, więc blokady flood
+to zwykły EdgeBitset.
+
+TiledGraph wczytuje kafel dopiero, gdy sięga do niego front przeszukiwania,
+i trzyma ostatnio używane w LRU (TILE_CACHE_SIZE) – pamięć zależy od obszaru
+zapytań, a nie od rozmiaru sieci. TiledRouter szuka trasy algorytmem A*
+(heurystyka: odległość w linii prostej do celu), żeby front – a więc i liczba
+wczytanych kafli – nie rozlewał się we wszystkie strony.
+"""
+import argparse
+import bisect
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, box
+from shapely.strtree import STRtree
+
+from .edge_bitset import EdgeBitset
+from .graph_index import EdgeSnap, line_substring, scaled_line
+from .graph_snapshot import SUPPORTED_VERSIONS
+from .metrics import counter, stage
+from .utils import haversine_distance_m
+
+logger = logging.getLogger(__name__)
+
+TILES_VERSION = 1
+MANIFEST_FILE = "tiles.json"
+
+# domyślny bok kafla [stopnie] – ok. 28 × 18 km na szerokości Polski
+DEFAULT_TILE_DEG = 0.25
+
+# ile kafli trzymamy w pamięci naraz
+TILE_CACHE_SIZE = 64
+
+# heurystyka A* to odległość haversine; mnożnik < 1 chroni przed
+# przeszacowaniem przez błędy zaokrągleń długości krawędzi
+HEURISTIC_FACTOR = 0.999
+
+TILE_LOADS = counter(
+    "evac_graph_tile_loads_total",
+    "Wczytania kafli grafu z dysku (także ponowne, po wyrzuceniu z LRU)",
+)
+
+
+def _tile_file(key: str) -> str:
+    return f"tile_{key}.npz"
+
+
+def _tile_key(row: int, col: int) -> str:
+    return f"{row}_{col}"
+
+
+# ---------------- cięcie zrzutu na kafle ----------------
+
+def build_tiles(
+    snapshot_path: Union[str, Path],
+    out_dir: Union[str, Path],
+    tile_deg: float = DEFAULT_TILE_DEG,
+) -> Dict[str, Any]:
+    """
+    Tnie zrzut grafu .npz na kafle tile_deg × tile_deg stopni w out_dir.
+    Zwraca zapisany manifest (tiles.json). Operuje na tablicach zrzutu,
+    bez budowania grafu networkx.
+    """
+    if tile_deg <= 0:
+        raise ValueError("tile_deg musi być dodatnie")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with np.load(Path(snapshot_path)) as data:
+        version = int(data["version"])
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Nieobsługiwana wersja zrzutu grafu: {version}")
+        node_lat = data["node_lat"]
+        node_lon = data["node_lon"]
+        edge_u = data["edge_u"].astype(np.int64)
+        edge_v = data["edge_v"].astype(np.int64)
+        edge_length = data["edge_length"]
+        offsets = data["geom_offsets"]
+        geom_coords = data["geom_coords"]
+
+    n_nodes, n_edges = len(node_lat), len(edge_u)
+
+    # węzły po kaflach (wiersz, kolumna) – kafel to ciągły zakres numerów
+    rows = np.floor(node_lat / tile_deg).astype(np.int64)
+    cols = np.floor(node_lon / tile_deg).astype(np.int64)
+    order = np.lexsort((cols, rows))
+    new_id = np.empty(n_nodes, dtype=np.int64)
+    new_id[order] = np.arange(n_nodes)
+    node_lat, node_lon, rows, cols = node_lat[order], node_lon[order], rows[order], cols[order]
+
+    # czy geometria krawędzi zaczyna się w u (jak edge_forward w GraphIndex)
+    first = geom_coords[offsets[:-1]] if n_edges else np.zeros((0, 2))
+    forward = (first[:, 0] == node_lon[new_id[edge_u]]) & (first[:, 1] == node_lat[new_id[edge_u]])
+    edge_u, edge_v = new_id[edge_u], new_id[edge_v]
+
+    changes = np.flatnonzero((np.diff(rows) != 0) | (np.diff(cols) != 0)) + 1
+    starts = np.concatenate([[0], changes]).astype(np.int64) if n_nodes else np.zeros(0, np.int64)
+    ends = np.concatenate([changes, [n_nodes]]).astype(np.int64) if n_nodes else np.zeros(0, np.int64)
+    tile_of_node = np.repeat(np.arange(len(starts)), ends - starts)
+
+    # krawędź trafia do kafla każdego ze swoich końców
+    tu, tv = tile_of_node[edge_u], tile_of_node[edge_v]
+    crossing = np.flatnonzero(tu != tv)
+    entry_tile = np.concatenate([tu, tv[crossing]])
+    entry_eid = np.concatenate([np.arange(n_edges), crossing])
+    by_tile = np.argsort(entry_tile, kind="stable")
+    entry_eid = entry_eid[by_tile]
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(entry_tile, minlength=len(starts)))])
+
+    counts = np.diff(offsets)
+    tiles = []
+    for t in range(len(starts)):
+        key = _tile_key(int(rows[starts[t]]), int(cols[starts[t]]))
+        eids = entry_eid[bounds[t]:bounds[t + 1]]
+        n_coords = counts[eids]
+        local_offsets = np.concatenate([[0], np.cumsum(n_coords)]).astype(np.int64)
+        # indeksy wierzchołków geometrii wybranych krawędzi (bez pętli po krawędziach)
+        coord_idx = (
+            np.repeat(offsets[eids] - local_offsets[:-1], n_coords) + np.arange(local_offsets[-1])
+        )
+
+        tmp = out_dir / (_tile_file(key) + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                node_lat=node_lat[starts[t]:ends[t]],
+                node_lon=node_lon[starts[t]:ends[t]],
+                edge_id=eids.astype(np.int64),
+                edge_u=edge_u[eids].astype(np.int64),
+                edge_v=edge_v[eids].astype(np.int64),
+                edge_length=edge_length[eids].astype(np.float64),
+                edge_forward=forward[eids],
+                geom_offsets=local_offsets,
+                geom_coords=geom_coords[coord_idx].reshape(-1, 2),
+            )
+        tmp.replace(out_dir / _tile_file(key))
+        tiles.append({
+            "key": key,
+            "node_start": int(starts[t]),
+            "node_end": int(ends[t]),
+            "edges": int(len(eids)),
+            "boundary_edges": int(np.count_nonzero(tu[eids] != tv[eids])),
+        })
+
+    manifest = {
+        "version": TILES_VERSION,
+        "tile_deg": tile_deg,
+        "nodes": int(n_nodes),
+        "edges": int(n_edges),
+        "tiles": tiles,
+    }
+    tmp = out_dir / (MANIFEST_FILE + ".tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    tmp.replace(out_dir / MANIFEST_FILE)
+
+    # kafle z poprzedniego cięcia, których nie ma w nowym manifeście
+    keep = {_tile_file(tile["key"]) for tile in tiles}
+    for old in out_dir.glob("tile_*.npz"):
+        if old.name not in keep:
+            old.unlink()
+
+    logger.info(
+        "Pocięto graf na %d kafli (%g°): %d węzłów, %d krawędzi, %d na granicach kafli",
+        len(tiles), tile_deg, n_nodes, n_edges, len(crossing),
+    )
+    return manifest
+
+
+def is_tiled(path: Union[str, Path]) -> bool:
+    return (Path(path) / MANIFEST_FILE).is_file()
+
+
+# ---------------- kafle w pamięci ----------------
+
+class _Tile:
+    """
+    Wczytany kafel: listy sąsiedztwa jego węzłów i krawędzie po eid.
+
+    adj[i] (i = numer węzła - node_start) to krotki
+    (sąsiad, eid, długość, lat sąsiada, lon sąsiada) – współrzędne sąsiada
+    (także z innego kafla) pochodzą z końca geometrii krawędzi, więc
+    heurystyka A* nie wymaga wczytania kafla sąsiada.
+    """
+
+    def __init__(self, key: str, node_start: int, data):
+        self.key = key
+        self.node_start = node_start
+        self.node_lat: List[float] = data["node_lat"].tolist()
+        self.node_lon: List[float] = data["node_lon"].tolist()
+
+        self.edge_ids: List[int] = data["edge_id"].tolist()
+        self.edge_u: List[int] = data["edge_u"].tolist()
+        self.edge_v: List[int] = data["edge_v"].tolist()
+        self.edge_length: List[float] = data["edge_length"].tolist()
+        self.edge_forward: List[bool] = data["edge_forward"].tolist()
+        offsets = data["geom_offsets"]
+        coords = data["geom_coords"]
+        counts = np.diff(offsets)
+        self.edge_geoms = shapely.linestrings(
+            coords, indices=np.repeat(np.arange(len(counts)), counts)
+        ) if len(counts) else np.zeros(0, dtype=object)
+        self.positions: Dict[int, int] = {eid: i for i, eid in enumerate(self.edge_ids)}
+
+        first = coords[offsets[:-1]] if len(counts) else np.zeros((0, 2))
+        last = coords[offsets[1:] - 1] if len(counts) else np.zeros((0, 2))
+        self.adj: List[List[Tuple[int, int, float, float, float]]] = [[] for _ in self.node_lat]
+        for i, (eid, u, v, length, fwd) in enumerate(zip(
+            self.edge_ids, self.edge_u, self.edge_v, self.edge_length, self.edge_forward
+        )):
+            u_lon, u_lat = first[i] if fwd else last[i]
+            v_lon, v_lat = last[i] if fwd else first[i]
+            if 0 <= u - node_start < len(self.adj):
+                self.adj[u - node_start].append((v, eid, length, float(v_lat), float(v_lon)))
+            if 0 <= v - node_start < len(self.adj) and v != u:
+                self.adj[v - node_start].append((u, eid, length, float(u_lat), float(u_lon)))
+
+        self._tree: Optional[STRtree] = None
+
+    @property
+    def tree(self) -> STRtree:
+        # STRtree krawędzi kafla budujemy dopiero przy pierwszym dociąganiu punktu
+        if self._tree is None:
+            self._tree = STRtree(self.edge_geoms)
+        return self._tree
+
+    def edge(self, eid: int) -> "TileEdge":
+        i = self.positions[eid]
+        return TileEdge(
+            eid, self.edge_u[i], self.edge_v[i], self.edge_length[i],
+            self.edge_forward[i], self.edge_geoms[i],
+        )
+
+
+@dataclass
+class TileEdge:
+    eid: int
+    u: int
+    v: int
+    length: float
+    forward: bool
+    geom: LineString
+
+
+class TiledGraph:
+    """
+    Graf w kaflach z katalogu build_tiles; kafle wczytywane na żądanie
+    i trzymane w LRU o pojemności max_tiles.
+    """
+
+    def __init__(self, path: Union[str, Path], max_tiles: int = TILE_CACHE_SIZE):
+        self.path = Path(path)
+        manifest = json.loads((self.path / MANIFEST_FILE).read_text(encoding="utf-8"))
+        if manifest.get("version") != TILES_VERSION:
+            raise ValueError(f"Nieobsługiwana wersja kafli grafu: {manifest.get('version')}")
+        self.tile_deg: float = manifest["tile_deg"]
+        self.node_count: int = manifest["nodes"]
+        self.edge_count: int = manifest["edges"]
+        self.max_tiles = max_tiles
+
+        tiles = manifest["tiles"]
+        self._keys: List[str] = [tile["key"] for tile in tiles]
+        self._node_starts: List[int] = [tile["node_start"] for tile in tiles]
+        self._tile_starts: Dict[str, int] = {tile["key"]: tile["node_start"] for tile in tiles}
+
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, _Tile]" = OrderedDict()
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def resident_tiles(self) -> int:
+        with self._lock:
+            return len(self._resident)
+
+    def tile_key_of_node(self, node: int) -> str:
+        return self._keys[bisect.bisect_right(self._node_starts, node) - 1]
+
+    def tile(self, key: str) -> _Tile:
+        """Kafel z LRU albo wczytany z dysku. KeyError, jeśli kafla nie ma."""
+        with self._lock:
+            tile = self._resident.get(key)
+            if tile is not None:
+                self._resident.move_to_end(key)
+                return tile
+        node_start = self._tile_starts[key]
+
+        with np.load(self.path / _tile_file(key)) as data:
+            tile = _Tile(key, node_start, data)
+        TILE_LOADS.inc()
+
+        with self._lock:
+            self.loads += 1
+            self._resident[key] = tile
+            while len(self._resident) > self.max_tiles:
+                self._resident.popitem(last=False)
+        return tile
+
+    def neighbors(self, node: int) -> List[Tuple[int, int, float, float, float]]:
+        """(sąsiad, eid, długość, lat sąsiada, lon sąsiada) – patrz _Tile."""
+        tile = self.tile(self.tile_key_of_node(node))
+        return tile.adj[node - tile.node_start]
+
+    def node_coord(self, node: int) -> Tuple[float, float]:
+        tile = self.tile(self.tile_key_of_node(node))
+        i = node - tile.node_start
+        return tile.node_lat[i], tile.node_lon[i]
+
+    def edge(self, eid: int, node: int) -> TileEdge:
+        """Krawędź eid z kafla jej końca node."""
+        return self.tile(self.tile_key_of_node(node)).edge(eid)
+
+    def tiles_in(self, south: float, west: float, north: float, east: float) -> List[str]:
+        """Klucze istniejących kafli przecinających bbox."""
+        deg = self.tile_deg
+        keys = []
+        for row in range(math.floor(south / deg), math.floor(north / deg) + 1):
+            for col in range(math.floor(west / deg), math.floor(east / deg) + 1):
+                key = _tile_key(row, col)
+                if key in self._tile_starts:
+                    keys.append(key)
+        return keys
+
+    def nearest_edge(
+        self, coord: Tuple[float, float], blocked: Optional[EdgeBitset] = None
+    ) -> Optional[Tuple[EdgeSnap, TileEdge]]:
+        """
+        Rzutuje punkt (lat, lon) na najbliższą niezablokowaną krawędź
+        w promieniu jednego kafla (jak GraphIndex.nearest_edge).
+        """
+        lat, lon = coord
+        scale = float(np.cos(np.radians(lat)))
+        point = shapely.points(lon * scale, lat)
+        radius = min(0.0005, self.tile_deg)
+
+        while True:
+            window = box(lon - radius / scale, lat - radius, lon + radius / scale, lat + radius)
+            best = None
+            for key in self.tiles_in(lat - radius, lon - radius / scale, lat + radius, lon + radius / scale):
+                tile = self.tile(key)
+                for i in tile.tree.query(window).tolist():
+                    eid = tile.edge_ids[i]
+                    if blocked is not None and blocked.is_set(eid):
+                        continue
+                    scaled = shapely.transform(tile.edge_geoms[i], lambda xy: xy * [scale, 1.0])
+                    d = scaled.distance(point)
+                    if best is None or d < best[0]:
+                        best = (d, tile, eid, scaled)
+
+            if best is not None and best[0] <= radius:
+                break
+            if radius >= self.tile_deg:
+                if best is None:
+                    return None
+                break
+            radius = min(radius * 4, self.tile_deg)
+
+        distance, tile, eid, scaled = best
+        proj = scaled.interpolate(scaled.project(point))
+        proj_lat, proj_lon = proj.y, proj.x / scale
+
+        edge = tile.edge(eid)
+        edge_scale, edge_scaled = scaled_line(edge.geom)
+        frac = (
+            edge_scaled.project(shapely.points(proj_lon * edge_scale, proj_lat), normalized=True)
+            if edge_scaled.length > 0 else 0.0
+        )
+        offset_m = frac * edge.length if edge.forward else (1.0 - frac) * edge.length
+        return EdgeSnap(eid, float(offset_m), (proj_lat, proj_lon), distance), edge
+
+    def blocked_bitset(self, flood=None, min_overlap_ratio: float = 0.2) -> EdgeBitset:
+        """
+        Zablokowane krawędzie dla warstwy flood (jak compute_blocked_bitset) –
+        wczytywane są tylko kafle w zasięgu poligonów.
+        """
+        from .flood_intersector import _flood_sindex, _is_edge_flooded, _load_flood_gdf
+
+        with stage("flood_load"):
+            gdf = _load_flood_gdf(flood)
+        blocked = EdgeBitset(self.edge_count)
+        if gdf.empty or "geometry" not in gdf:
+            return blocked
+
+        with stage("edge_marking"):
+            sindex = _flood_sindex(gdf)
+            polygons = np.asarray(list(gdf.geometry), dtype=object)
+            for key in self.tiles_in(*_south_west_north_east(gdf.total_bounds)):
+                tile = self.tile(key)
+                _, idx = tile.tree.query(polygons)
+                for i in np.unique(idx).tolist():
+                    if _is_edge_flooded(tile.edge_geoms[i], gdf, sindex, min_overlap_ratio):
+                        blocked.set(tile.edge_ids[i], True)
+        return blocked
+
+
+def _south_west_north_east(total_bounds) -> Tuple[float, float, float, float]:
+    west, south, east, north = (float(v) for v in total_bounds)
+    return south, west, north, east
+
+
+# ---------------- wyszukiwanie ----------------
+
+class TiledRouter:
+    """
+    Trasa po grafie w kaflach – odpowiednik EvacRouter.find_route (trasa
+    najkrótsza, punkty dociągane do krawędzi, blokady jako EdgeBitset po eid).
+    """
+
+    def __init__(self, graph: TiledGraph, blocked: Optional[EdgeBitset] = None):
+        self.graph = graph
+        self.blocked = blocked if blocked is not None else EdgeBitset(graph.edge_count)
+
+    def find_route(
+        self,
+        start_coord: Tuple[float, float],
+        end_coord: Tuple[float, float],
+        with_geometry: bool = True,
+    ) -> Optional[Tuple[Optional[LineString], Dict[str, Any]]]:
+        """
+        (linia, meta) albo None, gdy trasy nie ma. meta jak w EvacRouter
+        oraz tiles_touched – kafle, po których szedł front przeszukiwania.
+        """
+        t0 = time.perf_counter()
+        loads_before = self.graph.loads
+
+        with stage("snap"):
+            start = self.graph.nearest_edge(start_coord, self.blocked)
+            end = self.graph.nearest_edge(end_coord, self.blocked)
+        if start is None or end is None:
+            return None
+
+        with stage("search"):
+            result = self._search(start, end)
+        if result is None:
+            return None
+        spans, touched = result
+
+        total_length = sum(abs(to_m - from_m) for _, from_m, to_m in spans)
+        route_line = self._assemble(start[0], spans) if with_geometry else None
+
+        meta = {
+            "length_m": total_length,
+            "segments": sum(1 for _, from_m, to_m in spans if from_m != to_m),
+            "calc_time_ms": (time.perf_counter() - t0) * 1000.0,
+            "blocked_edges_count": self.blocked.count(),
+            "edge_ids": list(dict.fromkeys(edge.eid for edge, _, _ in spans)),
+            "tiles_touched": len(touched),
+            "tiles_loaded": self.graph.loads - loads_before,
+        }
+        return route_line, meta
+
+    def _search(
+        self, start: Tuple[EdgeSnap, TileEdge], end: Tuple[EdgeSnap, TileEdge]
+    ) -> Optional[Tuple[List[Tuple[TileEdge, float, float]], Set[str]]]:
+        """
+        A* od wirtualnego węzła startu do wirtualnego węzła celu.
+        Zwraca odcinki trasy (krawędź, od [m], do [m] od jej węzła u)
+        i klucze kafli rozliczonych węzłów.
+        """
+        graph = self.graph
+        blocked = self.blocked
+        s_snap, s_edge = start
+        t_snap, t_edge = end
+        goal = t_snap.point
+
+        def h(lat: float, lon: float) -> float:
+            return haversine_distance_m((lat, lon), goal) * HEURISTIC_FACTOR
+
+        # wejście do celu przez jego węzły u / v: koszt dojazdu do punktu rzutu
+        tails = {t_edge.u: t_snap.offset_m}
+        tails[t_edge.v] = min(tails.get(t_edge.v, math.inf), t_edge.length - t_snap.offset_m)
+
+        best_cost = math.inf
+        best_entry: Optional[int] = None
+        if s_snap.eid == t_snap.eid:
+            best_cost = abs(t_snap.offset_m - s_snap.offset_m)
+
+        g: Dict[int, float] = {}
+        pred: Dict[int, Tuple[int, int]] = {}
+        done: Set[int] = set()
+        touched: Set[str] = set()
+        heap = []
+        for node, d0 in ((s_edge.u, s_snap.offset_m), (s_edge.v, s_edge.length - s_snap.offset_m)):
+            if d0 < g.get(node, math.inf):
+                g[node] = d0
+                heapq.heappush(heap, (d0 + h(*graph.node_coord(node)), d0, node))
+
+        while heap:
+            f, d, u = heapq.heappop(heap)
+            if f >= best_cost:
+                break
+            if u in done:
+                continue
+            done.add(u)
+            touched.add(graph.tile_key_of_node(u))
+
+            tail = tails.get(u)
+            if tail is not None and d + tail < best_cost:
+                best_cost = d + tail
+                best_entry = u
+
+            for v, eid, length, v_lat, v_lon in graph.neighbors(u):
+                if v in done or blocked.is_set(eid):
+                    continue
+                nd = d + length
+                if nd < g.get(v, math.inf):
+                    g[v] = nd
+                    pred[v] = (u, eid)
+                    heapq.heappush(heap, (nd + h(v_lat, v_lon), nd, v))
+
+        if best_cost == math.inf:
+            return None
+        if best_entry is None:
+            # start i cel na tej samej krawędzi, bez objazdu przez węzły
+            return [(s_edge, s_snap.offset_m, t_snap.offset_m)], touched
+
+        steps: List[Tuple[int, int]] = []
+        node = best_entry
+        while node in pred:
+            prev, eid = pred[node]
+            steps.append((prev, eid))
+            node = prev
+        steps.reverse()
+
+        # node to teraz węzeł, którym wyjechaliśmy z krawędzi startowej
+        spans = [(s_edge, s_snap.offset_m, 0.0 if node == s_edge.u else s_edge.length)]
+        for from_node, eid in steps:
+            edge = graph.edge(eid, from_node)
+            if edge.u == from_node:
+                spans.append((edge, 0.0, edge.length))
+            else:
+                spans.append((edge, edge.length, 0.0))
+        spans.append((t_edge, 0.0 if best_entry == t_edge.u else t_edge.length, t_snap.offset_m))
+        return spans, touched
+
+    @staticmethod
+    def _assemble(start: EdgeSnap, spans: List[Tuple[TileEdge, float, float]]) -> LineString:
+        coords: List[Tuple[float, float]] = []
+        for edge, from_m, to_m in spans:
+            if from_m == to_m:
+                continue
+            if from_m < to_m:
+                line = line_substring(edge.geom, edge.length, edge.forward, from_m, to_m)
+            else:
+                line = shapely.reverse(line_substring(edge.geom, edge.length, edge.forward, to_m, from_m))
+            for xy in line.coords:
+                if not coords or coords[-1] != tuple(xy):
+                    coords.append(tuple(xy))
+
+        if not coords:
+            lat, lon = start.point
+            coords.append((lon, lat))
+        if len(coords) == 1:
+            coords.append(coords[0])
+        return LineString(coords)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m src.core.tiled_graph",
+        description="Tnie zrzut grafu .npz na kafle przestrzenne wczytywane na żądanie.",
+    )
+    parser.add_argument("snapshot", type=Path, help="zrzut grafu .npz (np. z src.core.osm_ingest)")
+    parser.add_argument("output", type=Path, help="katalog kafli")
+    parser.add_argument("--tile-deg", type=float, default=DEFAULT_TILE_DEG, help="bok kafla [stopnie]")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    t0 = time.perf_counter()
+    manifest = build_tiles(args.snapshot, args.output, args.tile_deg)
+    edges = [tile["edges"] for tile in manifest["tiles"]]
+    print(
+        f"Kafli: {len(edges)}, węzłów: {manifest['nodes']}, krawędzi: {manifest['edges']}, "
+        f"najwięcej krawędzi w kaflu: {max(edges, default=0)}, "
+        f"czas: {time.perf_counter() - t0:.1f} s -> {args.output}"
+    )
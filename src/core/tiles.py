@@ -0,0 +1,127 @@
+"""
+Kafle wektorowe (schemat XYZ / Web Mercator, jak kafle OSM w Leaflet)
+dla warstw roads / flood / blocked.
+
+Kafel to GeoJSON FeatureCollection z geometriami przyciętymi do kafla
+(z małym marginesem, żeby linie nie urywały się na krawędziach kafli)
+i uproszczonymi do rozdzielczości zoomu – obiekty mniejsze niż
+ułamek piksela są pomijane, a współrzędne zaokrąglane.
+"""
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+LAYERS = ("roads", "flood", "blocked")
+MAX_ZOOM = 22
+# minimalny zoom warstwy – poniżej kafel jest pusty (cała sieć dróg miasta
+# w kilku kaflach to megabajty linii, których i tak nie da się odróżnić)
+MIN_ZOOM = {"roads": 13, "flood": 0, "blocked": 0}
+
+TILE_SIZE_PX = 256
+# tolerancja upraszczania i próg pomijania obiektów [px]
+SIMPLIFY_PX = 0.5
+# margines przycięcia [px]
+CLIP_MARGIN_PX = 4
+# poniżej tego zoomu linie kafla łączone są w jeden obiekt (bez eid) –
+# pojedyncze odcinki i tak nie są wtedy rozróżnialne na mapie
+FEATURE_ZOOM = 15
+
+Bounds = Tuple[float, float, float, float]  # (west, south, east, north)
+
+
+def _tile_lat(y: float, z: int) -> float:
+    n = math.pi - 2.0 * math.pi * y / (1 << z)
+    return math.degrees(math.atan(math.sinh(n)))
+
+
+def tile_bounds(z: int, x: int, y: int) -> Bounds:
+    """Zasięg kafla (west, south, east, north) w stopniach."""
+    n = 1 << z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    return west, _tile_lat(y + 1, z), east, _tile_lat(y, z)
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def _pixel_deg(bounds: Bounds) -> float:
+    # w Web Mercator piksel jest kwadratowy – bierzemy mniejszy wymiar
+    # w stopniach (szerokość geograficzna), żeby nie upraszczać za mocno
+    west, south, east, north = bounds
+    return min(east - west, north - south) / TILE_SIZE_PX
+
+
+def _decimals(pixel_deg: float) -> int:
+    # ok. 1/10 piksela wystarcza, żeby zaokrąglenie było niewidoczne
+    return max(1, min(7, math.ceil(-math.log10(pixel_deg / 10))))
+
+
+def merge_lines(geoms: np.ndarray) -> np.ndarray:
+    """
+    Łączy odcinki w jeden MultiLineString, sklejając odcinki stykające się
+    końcami w dłuższe linie – mniej powtórzonych wierzchołków i obiektów.
+    """
+    if len(geoms) == 0:
+        return geoms
+    merged = np.empty(1, dtype=object)
+    merged[0] = shapely.line_merge(shapely.multilinestrings(geoms))
+    return merged
+
+
+def render_tile(geoms: np.ndarray, properties: Sequence[str], bounds: Bounds) -> bytes:
+    """
+    GeoJSON kafla z geometrii (lon, lat) i gotowych fragmentów JSON
+    z właściwościami (properties[i] dla geoms[i]).
+    """
+    if len(geoms) == 0:
+        return _feature_collection([])
+
+    pixel = _pixel_deg(bounds)
+    margin = CLIP_MARGIN_PX * pixel
+    west, south, east, north = bounds
+
+    clipped = shapely.clip_by_rect(
+        geoms, west - margin, south - margin, east + margin, north + margin
+    )
+    simplified = shapely.simplify(clipped, SIMPLIFY_PX * pixel, preserve_topology=True)
+
+    # obiekty mniejsze niż próg w obu wymiarach i tak nie byłyby widoczne
+    xy = shapely.bounds(simplified)
+    extent = np.fmax(xy[:, 2] - xy[:, 0], xy[:, 3] - xy[:, 1])
+    keep = np.flatnonzero(~shapely.is_empty(simplified) & (extent >= SIMPLIFY_PX * pixel))
+    if len(keep) == 0:
+        return _feature_collection([])
+
+    decimals = _decimals(pixel)
+    rounded = shapely.transform(simplified[keep], lambda c: np.round(c, decimals))
+    geometry_json = shapely.to_geojson(rounded).tolist()
+
+    return _feature_collection([
+        '{"type":"Feature","geometry":%s,"properties":%s}' % (g, properties[i])
+        for g, i in zip(geometry_json, keep.tolist())
+    ])
+
+
+def _feature_collection(features: List[str]) -> bytes:
+    return ('{"type":"FeatureCollection","features":[' + ",".join(features) + "]}").encode("utf-8")
+
+
+class PolygonLayer:
+    """Poligony warstwy (np. flood) z własnym STRtree do wybierania kafli."""
+
+    def __init__(self, geoms: Sequence):
+        # wielopoligony rozbijamy – STRtree lepiej zawęża pojedyncze części
+        parts = shapely.get_parts(np.asarray(list(geoms), dtype=object))
+        self.geoms = parts[~shapely.is_empty(parts)]
+        self._tree = STRtree(self.geoms)
+
+    def __len__(self) -> int:
+        return len(self.geoms)
+
+    def query(self, bounds: Bounds) -> np.ndarray:
+        return np.sort(self._tree.query(shapely.box(*bounds)))
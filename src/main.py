@@ -1,11 +1,64 @@
-from fastapi import FastAPI
+import hmac
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from src.api.routes import router as evac_router
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi.routing import APIRoute
+from src.api.routes import get_evac_service, is_service_ready, router as evac_router
+from src.core.metrics import render_prometheus
+from src.core.profiler import DEFAULT_KEEP, RequestProfiler
+
+# Profilowanie zapytań (domyślnie wyłączone):
+# - EVAC_PROFILE=1 – profiluje każde zapytanie do PROFILED_PATHS,
+# - EVAC_ADMIN_TOKEN=... – pozwala włączyć profil dla pojedynczego zapytania
+#   flagą ?_profile=1 z nagłówkiem X-Admin-Token (podkreślnik – ?profile to
+#   profil ruchu w /api/evac/route).
+PROFILE_ALL = os.getenv("EVAC_PROFILE") == "1"
+ADMIN_TOKEN = os.getenv("EVAC_ADMIN_TOKEN")
+PROFILE_KEEP = int(os.getenv("EVAC_PROFILE_KEEP", str(DEFAULT_KEEP)))
+
+PROFILED_PATHS = {
+    "/api/evac/route",
+    "/api/admin/update-roads",
+    "/api/admin/update-flood",
+}
+
+logger = logging.getLogger(__name__)
+
+# stan rozgrzewki: import zależności geo + wczytanie grafu w tle
+_warmup = {"state": "starting", "error": None, "seconds": None}
+
+
+def _warm_up() -> None:
+    t0 = time.perf_counter()
+    try:
+        get_evac_service().ensure_loaded()
+    except Exception as e:
+        logger.exception("Nie udało się wczytać grafu dróg")
+        _warmup.update(state="failed", error=str(e))
+        return
+    _warmup.update(state="ready", seconds=round(time.perf_counter() - t0, 3))
+    logger.info("Graf dróg gotowy po %.2f s", _warmup["seconds"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # proces odpowiada od razu; trasy działają, gdy graf będzie wczytany
+    # (zapytanie przed końcem rozgrzewki poczeka na wczytanie grafu)
+    threading.Thread(target=_warm_up, name="graph-warmup", daemon=True).start()
+    yield
+
 
 app = FastAPI(
     title="Evacuation Routing API",
     description="Prototyp modułu wyznaczania trasy ewakuacji z uwzględnieniem flood zones",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -17,3 +70,101 @@ app.add_middleware(
 )
 
 app.include_router(evac_router, prefix="/api")
+
+
+@app.get("/health/live", include_in_schema=False)
+def liveness():
+    """Proces działa (nie sprawdza stanu grafu)."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+def readiness():
+    """Graf dróg jest wczytany i można wyznaczać trasy (503 w trakcie rozgrzewki)."""
+    if is_service_ready():
+        return {"status": "ready", "warmup_s": _warmup["seconds"]}
+    return JSONResponse(
+        status_code=503,
+        content={"status": _warmup["state"], "error": _warmup["error"]},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Histogramy czasów etapów w formacie tekstowym Prometheusa."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# ========= profilowanie zapytań =========
+
+profiler = RequestProfiler(keep=PROFILE_KEEP)
+
+# cProfile musi działać w wątku, który wykonuje endpoint, więc opakowujemy
+# same funkcje endpointów (handler trasy woła dependant.call przy każdym żądaniu)
+for route in app.routes:
+    if isinstance(route, APIRoute) and route.path in PROFILED_PATHS:
+        route.dependant.call = profiler.wrap(route.dependant.call)
+
+
+def _is_admin(request: Request) -> bool:
+    token = request.headers.get("X-Admin-Token")
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _profile_requested(request: Request) -> bool:
+    if request.url.path not in PROFILED_PATHS:
+        return False
+    if PROFILE_ALL:
+        return True
+    return request.query_params.get("_profile") == "1" and _is_admin(request)
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not _profile_requested(request):
+        return await call_next(request)
+
+    with profiler.session(request.method, request.url.path, request.url.query) as profile:
+        response = await call_next(request)
+        profile.status_code = response.status_code
+
+    response.headers["X-Profile-Id"] = str(profile.id)
+    return response
+
+
+def _require_admin(request: Request) -> None:
+    # bez skonfigurowanego tokenu profile są dostępne tylko przy EVAC_PROFILE=1
+    if not (PROFILE_ALL or _is_admin(request)):
+        raise HTTPException(status_code=403, detail="Profilowanie wymaga X-Admin-Token")
+
+
+@app.get("/api/admin/profiles", tags=["evacuation"])
+def list_profiles(request: Request):
+    """Ostatnie profile zapytań (najnowsze pierwsze)."""
+    _require_admin(request)
+    return {"profiles": profiler.summaries()}
+
+
+@app.get("/api/admin/profiles/{profile_id}", tags=["evacuation"])
+def download_profile(
+    profile_id: int,
+    request: Request,
+    format: str = Query("prof", pattern="^(prof|text)$"),
+):
+    """
+    Pobiera profil: format=prof – plik .prof (pstats / snakeviz),
+    format=text – podsumowanie najdroższych funkcji.
+    """
+    _require_admin(request)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Nie ma profilu {profile_id}")
+
+    if format == "text":
+        return PlainTextResponse(profile.text())
+
+    return Response(
+        content=profile.dump(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'},
+    )
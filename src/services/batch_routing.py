@@ -0,0 +1,307 @@
+"""
+Trasy wsadowe offline – setki tysięcy par (start, meta) dla jednego stanu
+flood, bez HTTP.
+
+    python -m src.services.batch_routing pairs.ndjson -o routes.ndjson --workers 8
+    python -m src.services.batch_routing pairs.csv --time 2024-09-16 --profile car > routes.csv
+
+Wejście czytane jest strumieniowo:
+
+    NDJSON  {"id": ..., "start": [lat, lon], "end": [lat, lon]}   (start/end także jako "lat,lon")
+    CSV     nagłówek id,start_lat,start_lon,end_lat,end_lon        (id opcjonalne)
+
+Graf i flood wczytywane są raz, w procesie głównym, zanim powstanie pula
+procesów (fork) – procesy robocze dziedziczą gotowy router tylko do odczytu,
+bez kopiowania grafu przez pickle. Pary idą do puli paczkami (CHUNK_SIZE),
+a w locie jest najwyżej kilka paczek na proces, więc pamięć nie rośnie
+z rozmiarem wejścia. Wyniki wychodzą w kolejności wejścia:
+
+    {"id": ..., "reachable": true, "length_m": 1234.5, "segments": 17}
+
+(z --profile dodatkowo "duration_s"; dla błędnego wiersza "error").
+
+--roads może też wskazywać katalog kafli (python -m src.core.tiled_graph) –
+wtedy trasy liczy TiledRouter, a kafle wczytywane są na żądanie w każdym
+procesie osobno (bez --time / --profile).
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from src.core.router import EvacRouter
+
+logger = logging.getLogger(__name__)
+
+# par w jednym zadaniu dla procesu roboczego (mniej narzutu na IPC)
+CHUNK_SIZE = 256
+# ile paczek na proces może czekać w kolejce
+INFLIGHT_PER_WORKER = 4
+# co ile par log z postępem
+PROGRESS_EVERY = 100_000
+
+CSV_FIELDS = ["id", "reachable", "length_m", "segments", "duration_s", "error"]
+
+Pair = Dict[str, Any]
+
+# router procesu – ustawiany przed utworzeniem puli i dziedziczony przez fork
+_ROUTER: Optional[EvacRouter] = None
+
+
+def _parse_point(value) -> Tuple[float, float]:
+    if isinstance(value, str):
+        value = value.split(",")
+    lat, lon = (float(v) for v in value)
+    return lat, lon
+
+
+def read_pairs(f: TextIO, fmt: str) -> Iterator[Pair]:
+    """
+    Kolejne pary z wejścia jako {"id", "start", "end"} albo {"id", "error"}
+    dla wiersza, którego nie da się odczytać. Domyślne id to numer wiersza.
+    """
+    if fmt == "csv":
+        for i, row in enumerate(csv.DictReader(f)):
+            pair_id = row.get("id") or i
+            try:
+                yield {
+                    "id": pair_id,
+                    "start": (float(row["start_lat"]), float(row["start_lon"])),
+                    "end": (float(row["end_lat"]), float(row["end_lon"])),
+                }
+            except (KeyError, TypeError, ValueError) as e:
+                yield {"id": pair_id, "error": f"Niepoprawny wiersz: {e!r}"}
+        return
+
+    for i, line in enumerate(f):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            yield {
+                "id": item.get("id", i),
+                "start": _parse_point(item["start"]),
+                "end": _parse_point(item["end"]),
+            }
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            yield {"id": i, "error": f"Niepoprawny wiersz: {e!r}"}
+
+
+def route_pairs(router: EvacRouter, pairs: List[Pair]) -> List[Dict[str, Any]]:
+    """Długość, liczba segmentów i osiągalność dla każdej pary (EvacRouter albo TiledRouter)."""
+    results = []
+    for pair in pairs:
+        if "error" in pair:
+            results.append({"id": pair["id"], "reachable": False, "error": pair["error"]})
+            continue
+
+        found = router.find_route(pair["start"], pair["end"], with_geometry=False)
+        if found is None:
+            results.append({"id": pair["id"], "reachable": False, "length_m": None, "segments": None})
+            continue
+
+        _, meta = found
+        result = {
+            "id": pair["id"],
+            "reachable": True,
+            "length_m": round(meta["length_m"], 2),
+            "segments": meta["segments"],
+        }
+        if "duration_s" in meta:
+            result["duration_s"] = round(meta["duration_s"], 2)
+        results.append(result)
+    return results
+
+
+def _route_chunk(pairs: List[Pair]) -> List[Dict[str, Any]]:
+    # wołane w procesie roboczym – _ROUTER odziedziczony po fork
+    return route_pairs(_ROUTER, pairs)
+
+
+def _chunks(pairs: Iterator[Pair], size: int) -> Iterator[List[Pair]]:
+    while True:
+        chunk = list(islice(pairs, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_results(
+    router: EvacRouter,
+    pairs: Iterator[Pair],
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Wyniki dla kolejnych par w kolejności wejścia. Przy workers > 1
+    paczki liczone są w puli procesów (fork, router współdzielony).
+    """
+    chunks = _chunks(iter(pairs), chunk_size)
+    if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        logger.warning("Brak fork na tej platformie – liczę w jednym procesie")
+        workers = 1
+    if workers <= 1:
+        for chunk in chunks:
+            yield from route_pairs(router, chunk)
+        return
+
+    global _ROUTER
+    _ROUTER = router
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_route_chunk, (chunk,)))
+                if len(pending) >= workers * INFLIGHT_PER_WORKER:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+    finally:
+        _ROUTER = None
+
+
+class ResultWriter:
+    """Zapis wyników jako NDJSON albo CSV (jeden wiersz na parę)."""
+
+    def __init__(self, f: TextIO, fmt: str):
+        self.f = f
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, result: Dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.writerow(result)
+        else:
+            self.f.write(json.dumps(result) + "\n")
+
+
+@dataclass
+class BatchStats:
+    pairs: int = 0
+    reachable: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+    @property
+    def pairs_per_s(self) -> float:
+        return self.pairs / self.seconds if self.seconds > 0 else 0.0
+
+
+def run_batch(
+    router: EvacRouter,
+    source: TextIO,
+    target: TextIO,
+    in_format: str = "ndjson",
+    out_format: Optional[str] = None,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> BatchStats:
+    """Czyta pary z source, zapisuje wyniki do target i zwraca statystyki."""
+    writer = ResultWriter(target, out_format or in_format)
+    stats = BatchStats()
+    t0 = time.perf_counter()
+
+    for result in iter_results(router, read_pairs(source, in_format), workers, chunk_size):
+        writer.write(result)
+        stats.pairs += 1
+        stats.reachable += result["reachable"]
+        stats.errors += "error" in result
+        if stats.pairs % PROGRESS_EVERY == 0:
+            logger.info(
+                "%d par (%.0f par/s)", stats.pairs, stats.pairs / (time.perf_counter() - t0)
+            )
+
+    stats.seconds = time.perf_counter() - t0
+    return stats
+
+
+def _detect_format(path: Optional[Path]) -> str:
+    return "csv" if path is not None and path.suffix == ".csv" else "ndjson"
+
+
+if __name__ == "__main__":
+    from src.core.tiled_graph import TiledGraph, TiledRouter, is_tiled
+    from src.services.evac_service import (
+        FLOOD_PATH,
+        FLOOD_SERIES_DIR,
+        ROADS_PATH,
+        TIME_SCENARIO_PREFIX,
+        EvacService,
+        UnknownScenario,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.services.batch_routing",
+        description="Trasy wsadowe dla par (start, meta) z pliku NDJSON / CSV.",
+    )
+    parser.add_argument("input", type=Path, help="pary start/meta (.ndjson / .csv, '-' = stdin)")
+    parser.add_argument("-o", "--output", type=Path, help="plik wyników (domyślnie stdout)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="format wejścia (domyślnie z rozszerzenia)")
+    parser.add_argument("--output-format", choices=["ndjson", "csv"], help="format wyników (domyślnie jak wejście)")
+    parser.add_argument("--roads", type=Path, default=ROADS_PATH, help="drogi: GeoJSON, zrzut .npz albo katalog kafli")
+    parser.add_argument("--flood", type=Path, default=FLOOD_PATH, help="flood zones (GeoJSON)")
+    parser.add_argument("--time", help="warstwa serii czasowej flood zamiast --flood (data albo przedział)")
+    parser.add_argument("--profile", choices=["foot", "car", "emergency"], help="profil ruchu")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="liczba procesów")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="par w jednym zadaniu")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # pojedyncze trasy logują na INFO – przy wsadzie to tylko szum
+    logging.getLogger("src.services.evac_service").setLevel(logging.WARNING)
+
+    use_stdin = str(args.input) == "-"
+    in_format = args.format or _detect_format(None if use_stdin else args.input)
+    out_format = args.output_format or (_detect_format(args.output) if args.output else in_format)
+
+    t0 = time.perf_counter()
+    if is_tiled(args.roads):
+        if args.time or args.profile:
+            parser.error("Graf w kaflach nie obsługuje --time ani --profile")
+        tiled = TiledGraph(args.roads)
+        router = TiledRouter(tiled, tiled.blocked_bitset(args.flood))
+        edge_count, blocked_count = tiled.edge_count, router.blocked.count()
+    else:
+        service = EvacService(args.roads, args.flood, flood_series_dir=FLOOD_SERIES_DIR)
+        service.ensure_loaded()
+        scenario = TIME_SCENARIO_PREFIX + args.time if args.time else None
+        try:
+            router, blocked_count = service.make_router(scenario, args.profile)
+        except UnknownScenario:
+            parser.error(f"Brak warstwy serii flood dla --time {args.time}")
+        edge_count = service.graph_index.edge_count
+    logger.info(
+        "Graf i flood gotowe: %d krawędzi, %d zablokowanych (%.1f s)",
+        edge_count, blocked_count, time.perf_counter() - t0,
+    )
+
+    source = sys.stdin if use_stdin else open(args.input, "r", encoding="utf-8", newline="")
+    target = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        stats = run_batch(
+            router, source, target, in_format, out_format,
+            workers=args.workers, chunk_size=args.chunk_size,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(
+        f"Par: {stats.pairs}, osiągalnych: {stats.reachable}, błędnych: {stats.errors}, "
+        f"czas: {stats.seconds:.1f} s, przepustowość: {stats.pairs_per_s:.0f} par/s "
+        f"({args.workers} proc.)",
+        file=sys.stderr,
+    )
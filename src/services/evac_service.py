@@ -1,19 +1,137 @@
+import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, Callable, List, Iterator
 
-from shapely.geometry import LineString
+import numpy as np
+from shapely.geometry import LineString, MultiLineString, box
 
-from src.core.graph_builder import RoadGraphBuilder, RoadGraphBuilderWithDict
+from src.core.graph_builder import (
+    RoadGraphBuilder,
+    RoadGraphBuilderWithDict,
+    contract_degree2_chains,
+)
 from src.core.flood_loader import FloodLoader
-from src.core.flood_intersector import mark_blocked_edges
+from src.core.flood_intersector import (
+    update_blocked_edges,
+    compute_blocked_bitset,
+    FloodDiff,
+    _load_flood_gdf,
+)
+from src.core.blocked_export import BlockedEdgesExport, build_blocked_export
+from src.core.edge_bitset import EdgeBitset
+from src.core.flood_series import CURRENT_FILE as SERIES_CURRENT_FILE, FloodSeries, open_series
+from src.core.graph_index import EdgeSnap, GraphIndex
+from src.core.graph_snapshot import is_snapshot, load_snapshot
+from src.core.memory_report import (
+    STRTREE_ITEM_BYTES,
+    deep_sizeof,
+    flood_bytes,
+    footprint,
+    format_summary,
+    geometry_bytes,
+    graph_bytes,
+    index_bytes,
+    rss_bytes,
+    traced,
+)
+from src.core.metrics import stage
+from src.core.profiles import PROFILES
 from src.core.router import EvacRouter
+from src.core.search import SearchTree, connected_components
+from src.core.single_flight import SingleFlight
+from src.core.tiles import FEATURE_ZOOM, MIN_ZOOM, PolygonLayer, merge_lines, render_tile, tile_bounds
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
+LIVE_SCENARIO = "live"
+# scenariusz "time:<przedział lub data>" = warstwa serii czasowej flood
+TIME_SCENARIO_PREFIX = "time:"
+
+# ściąganie łańcuchów węzłów stopnia 2 – mniejszy graf, ta sama dokładność
+# dociągania punktów (router rzutuje punkty na geometrię krawędzi)
+CONTRACT_DEGREE2 = os.getenv("EVAC_CONTRACT_DEGREE2", "0") == "1"
+
+# ile drzew schronów (per graf / flood / scenariusz) trzymamy w pamięci
+SHELTER_TREE_CACHE_SIZE = 8
+
+# ile zestawów etykiet spójnych składowych (per graf / flood / scenariusz)
+COMPONENTS_CACHE_SIZE = 8
+
+# ile gotowych eksportów zablokowanych krawędzi (per graf / flood / scenariusz)
+BLOCKED_EXPORT_CACHE_SIZE = 4
+
+# ile gotowych kafli wektorowych (wszystkie warstwy razem)
+TILE_CACHE_SIZE = 2048
+# ile warstw poligonów flood ze STRtree (żywy flood + scenariusze)
+FLOOD_LAYER_CACHE_SIZE = 4
+
+# precyzja [m] położenia dociągniętych punktów w kluczu łączenia zapytań o trasę
+ROUTE_KEY_DECIMALS = 2
+
+
+class UnknownScenario(KeyError):
+    """Nie ma scenariusza flood (nazwanego ani warstwy serii czasowej) o tej nazwie."""
+
+
+@dataclass
+class FloodScenario:
+    """
+    Nazwany wariant "what-if" warstwy flood.
+
+    Trzyma własny bitset zablokowanych krawędzi (1 bit na krawędź) nad
+    wspólnym grafem dróg, więc nie wymaga przeliczania żywego grafu.
+    """
+    name: str
+    flood: Any  # GeoDataFrame – potrzebna do przeliczenia po reload_graph
+    blocked: EdgeBitset
+    graph_generation: int
+    generation: int = 1
+
+
+class ScenarioStore:
+    """
+    Warstwy flood nazwanych scenariuszy, wspólne dla kilku serwisów (graf
+    domyślny i regiony z RegionRegistry). Trzyma tylko warstwy i ich wersje –
+    każdy serwis liczy z nich własny bitset nad swoim grafem przy pierwszym
+    użyciu, więc scenariusz działa też w regionach wczytanych później.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # nazwa -> (GeoDataFrame / GeoJSON / ścieżka, wersja)
+        self._floods: Dict[str, Tuple[Any, int]] = {}
+
+    def put(self, name: str, flood) -> int:
+        """Zapisuje (lub podmienia) warstwę scenariusza; zwraca jej nową wersję."""
+        with self._lock:
+            previous = self._floods.get(name)
+            version = previous[1] + 1 if previous else 1
+            self._floods[name] = (flood, version)
+        return version
+
+    def get(self, name: str) -> Tuple[Any, int]:
+        """Warstwa i wersja scenariusza. KeyError, jeśli nie istnieje."""
+        with self._lock:
+            return self._floods[name]
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            return self._floods.pop(name, None) is not None
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._floods)
+
+
 class EvacService:
     """
     Serwis spajający:
@@ -23,18 +141,215 @@ class EvacService:
     - wyznaczenie trasy.
     """
 
-    def __init__(self, roads_path: Path, flood_path: Path):
-        self.roads_path = roads_path
+    def __init__(
+        self,
+        roads_path: Path,
+        flood_path: Path,
+        shelters_path: Optional[Path] = None,
+        flood_series_dir: Optional[Path] = None,
+        scenario_store: Optional[ScenarioStore] = None,
+    ):
+        self.roads_path = roads_path  # GeoJSON albo zrzut grafu .npz
         self.flood_path = flood_path
+        self.shelters_path = shelters_path
+        self.flood_series_dir = flood_series_dir
 
-        logger.info("Buduję graf dróg z pliku %s", self.roads_path)
-        builder = RoadGraphBuilder(self.roads_path)
-        self.graph = builder.build_graph()
-        logger.info(
-            "Graf zbudowany: %d węzłów, %d krawędzi",
-            self.graph.number_of_nodes(),
-            self.graph.number_of_edges(),
-        )
+        # stan flood: ostatnio nałożona warstwa i "podpis" pliku, z którego
+        # ją wczytano – pozwala nie przeliczać blokad przy każdym zapytaniu
+        self._flood_lock = threading.Lock()
+        self._flood_listeners: List[Callable[[FloodDiff], None]] = []
+        self._graph_listeners: List[Callable[[int], None]] = []
+        # warstwy scenariuszy (wspólne z regionami) i bitsety nad tym grafem
+        self.scenario_store = scenario_store if scenario_store is not None else ScenarioStore()
+        self._scenarios: Dict[str, FloodScenario] = {}
+        self._scenarios_lock = threading.Lock()
+        self.graph_generation = 0
+
+        # seria czasowa flood (memmap) i bitsety jej warstw nad bieżącym grafem
+        self._series: Optional[FloodSeries] = None
+        self._series_signature = None
+        self._series_slices: Dict[int, FloodScenario] = {}
+        self._series_lock = threading.Lock()
+        self.flood_generation = 0
+
+        # schrony: lista {"name", "lat", "lon"} + cache drzew najkrótszych ścieżek
+        self.shelters: List[Dict[str, Any]] = self._load_shelters()
+        self._shelters_version = 0
+        self._shelter_trees: "OrderedDict[Tuple, Tuple[SearchTree, List]]" = OrderedDict()
+        self._shelter_lock = threading.Lock()
+
+        # etykiety spójnych składowych niezablokowanego grafu
+        self._components: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._components_lock = threading.Lock()
+
+        # zserializowane zablokowane krawędzie (GeoJSON / binarnie)
+        self._blocked_exports: "OrderedDict[Tuple, BlockedEdgesExport]" = OrderedDict()
+        self._blocked_exports_lock = threading.Lock()
+
+        # kafle wektorowe: klucz (warstwa, generacja danych..., z, x, y) -> GeoJSON
+        self._tiles: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._flood_layers: "OrderedDict[Tuple, PolygonLayer]" = OrderedDict()
+        self._tiles_lock = threading.Lock()
+
+        # trasy liczone właśnie teraz – identyczne równoległe zapytania czekają na wynik
+        self._route_flights = SingleFlight("route")
+
+        # graf wczytywany jest dopiero przy pierwszym użyciu (albo wcześniej,
+        # w tle – patrz lifespan w src/main.py), żeby start procesu był szybki
+        self._graph = None
+        self._graph_index: Optional[GraphIndex] = None
+        self._graph_lock = threading.Lock()
+        self._graph_ready = threading.Event()
+        # szacunek pamięci grafu: (klucz generacji, raport) – patrz memory_report
+        self._graph_memory_cache: Optional[Tuple[Tuple, Dict[str, Any]]] = None
+
+    # --------------- wczytanie grafu ----------------
+
+    @property
+    def is_ready(self) -> bool:
+        """Czy graf dróg jest już wczytany."""
+        return self._graph_ready.is_set()
+
+    def ensure_loaded(self) -> None:
+        """Wczytuje graf z roads_path, jeśli nie został jeszcze wczytany."""
+        if self._graph_ready.is_set():
+            return
+
+        with self._graph_lock:
+            if self._graph_ready.is_set():
+                return
+
+            logger.info("Buduję graf dróg z pliku %s", self.roads_path)
+            t0 = time.perf_counter()
+            with traced("load_graph"):
+                if is_snapshot(self.roads_path) and self.roads_path.exists():
+                    graph = load_snapshot(self.roads_path)
+                else:
+                    graph = RoadGraphBuilder(self.roads_path).build_graph()
+                self._set_graph(graph)
+            logger.info(
+                "Graf zbudowany: %d węzłów, %d krawędzi (%.2f s)",
+                self._graph.number_of_nodes(),
+                self._graph.number_of_edges(),
+                time.perf_counter() - t0,
+            )
+        self._log_memory("wczytaniu grafu")
+
+    @property
+    def graph(self):
+        self.ensure_loaded()
+        return self._graph
+
+    @property
+    def graph_index(self) -> GraphIndex:
+        self.ensure_loaded()
+        return self._graph_index
+
+    def _set_graph(self, graph) -> None:
+        if CONTRACT_DEGREE2:
+            before = graph.number_of_nodes()
+            graph = contract_degree2_chains(graph)
+            logger.info(
+                "Ściągnięto łańcuchy stopnia 2: %d -> %d węzłów",
+                before, graph.number_of_nodes(),
+            )
+
+        with self._flood_lock:
+            self._graph = graph
+            self._graph_index = GraphIndex(graph)
+            self.graph_generation += 1
+
+            # nowy graf nie ma jeszcze nałożonej żadnej warstwy flood
+            self._flood_gdf = None
+            self._flood_signature = None
+            self.blocked_edges_count = 0
+            self.live_blocked = EdgeBitset(self._graph_index.edge_count)
+            graph_generation = self.graph_generation
+
+        self._graph_ready.set()
+
+        # eid z poprzedniego grafu znaczą teraz co innego – słuchacze muszą
+        # przeliczyć to, co od nich zależy, nawet gdy flood niczego nie zmieni
+        for listener in self._graph_listeners:
+            try:
+                listener(graph_generation)
+            except Exception:
+                logger.exception("Błąd w listenerze przeładowania grafu")
+
+    def add_flood_listener(self, listener: Callable[[FloodDiff], None]) -> None:
+        """
+        Rejestruje callback wołany po każdej zmianie stanu krawędzi.
+        Dostaje FloodDiff, więc może unieważnić tylko to, co się zmieniło.
+        """
+        self._flood_listeners.append(listener)
+
+    def add_graph_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        Rejestruje callback wołany po każdym wczytaniu / przeładowaniu grafu.
+        Dostaje nową generację grafu.
+        """
+        self._graph_listeners.append(listener)
+
+    def _flood_file_signature(self) -> Tuple:
+        try:
+            st = self.flood_path.stat()
+        except FileNotFoundError:
+            return ("missing",)
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh_flood(self, force: bool = False) -> Optional[FloodDiff]:
+        """
+        Nakłada aktualny plik flood na graf, jeśli zmienił się od ostatniego
+        razu. Sprawdzane są tylko krawędzie w okolicy zmienionych poligonów.
+
+        Zwraca FloodDiff albo None, jeśli plik się nie zmienił.
+        """
+        # przed blokadą flood – wczytanie grafu samo bierze tę blokadę
+        self.ensure_loaded()
+        with self._flood_lock:
+            signature = self._flood_file_signature()
+            if not force and signature == self._flood_signature:
+                return None
+
+            with traced("flood_update"):
+                diff = update_blocked_edges(
+                    self._graph,
+                    self._graph_index,
+                    self._flood_gdf,
+                    self.flood_path,
+                )
+
+            self._flood_gdf = diff.flood
+            self._flood_signature = signature
+            self.blocked_edges_count += len(diff.newly_blocked) - len(diff.newly_unblocked)
+            if diff.flipped:
+                # nowy bitset zamiast zmiany w miejscu: trwające zapytania
+                # (routery, drzewa schronów, eksport) trzymają stary obiekt
+                # i widzą spójny stan z poprzedniej generacji
+                live_blocked = self.live_blocked.copy()
+                for eid in diff.newly_blocked:
+                    live_blocked.set(eid, True)
+                for eid in diff.newly_unblocked:
+                    live_blocked.set(eid, False)
+                self.live_blocked = live_blocked
+                self.flood_generation += 1
+
+        if diff.flipped:
+            for listener in self._flood_listeners:
+                try:
+                    listener(diff)
+                except Exception:
+                    logger.exception("Błąd w listenerze zmian flood")
+
+        self._log_memory("aktualizacji flood")
+        return diff
+
+    def load_graph(self, graph) -> None:
+        """Podmienia graf dróg na już zbudowany graf networkx."""
+        # blokada wczytywania: wolne wczytanie z pliku w tle nie może
+        # nadpisać grafu podmienionego w międzyczasie
+        with self._graph_lock:
+            self._set_graph(graph)
 
     def reload_graph(self, geojson: Dict[str, Any]) -> None:
         """
@@ -46,47 +361,925 @@ class EvacService:
             len(geojson.get("features", []))
         )
 
-        builder = RoadGraphBuilderWithDict(geojson)
-        self.graph = builder.build_graph()
+        with traced("reload_graph"):
+            builder = RoadGraphBuilderWithDict(geojson)
+            self.load_graph(builder.build_graph())
 
         logger.info(
             "Graf przeładowany: %d węzłów, %d krawędzi",
             self.graph.number_of_nodes(),
             self.graph.number_of_edges(),
         )
+        self._log_memory("przeładowaniu grafu")
+
+    # --------------- pamięć ----------------
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Szacowana pamięć grafu (networkx, geometrie krawędzi, GraphIndex),
+        flood (warstwa żywa, scenariusze, seria czasowa) i cache'y – bajty
+        łącznie oraz na węzeł i na krawędź (patrz src/core/memory_report.py).
+        """
+        graph = self._graph_memory()
+        flood = self._flood_memory()
+        caches = self._cache_memory()
+        return {
+            "graph": graph,
+            "flood": flood,
+            "caches": caches,
+            "total_bytes": graph["total_bytes"] + flood["total_bytes"] + caches["total_bytes"],
+            "rss_bytes": rss_bytes(),
+        }
+
+    def _log_memory(self, reason: str) -> None:
+        try:
+            logger.info("Pamięć po %s: %s", reason, format_summary(self.memory_report()))
+        except Exception:
+            # raport to tylko diagnostyka – nie może zepsuć aktualizacji
+            logger.exception("Nie udało się oszacować pamięci")
+
+    def _graph_memory(self) -> Dict[str, Any]:
+        # graf nie zmienia się między aktualizacjami flood – szacunek liczymy
+        # raz na generację grafu (i po zbudowaniu STRtree węzłów)
+        with self._flood_lock:
+            graph, index = self._graph, self._graph_index
+            generation = self.graph_generation
+        if index is None:
+            return {"nodes": 0, "edges": 0, "total_bytes": 0, "bytes_per_node": 0.0, "bytes_per_edge": 0.0}
+
+        key = (generation, index._nodes_tree is not None)
+        cached = self._graph_memory_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        nodes, edges = index.node_count, index.edge_count
+        nx_bytes = graph_bytes(graph)
+        geom_bytes = geometry_bytes(index.edge_geoms)
+        idx_bytes = index_bytes(index)
+        node_total = nx_bytes["nodes"] + idx_bytes["nodes"]
+        edge_total = nx_bytes["edges"] + geom_bytes + idx_bytes["edges"]
+        total = footprint(node_total, edge_total, nodes, edges)
+
+        report = {
+            "nodes": nodes,
+            "edges": edges,
+            "networkx": footprint(nx_bytes["nodes"], nx_bytes["edges"], nodes, edges),
+            "edge_geometries": footprint(0, geom_bytes, nodes, edges),
+            "graph_index": footprint(idx_bytes["nodes"], idx_bytes["edges"], nodes, edges),
+            "total_bytes": total["bytes"],
+            "bytes_per_node": total["bytes_per_node"],
+            "bytes_per_edge": total["bytes_per_edge"],
+        }
+        self._graph_memory_cache = (key, report)
+        return report
+
+    def _flood_memory(self) -> Dict[str, Any]:
+        with self._flood_lock:
+            gdf = self._flood_gdf if self._graph_index is not None else None
+            live_bitset = self.live_blocked.nbytes if self._graph_index is not None else 0
+        with self._scenarios_lock:
+            scenarios = list(self._scenarios.values())
+        with self._series_lock:
+            slices = list(self._series_slices.values())
+            series = self._series
+
+        live = {
+            "polygons": len(gdf) if gdf is not None else 0,
+            "bytes": flood_bytes(gdf) + live_bitset,
+        }
+        named = {
+            "count": len(scenarios),
+            "bytes": sum(flood_bytes(sc.flood) + sc.blocked.nbytes for sc in scenarios),
+        }
+        # maski serii są zmapowane z pliku (memmap) – w RSS tylko czytane strony
+        series_layers = {
+            "layers": len(slices),
+            "bytes": sum(flood_bytes(sc.flood) + sc.blocked.nbytes for sc in slices),
+            "mapped_bytes": series.nbytes if series is not None else 0,
+        }
+        return {
+            "live": live,
+            "scenarios": named,
+            "series": series_layers,
+            "total_bytes": live["bytes"] + named["bytes"] + series_layers["bytes"],
+        }
+
+    def _cache_memory(self) -> Dict[str, Any]:
+        caches: Dict[str, Dict[str, int]] = {}
+        with self._components_lock:
+            caches["components"] = {
+                "entries": len(self._components),
+                "bytes": sum(labels.nbytes for labels in self._components.values()),
+            }
+        with self._shelter_lock:
+            caches["shelter_trees"] = {
+                "entries": len(self._shelter_trees),
+                "bytes": sum(deep_sizeof(entry) for entry in self._shelter_trees.values()),
+            }
+        with self._blocked_exports_lock:
+            caches["blocked_exports"] = {
+                "entries": len(self._blocked_exports),
+                "bytes": sum(deep_sizeof(export) for export in self._blocked_exports.values()),
+            }
+        with self._tiles_lock:
+            caches["tiles"] = {
+                "entries": len(self._tiles),
+                "bytes": sum(len(body) for body in self._tiles.values()),
+            }
+            caches["flood_layers"] = {
+                "entries": len(self._flood_layers),
+                "bytes": sum(
+                    geometry_bytes(layer.geoms) + len(layer) * STRTREE_ITEM_BYTES
+                    for layer in self._flood_layers.values()
+                ),
+            }
+        caches["total_bytes"] = sum(cache["bytes"] for cache in caches.values())
+        return caches
+
+    # --------------- scenariusze flood ("what-if") ----------------
+
+    def set_scenario(self, name: str, flood) -> FloodScenario:
+        """
+        Tworzy (lub podmienia) nazwany scenariusz flood we wspólnym
+        scenario_store i od razu liczy jego bitset nad tym grafem
+        (inne serwisy tego magazynu – przy pierwszym użyciu).
+        flood: GeoDataFrame albo ścieżka do pliku GeoJSON.
+        """
+        if name == LIVE_SCENARIO or name.startswith(TIME_SCENARIO_PREFIX):
+            raise ValueError(
+                f"Nazwa scenariusza '{LIVE_SCENARIO}' i prefiks '{TIME_SCENARIO_PREFIX}' są zarezerwowane"
+            )
+
+        version = self.scenario_store.put(name, flood)
+        return self._build_scenario(name, flood, version)
+
+    def _build_scenario(self, name: str, flood, version: int) -> FloodScenario:
+        graph_index = self.graph_index
+        graph_generation = self.graph_generation
+        blocked = compute_blocked_bitset(graph_index, flood)
+
+        scenario = FloodScenario(
+            name=name,
+            flood=flood,
+            blocked=blocked,
+            graph_generation=graph_generation,
+            generation=version,
+        )
+        with self._scenarios_lock:
+            self._scenarios[name] = scenario
+
+        logger.info(
+            "Scenariusz '%s': %d zablokowanych krawędzi (%d B bitsetu)",
+            name, blocked.count(), blocked.nbytes,
+        )
+        return scenario
+
+    def delete_scenario(self, name: str) -> bool:
+        with self._scenarios_lock:
+            self._scenarios.pop(name, None)
+        return self.scenario_store.delete(name)
+
+    def list_scenarios(self) -> List[Dict[str, Any]]:
+        """
+        Scenariusze ze wspólnego magazynu z bitsetami nad tym grafem;
+        stale – bitset nieaktualny albo jeszcze niepoliczony (policzy się
+        przy pierwszym użyciu).
+        """
+        names = self.scenario_store.names()
+        with self._scenarios_lock:
+            local = dict(self._scenarios)
+
+        scenarios = []
+        for name in names:
+            sc = local.get(name)
+            try:
+                _, version = self.scenario_store.get(name)
+            except KeyError:
+                continue  # usunięty w międzyczasie
+            if sc is None:
+                scenarios.append({"name": name, "blocked_edges_count": None, "bytes": 0, "stale": True})
+                continue
+            scenarios.append({
+                "name": sc.name,
+                "blocked_edges_count": sc.blocked.count(),
+                "bytes": sc.blocked.nbytes,
+                "stale": sc.graph_generation != self.graph_generation or sc.generation != version,
+            })
+        return scenarios
+
+    def resolve_blocked(self, scenario: Optional[str] = None) -> Tuple[EdgeBitset, Tuple]:
+        """
+        Zwraca bitset zablokowanych krawędzi dla scenariusza (None = żywy
+        flood z pliku) oraz klucz generacji, po którym można cache'ować
+        wyniki zależne od grafu i stanu flood.
+
+        UnknownScenario, jeśli scenariusz nie istnieje.
+        """
+        if scenario is None or scenario == LIVE_SCENARIO:
+            self.refresh_flood()
+            with self._flood_lock:
+                return self.live_blocked, (
+                    self.graph_generation, LIVE_SCENARIO, self.flood_generation,
+                )
+
+        sc = self._get_scenario(scenario)
+        return sc.blocked, (sc.graph_generation, sc.name, sc.generation)
+
+    def _get_scenario(self, scenario: str) -> FloodScenario:
+        if scenario.startswith(TIME_SCENARIO_PREFIX):
+            return self._series_slice(scenario[len(TIME_SCENARIO_PREFIX):])
+
+        try:
+            flood, version = self.scenario_store.get(scenario)
+        except KeyError:
+            with self._scenarios_lock:
+                self._scenarios.pop(scenario, None)
+            raise UnknownScenario(scenario) from None
+
+        with self._scenarios_lock:
+            sc = self._scenarios.get(scenario)
+
+        if sc is None or sc.generation != version or sc.graph_generation != self.graph_generation:
+            # scenariusz dodany / zmieniony w innym serwisie albo graf
+            # przeładowano – liczymy bitset nad tym grafem
+            sc = self._build_scenario(scenario, flood, version)
+        return sc
+
+    # --------------- seria czasowa flood ----------------
+
+    def flood_series(self) -> Optional[FloodSeries]:
+        """
+        Aktualna seria czasowa flood (albo None). Po pobraniu nowej serii
+        (zmiana wskaźnika "current") otwierana jest ponownie.
+        """
+        if self.flood_series_dir is None:
+            return None
+        try:
+            signature = (self.flood_series_dir / SERIES_CURRENT_FILE).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._series_lock:
+            if signature != self._series_signature:
+                self._series = open_series(self.flood_series_dir)
+                self._series_signature = signature
+                self._series_slices = {}
+            return self._series
+
+    def _series_slice(self, time: str) -> FloodScenario:
+        """
+        Bitset warstwy serii dla przedziału / daty. Liczony raz na warstwę
+        i generację grafu – potem wybór warstwy to tylko odczyt ze słownika.
+        UnknownScenario, jeśli nie ma serii albo warstwy.
+        """
+        series = self.flood_series()
+        if series is None:
+            raise UnknownScenario(TIME_SCENARIO_PREFIX + time)
+        try:
+            index = series.index_of(time)
+        except KeyError:
+            raise UnknownScenario(TIME_SCENARIO_PREFIX + time) from None
+
+        graph_index = self.graph_index
+        graph_generation = self.graph_generation
+        with self._series_lock:
+            sc = self._series_slices.get(index)
+        if sc is not None and sc.graph_generation == graph_generation:
+            return sc
+
+        from src.core.sentinel_flood_ogc_client import SentinelOGCFloodClient
+
+        flood = SentinelOGCFloodClient.mask_to_geojson(series.mask(index), series.bbox)
+        sc = FloodScenario(
+            name=TIME_SCENARIO_PREFIX + series.times[index],
+            flood=flood,
+            blocked=compute_blocked_bitset(graph_index, flood),
+            graph_generation=graph_generation,
+            generation=series.generation,
+        )
+        with self._series_lock:
+            if self._series is series:
+                self._series_slices[index] = sc
+        return sc
+
+    def warm_flood_series(self) -> int:
+        """Liczy bitsety wszystkich warstw serii z góry; zwraca ich liczbę."""
+        series = self.flood_series()
+        if series is None:
+            return 0
+        for time in series.times:
+            self._series_slice(time)
+        logger.info("Przeliczono %d warstw serii czasowej flood", len(series))
+        self._log_memory("przeliczeniu serii flood")
+        return len(series)
+
+    # --------------- spójne składowe ----------------
+
+    def components(self, scenario: Optional[str] = None) -> Tuple[GraphIndex, np.ndarray, EdgeBitset]:
+        """
+        Etykiety spójnych składowych niezablokowanego grafu, liczone raz
+        na generację grafu i flood (osobno dla każdego scenariusza).
+        """
+        graph_index, labels, blocked, _ = self._components_with_key(scenario)
+        return graph_index, labels, blocked
+
+    def _components_with_key(
+        self, scenario: Optional[str], profile: Optional[str] = None
+    ) -> Tuple[GraphIndex, np.ndarray, EdgeBitset, Tuple]:
+        # z profilem drogi niedostępne dla niego (np. kładka dla samochodu)
+        # rozcinają sieć jak zablokowane – etykiety liczone osobno per profil;
+        # zwracany bitset i klucz dotyczą samego flood
+        graph_index = self.graph_index
+        blocked, key = self.resolve_blocked(scenario)
+        cache_key = key + (profile,)
+
+        with self._components_lock:
+            labels = self._components.get(cache_key)
+            if labels is not None:
+                self._components.move_to_end(cache_key)
+                return graph_index, labels, blocked, key
+
+        impassable = blocked
+        if profile is not None:
+            impassable = blocked.union(graph_index.profile_forbidden[profile])
+        with stage("walkable_graph"):
+            labels = connected_components(graph_index, impassable)
+        logger.info(
+            "Policzono spójne składowe%s: %d składowych, %d węzłów",
+            f" (profil {profile})" if profile else "",
+            int(labels.max()) + 1 if len(labels) else 0,
+            len(labels),
+        )
+
+        with self._components_lock:
+            self._components[cache_key] = labels
+            while len(self._components) > COMPONENTS_CACHE_SIZE:
+                self._components.popitem(last=False)
+
+        return graph_index, labels, blocked, key
+
+    def blocked_edges_export(
+        self, scenario: Optional[str] = None
+    ) -> Tuple[GraphIndex, BlockedEdgesExport, Tuple]:
+        """
+        Zablokowane krawędzie zserializowane raz na generację grafu i flood.
+        Zwraca też klucz generacji (np. do ETag).
+        """
+        graph_index = self.graph_index
+        blocked, key = self.resolve_blocked(scenario)
+
+        with self._blocked_exports_lock:
+            export = self._blocked_exports.get(key)
+            if export is not None:
+                self._blocked_exports.move_to_end(key)
+                return graph_index, export, key
+
+        export = build_blocked_export(graph_index, blocked)
+        logger.info(
+            "Zserializowano %d zablokowanych krawędzi (%d B GeoJSON, %d B binarnie)",
+            len(export.eids), len(export.geojson), len(export.binary),
+        )
+
+        with self._blocked_exports_lock:
+            self._blocked_exports[key] = export
+            while len(self._blocked_exports) > BLOCKED_EXPORT_CACHE_SIZE:
+                self._blocked_exports.popitem(last=False)
+
+        return graph_index, export, key
+
+    # --------------- kafle wektorowe ----------------
+
+    def tile(
+        self, layer: str, z: int, x: int, y: int, scenario: Optional[str] = None
+    ) -> Tuple[bytes, Tuple]:
+        """
+        Kafel warstwy roads / flood / blocked jako GeoJSON przycięty do kafla
+        i uproszczony dla zoomu. Kafle cache'owane są per generacja grafu /
+        flood, więc zwracany jest też klucz generacji (np. do ETag).
+
+        UnknownScenario, jeśli scenariusz nie istnieje.
+        """
+        self.ensure_loaded()
+        blocked = None
+        flood_layer = None
+        if layer == "roads":
+            with self._flood_lock:
+                graph_index = self._graph_index
+                key = ("roads", self.graph_generation)
+        elif layer == "blocked":
+            graph_index = self.graph_index
+            blocked, blocked_key = self.resolve_blocked(scenario)
+            key = ("blocked",) + blocked_key
+        elif layer == "flood":
+            flood_layer, key = self._flood_layer(scenario)
+        else:
+            raise ValueError(f"Nieznana warstwa: {layer}")
+
+        cache_key = key + (z, x, y)
+        with self._tiles_lock:
+            body = self._tiles.get(cache_key)
+            if body is not None:
+                self._tiles.move_to_end(cache_key)
+                return body, key
+
+        bounds = tile_bounds(z, x, y)
+        with stage("tile"):
+            if z < MIN_ZOOM[layer]:
+                body = render_tile(np.empty(0, dtype=object), [], bounds)
+            elif flood_layer is not None:
+                idx = flood_layer.query(bounds)
+                body = render_tile(flood_layer.geoms[idx], ["{}"] * len(idx), bounds)
+            else:
+                eids = graph_index.query_eids([box(*bounds)])
+                if blocked is not None:
+                    eids = eids[blocked.to_mask()[eids]]
+                geoms = np.empty(len(eids), dtype=object)
+                geoms[:] = [graph_index.edge_geoms[eid] for eid in eids.tolist()]
+                if z < FEATURE_ZOOM:
+                    geoms = merge_lines(geoms)
+                    properties = ['{"edges":%d}' % len(eids)]
+                else:
+                    properties = ['{"eid":%d}' % eid for eid in eids.tolist()]
+                body = render_tile(geoms, properties, bounds)
+
+        with self._tiles_lock:
+            self._tiles[cache_key] = body
+            while len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+
+        return body, key
+
+    def _flood_layer(self, scenario: Optional[str]) -> Tuple[PolygonLayer, Tuple]:
+        if scenario is None or scenario == LIVE_SCENARIO:
+            self.refresh_flood()
+            with self._flood_lock:
+                flood = self._flood_gdf
+                # podpis pliku, bo flood_generation rośnie tylko przy zmianie blokad
+                key = ("flood", LIVE_SCENARIO) + tuple(self._flood_signature or ())
+        else:
+            sc = self._get_scenario(scenario)
+            flood = sc.flood
+            key = ("flood", sc.name, sc.generation)
+
+        with self._tiles_lock:
+            layer = self._flood_layers.get(key)
+            if layer is not None:
+                self._flood_layers.move_to_end(key)
+                return layer, key
+
+        gdf = _load_flood_gdf(flood) if flood is not None else None
+        layer = PolygonLayer(gdf.geometry.values if gdf is not None and "geometry" in gdf else [])
+
+        with self._tiles_lock:
+            self._flood_layers[key] = layer
+            while len(self._flood_layers) > FLOOD_LAYER_CACHE_SIZE:
+                self._flood_layers.popitem(last=False)
+
+        return layer, key
+
+    def locate_component(
+        self,
+        point: Tuple[float, float],
+        scenario: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        W której spójnej składowej (po odcięciu zalanych dróg) leży punkt.
+        Składowa 0 to największa sieć; inne numery oznaczają "wyspę".
+        """
+        graph_index, labels, blocked = self.components(scenario)
+        # punkt dociągamy do krawędzi tak samo jak router przy wyznaczaniu trasy
+        snap = graph_index.nearest_edge(point, blocked)
+        if snap is None:
+            return None
+
+        node_id, _ = graph_index.edge_nodes(snap.eid)
+        label = int(labels[node_id])
+        return {
+            "component": label,
+            "component_size": int(np.count_nonzero(labels == label)),
+            "components_count": int(labels.max()) + 1,
+        }
+
+    # --------------- schrony / najbliższy bezpieczny punkt ----------------
+
+    def _load_shelters(self) -> List[Dict[str, Any]]:
+        if self.shelters_path is None or not self.shelters_path.exists():
+            return []
+
+        try:
+            data = json.loads(self.shelters_path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.error("Nie udało się odczytać %s: %s", self.shelters_path, e)
+            return []
+
+        shelters = []
+        for idx, feature in enumerate(data.get("features", [])):
+            geom = feature.get("geometry") or {}
+            if geom.get("type") != "Point":
+                continue
+            lon, lat = geom["coordinates"][:2]
+            name = (feature.get("properties") or {}).get("name") or f"shelter-{idx}"
+            shelters.append({"name": name, "lat": float(lat), "lon": float(lon)})
+
+        logger.info("Wczytano %d schronów z %s", len(shelters), self.shelters_path)
+        return shelters
+
+    def set_shelters(self, shelters: List[Dict[str, Any]]) -> None:
+        """
+        Podmienia listę schronów (i zapisuje ją jako GeoJSON, jeśli
+        skonfigurowano shelters_path). Unieważnia drzewa schronów.
+        """
+        with self._shelter_lock:
+            self.shelters = list(shelters)
+            self._shelters_version += 1
+            self._shelter_trees.clear()
+
+        if self.shelters_path is not None:
+            fc = {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "properties": {"name": sh["name"]},
+                        "geometry": {"type": "Point", "coordinates": [sh["lon"], sh["lat"]]},
+                    }
+                    for sh in self.shelters
+                ],
+            }
+            self.shelters_path.parent.mkdir(parents=True, exist_ok=True)
+            self.shelters_path.write_text(json.dumps(fc, ensure_ascii=False), encoding="utf-8")
+
+    def _shelter_tree(
+        self, scenario: Optional[str]
+    ) -> Tuple[EvacRouter, SearchTree, List[Dict[str, Any]], List[EdgeSnap]]:
+        """
+        Drzewo najkrótszych ścieżek ze wszystkich schronów naraz, liczone raz
+        na generację grafu i flood (osobno dla każdego scenariusza).
+        Schrony dociągane są do krawędzi jak punkty trasy (EvacRouter.snap);
+        zwracane są te, które udało się dociągnąć, i ich punkty na krawędziach
+        (tree.root_of(n) // 2 to pozycje na tych listach).
+        """
+        graph_index = self.graph_index
+        blocked, key = self.resolve_blocked(scenario)
+        key = key + (self._shelters_version,)
+        router = EvacRouter(graph_index.graph, blocked=blocked, index=graph_index)
+
+        with self._shelter_lock:
+            cached = self._shelter_trees.get(key)
+            if cached is not None:
+                self._shelter_trees.move_to_end(key)
+                return (router,) + cached
+            shelters = list(self.shelters)
+
+        snapped = [
+            (sh, graph_index.nearest_edge((sh["lat"], sh["lon"]), blocked))
+            for sh in shelters
+        ]
+        shelters = [sh for sh, snap in snapped if snap is not None]
+        snaps = [snap for _, snap in snapped if snap is not None]
+        tree = router.search_from(snaps)
+        logger.info(
+            "Policzono drzewo schronów (%d schronów, %d węzłów osiągalnych)",
+            len(snaps), tree.settled,
+        )
+
+        with self._shelter_lock:
+            self._shelter_trees[key] = (tree, shelters, snaps)
+            while len(self._shelter_trees) > SHELTER_TREE_CACHE_SIZE:
+                self._shelter_trees.popitem(last=False)
+
+        return router, tree, shelters, snaps
+
+    def route_to_nearest_shelter(
+        self,
+        start: Tuple[float, float],
+        scenario: Optional[str] = None,
+    ) -> Optional[Tuple[LineString, Dict[str, Any]]]:
+        """
+        Trasa z punktu start do najbliższego (po drogach) schronu.
+        Nie uruchamia żadnego przeszukiwania – tylko przejście po drzewie.
+        """
+        if not self.shelters or self.graph.number_of_nodes() == 0:
+            return None
+
+        router, tree, shelters, snaps = self._shelter_tree(scenario)
+
+        snap = router.index.nearest_edge(start, router.blocked)
+        found = router.route_to_tree(tree, snap, snaps) if snap is not None else None
+        if found is None:
+            logger.warning("Żaden schron nie jest osiągalny z %s", start)
+            return None
+
+        route_line, length_m, segments, _, _, shelter_index = found
+        meta = {
+            "length_m": length_m,
+            "segments": segments,
+            "calc_time_ms": 0,
+            "blocked_edges_count": router.blocked.count(),
+            "shelter": shelters[shelter_index],
+        }
+        return route_line, meta
+
+    # --------------- zasięg (izochrona) ----------------
+
+    def reachable_edges(
+        self,
+        start: Tuple[float, float],
+        max_m: float,
+        scenario: Optional[str] = None,
+    ) -> Tuple[Iterator[Tuple[int, LineString]], Dict[str, Any]]:
+        """
+        Krawędzie osiągalne z punktu start w budżecie max_m metrów
+        (z pominięciem krawędzi zablokowanych).
+
+        Przeszukiwanie kończy się na budżecie, więc koszt zależy od wielkości
+        obszaru, a nie całego grafu. Krawędzie na granicy zasięgu są
+        przycinane do przejezdnego fragmentu.
+
+        Zwraca (generator par (eid, geometria), meta z liczbą rozliczonych węzłów).
+        """
+        graph_index = self.graph_index
+        blocked, _ = self.resolve_blocked(scenario)
+
+        meta = {"max_m": max_m, "settled_nodes": 0, "scenario": scenario or LIVE_SCENARIO}
+        if graph_index.node_count == 0:
+            return iter(()), meta
+
+        # start z punktu na krawędzi, jak w EvacRouter – także w środku
+        # długiej (np. ściągniętej) krawędzi
+        snap = graph_index.nearest_edge(start, blocked)
+        if snap is None:
+            return iter(()), meta
+        router = EvacRouter(graph_index.graph, blocked=blocked, index=graph_index)
+        tree = router.search_from([snap], cutoff=max_m)
+        meta["settled_nodes"] = tree.settled
+
+        return self._iter_reachable_edges(graph_index, tree, blocked, max_m, snap), meta
+
+    def _iter_reachable_edges(
+        self,
+        graph_index: GraphIndex,
+        tree: SearchTree,
+        blocked: EdgeBitset,
+        max_m: float,
+        start: EdgeSnap,
+    ) -> Iterator[Tuple[int, LineString]]:
+        # krawędź startowa jest osiągalna, nawet gdy żaden jej koniec nie jest
+        candidates = [start.eid] + [
+            eid for node_id in tree.nodes.tolist() for _, eid in graph_index.adj[node_id]
+        ]
+        seen = set()
+
+        for eid in candidates:
+            if eid in seen or blocked.is_set(eid):
+                continue
+            seen.add(eid)
+
+            geom = graph_index.edge_geoms[eid]
+            length = graph_index.edge_length[eid]
+            if geom is None or length <= 0:
+                continue
+
+            ui, vi = graph_index.edge_nodes(eid)
+
+            # przejezdne przedziały krawędzi [m od u]: od strony u, od strony v
+            # i – na krawędzi startowej – w obie strony od punktu startu
+            spans = []
+            dist_u, dist_v = tree.distance(ui), tree.distance(vi)
+            if dist_u < max_m:
+                spans.append((0.0, max_m - dist_u))
+            if dist_v < max_m:
+                spans.append((length - (max_m - dist_v), length))
+            if eid == start.eid:
+                spans.append((start.offset_m - max_m, start.offset_m + max_m))
+
+            merged: List[List[float]] = []
+            for a, b in sorted((max(a, 0.0), min(b, length)) for a, b in spans):
+                if merged and a <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], b)
+                else:
+                    merged.append([a, b])
+
+            if len(merged) == 1 and merged[0][0] <= 0.0 and merged[0][1] >= length:
+                yield eid, geom
+                continue
+
+            for a, b in merged:
+                if b > a:
+                    yield eid, graph_index.edge_substring(eid, a, b)
+
+    def reachable_hull(
+        self,
+        start: Tuple[float, float],
+        max_m: float,
+        scenario: Optional[str] = None,
+    ):
+        """Otoczka wypukła krawędzi osiągalnych (patrz reachable_edges)."""
+        edges, meta = self.reachable_edges(start, max_m, scenario)
+        lines = [geom for _, geom in edges if geom.geom_type == "LineString"]
+        if not lines:
+            return None, meta
+        return MultiLineString(lines).convex_hull, meta
+
+    # --------------- zapytania wsadowe (many-to-many) ----------------
+
+    def batch_routes(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        scenario: Optional[str] = None,
+        with_geometry: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Trasy / odległości dla wszystkich par (origin, destination).
+
+        Wspólne dla całej paczki są: stan flood (jeden bitset), dociąganie
+        celów do krawędzi (raz, jak w EvacRouter.snap) i przeszukiwanie –
+        jeden Dijkstra "one-to-many" na każdy różny punkt startowy, przerywany
+        po osiągnięciu wszystkich celów z tej samej spójnej składowej.
+        Długości i geometrie są takie same jak z get_route.
+
+        Zwraca generator wierszy (po jednym na origin), żeby duże macierze
+        można było strumieniować bez trzymania całości w pamięci.
+        Wartość None oznacza brak trasy.
+        """
+        # przygotowanie (scenariusz, dociąganie celów) robimy od razu, żeby
+        # błędy (np. UnknownScenario) poleciały przed strumieniowaniem
+        router, _ = self.make_router(scenario)
+        index = router.index
+        dest_snaps = [index.nearest_edge(point, router.blocked) for point in destinations]
+        return self._iter_batch_rows(router, origins, dest_snaps, with_geometry)
+
+    def _iter_batch_rows(
+        self,
+        router: EvacRouter,
+        origins: List[Tuple[float, float]],
+        dest_snaps: List[Optional[EdgeSnap]],
+        with_geometry: bool,
+    ) -> Iterator[Dict[str, Any]]:
+        index, labels = router.index, router.components
+        # niezablokowana krawędź leży w jednej składowej, więc wystarczy u
+        dest_labels = [
+            int(labels[index.edge_nodes(snap.eid)[0]]) if snap is not None else -1
+            for snap in dest_snaps
+        ]
+
+        # trzymamy tylko ostatnie drzewo – kolejne originy dociągnięte do tego
+        # samego punktu go użyją, a pamięć nie rośnie z rozmiarem paczki
+        last_key, tree = None, None
+        for i, point in enumerate(origins):
+            origin = index.nearest_edge(point, router.blocked)
+            label = int(labels[index.edge_nodes(origin.eid)[0]]) if origin is not None else -2
+            # cele z innej składowej na pewno są nieosiągalne – nie szukamy ich
+            dests = [
+                snap if dest_label == label else None
+                for snap, dest_label in zip(dest_snaps, dest_labels)
+            ]
+
+            key = (origin.eid, origin.offset_m) if origin is not None else None
+            if origin is not None and key != last_key:
+                targets = [node for snap in dests if snap is not None for node in index.edge_nodes(snap.eid)]
+                tree = router.search_from([origin], targets=targets)
+                last_key = key
+
+            lengths: List[Optional[float]] = []
+            routes: List[Optional[Dict[str, Any]]] = []
+
+            for dest in dests:
+                found = (
+                    router.route_from_tree(tree, origin, dest, with_geometry)
+                    if dest is not None else None
+                )
+                if found is None:
+                    lengths.append(None)
+                    routes.append(None)
+                    continue
+
+                route_line, length_m, segments, _, _ = found
+                lengths.append(length_m)
+
+                if with_geometry:
+                    routes.append({
+                        "length_m": length_m,
+                        "segments": segments,
+                        "geometry": route_line.__geo_interface__,
+                    })
+
+            row: Dict[str, Any] = {"origin": i, "lengths": lengths}
+            if with_geometry:
+                row["routes"] = routes
+            yield row
+
+    def make_router(
+        self, scenario: Optional[str] = None, profile: Optional[str] = None
+    ) -> Tuple[EvacRouter, int]:
+        """
+        Router dla scenariusza flood i profilu ruchu oraz liczba krawędzi
+        zablokowanych przez flood. Router tylko czyta graf i bitsety,
+        więc można go używać wielokrotnie (np. w trasach wsadowych).
+        """
+        router, blocked_edges_count, _ = self._make_router(scenario, profile)
+        return router, blocked_edges_count
+
+    def _make_router(
+        self, scenario: Optional[str], profile: Optional[str]
+    ) -> Tuple[EvacRouter, int, Tuple]:
+        # jak make_router, plus klucz generacji grafu i flood
+        if profile is not None and profile not in PROFILES:
+            raise ValueError(f"Nieznany profil ruchu: {profile}")
+
+        # 1. Nałóż flood zones (tylko jeśli plik zmienił się od ostatniego razu)
+        graph_index, components, blocked, key = self._components_with_key(scenario, profile)
+        blocked_edges_count = blocked.count()
+        logger.info("Zablokowanych krawędzi grafu: %d", blocked_edges_count)
+
+        # 2. Profil: inna tablica wag nad tym samym grafem; drogi niedostępne
+        #    dla profilu (np. chodniki dla samochodu) omijamy jak zablokowane
+        weights = None
+        if profile is not None:
+            weights = graph_index.profile_weights[profile]
+            blocked = blocked.union(graph_index.profile_forbidden[profile])
+
+        # 3. Router (pary w różnych składowych – także rozdzielone tylko drogami
+        #    niedostępnymi dla profilu – odrzuca bez wyszukiwania)
+        router = EvacRouter(
+            graph_index.graph,
+            blocked=blocked,
+            index=graph_index,
+            components=components,
+            weights=weights,
+        )
+        return router, blocked_edges_count, key
 
     def get_route(
         self,
         start: Tuple[float, float],
         end: Tuple[float, float],
+        scenario: Optional[str] = None,
+        k: int = 1,
+        profile: Optional[str] = None,
     ) -> Optional[Tuple[LineString, Dict[str, Any]]]:
         """
         Główna metoda wołana przez API.
-        """
-        logger.info("Wyznaczanie trasy start=%s end=%s", start, end)
 
-        # 1. Wczytaj flood zones
+        scenario: nazwa scenariusza flood (None = aktualny plik flood).
+        k: liczba tras; przy k > 1 meta["alternatives"] zawiera kolejne
+           trasy alternatywne jako pary (LineString, meta).
+        profile: profil ruchu (foot / car / emergency) – trasa najszybsza
+           dla profilu zamiast najkrótszej, z czasem w meta["duration_s"].
+        """
+        logger.info(
+            "Wyznaczanie trasy start=%s end=%s scenario=%s profile=%s", start, end, scenario, profile
+        )
+        t0 = time.perf_counter()
 
-        blocked_edges_count = mark_blocked_edges(self.graph, self.flood_path)
-        logger.info("Zablokowano %d krawędzi grafu", blocked_edges_count)
+        router, blocked_edges_count, key = self._make_router(scenario, profile)
+        with stage("snap"):
+            snapped = router.snap(start, end)
+        if snapped is None:
+            logger.warning("Nie udało się znaleźć trasy dla zadanych punktów")
+            return None
 
+        # te same dociągnięte punkty przy tym samym grafie i flood dają tę
+        # samą trasę – równoległe identyczne zapytania liczą ją raz
+        s, e = snapped
+        flight_key = (
+            key, profile, k,
+            s.eid, round(s.offset_m, ROUTE_KEY_DECIMALS),
+            e.eid, round(e.offset_m, ROUTE_KEY_DECIMALS),
+        )
 
-        # 3. Router
-        router = EvacRouter(self.graph)
-        result = router.find_route(start, end)
+        def search():
+            if k > 1:
+                return router.find_alternatives(start, end, k=k, snapped=snapped)
+            found = router.find_route(start, end, snapped=snapped)
+            return [found] if found is not None else []
 
-        if result is None:
+        routes, _ = self._route_flights.do(flight_key, search)
+        if not routes:
             logger.warning("Nie udało się znaleźć trasy dla zadanych punktów")
             return None
 
-        route_line, meta = result
+        # meta jest wspólne dla połączonych wywołań – każde dostaje kopię
+        route_line, meta = routes[0]
+        meta = dict(meta)
         meta["blocked_edges_count"] = blocked_edges_count
+        if profile is not None:
+            meta["profile"] = profile
+        # pełny czas: flood + składowe + dociąganie + wyszukiwanie
+        meta["calc_time_ms"] = (time.perf_counter() - t0) * 1000.0
+        if k > 1:
+            meta["alternatives"] = routes[1:]
 
         return route_line, meta
 
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-ROADS_PATH = PROJECT_ROOT / "data" / "roads.geojson"
+# GeoJSON z Overpass albo zrzut .npz (np. z python -m src.core.osm_ingest)
+ROADS_PATH = Path(os.getenv("EVAC_ROADS_PATH", str(PROJECT_ROOT / "data" / "roads.geojson")))
 FLOOD_PATH = PROJECT_ROOT / "data" / "flood.geojson"
 
-evac_service_singleton = EvacService(ROADS_PATH, FLOOD_PATH)
+SHELTERS_PATH = PROJECT_ROOT / "data" / "shelters.geojson"
+FLOOD_SERIES_DIR = PROJECT_ROOT / "data" / "flood_series"
+
+evac_service_singleton = EvacService(ROADS_PATH, FLOOD_PATH, SHELTERS_PATH, FLOOD_SERIES_DIR)
@@ -0,0 +1,370 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.core.graph_snapshot import save_snapshot
+from src.services.evac_service import EvacService, ScenarioStore
+
+logger = logging.getLogger(__name__)
+
+# budżet pamięci na wczytane regiony (bez grafu domyślnego)
+REGION_MEMORY_BUDGET_MB = int(os.getenv("EVAC_REGION_MEMORY_MB", "512"))
+
+# przybliżony koszt w pamięci (graf networkx + geometrie shapely + GraphIndex),
+# zmierzony na syntetycznych sieciach dróg (benchmarks/synthetic.py)
+NODE_BYTES = 450
+EDGE_BYTES = 1300
+
+_REGION_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+BBox = Tuple[float, float, float, float]
+
+
+@dataclass
+class Region:
+    """
+    Region z własnym grafem dróg, stanem flood i indeksami (osobny EvacService).
+
+    Graf regionu jest zawsze zapisany jako zrzut .npz (snapshot_path),
+    więc region wyrzucony z pamięci można szybko wczytać ponownie.
+    """
+    region_id: str
+    bbox: BBox  # (south, west, north, east)
+    snapshot_path: Path
+    nodes: int = 0
+    edges: int = 0
+    service: Optional[EvacService] = None
+    last_used: float = field(default_factory=time.time)
+
+    @property
+    def estimated_bytes(self) -> int:
+        return self.nodes * NODE_BYTES + self.edges * EDGE_BYTES
+
+    @property
+    def area(self) -> float:
+        south, west, north, east = self.bbox
+        return (north - south) * (east - west)
+
+    def contains(self, point: Tuple[float, float]) -> bool:
+        lat, lon = point
+        south, west, north, east = self.bbox
+        return south <= lat <= north and west <= lon <= east
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "region": self.region_id,
+            "bbox": list(self.bbox),
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "loaded": self.service is not None,
+            "estimated_mb": round(self.estimated_bytes / 2**20, 2),
+            "last_used": self.last_used,
+        }
+
+
+class RegionRegistry:
+    """
+    Rejestr grafów regionów (np. różnych miast) obok grafu domyślnego.
+
+    Wczytane regiony trzymane są w kolejności LRU; gdy ich łączny
+    szacowany rozmiar przekracza budżet pamięci, najdawniej używane
+    są zwalniane – zostaje po nich zrzut .npz na dysku, z którego
+    region wczytuje się ponownie przy następnym zapytaniu.
+    Lista regionów (index.json) przetrwa restart aplikacji.
+
+    Serwis zwolnionego regionu (budżet, podmiana, usunięcie) przekazywany
+    jest listenerom zwolnienia, żeby nikt nie trzymał go dalej w pamięci
+    (np. subskrypcje tras – RouteWatcher.drop_service).
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        flood_path: Path,
+        memory_budget_bytes: int = REGION_MEMORY_BUDGET_MB * 2**20,
+        shelters: Optional[List[Dict[str, Any]]] = None,
+        flood_series_dir: Optional[Path] = None,
+        scenario_store: Optional[ScenarioStore] = None,
+    ):
+        self.base_dir = base_dir
+        self.flood_path = flood_path
+        self.flood_series_dir = flood_series_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self._shelters = list(shelters or [])
+        # scenariusze flood wspólne z grafem domyślnym – region liczy
+        # bitset scenariusza przy pierwszym zapytaniu z nim
+        self.scenario_store = scenario_store if scenario_store is not None else ScenarioStore()
+        self._lock = threading.Lock()
+        self._regions: "OrderedDict[str, Region]" = OrderedDict()
+        self._evict_listeners: List[Callable[[EvacService], None]] = []
+        self._load_index()
+
+    # --------------- indeks regionów na dysku ----------------
+
+    @property
+    def _index_path(self) -> Path:
+        return self.base_dir / "index.json"
+
+    def _load_index(self) -> None:
+        if not self._index_path.exists():
+            return
+        try:
+            data = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.error("Nie udało się odczytać %s: %s", self._index_path, e)
+            return
+
+        for item in data.get("regions", []):
+            path = self.base_dir / item["snapshot"]
+            if not path.exists():
+                continue
+            self._regions[item["region"]] = Region(
+                region_id=item["region"],
+                bbox=tuple(item["bbox"]),
+                snapshot_path=path,
+                nodes=item.get("nodes", 0),
+                edges=item.get("edges", 0),
+                last_used=item.get("last_used", 0.0),
+            )
+        logger.info("Wczytano listę %d regionów z %s", len(self._regions), self._index_path)
+
+    def _save_index(self) -> None:
+        data = {
+            "regions": [
+                {
+                    "region": r.region_id,
+                    "bbox": list(r.bbox),
+                    "snapshot": r.snapshot_path.name,
+                    "nodes": r.nodes,
+                    "edges": r.edges,
+                    "last_used": r.last_used,
+                }
+                for r in self._regions.values()
+            ]
+        }
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._index_path.write_text(json.dumps(data), encoding="utf-8")
+
+    # --------------- regiony ----------------
+
+    def snapshot_path(self, region_id: str) -> Path:
+        """Ścieżka zrzutu regionu. ValueError dla niepoprawnego identyfikatora."""
+        if not _REGION_ID_RE.match(region_id):
+            raise ValueError("Identyfikator regionu: 1-64 znaki [A-Za-z0-9_.-]")
+        return self.base_dir / f"{region_id}.npz"
+
+    def put(self, region_id: str, bbox: BBox, geojson: Dict[str, Any]) -> Region:
+        """Tworzy (lub podmienia) region z dróg w GeoJSON i od razu go wczytuje."""
+        path = self.snapshot_path(region_id)
+
+        graph = RoadGraphBuilderWithDict(geojson).build_graph()
+        snapshot_path = save_snapshot(graph, path)
+
+        service = self._new_service(snapshot_path, bbox)
+        service.load_graph(graph)
+
+        region = Region(
+            region_id=region_id,
+            bbox=bbox,
+            snapshot_path=snapshot_path,
+            nodes=graph.number_of_nodes(),
+            edges=graph.number_of_edges(),
+            service=service,
+        )
+        with self._lock:
+            previous = self._regions.get(region_id)
+            released = [previous.service] if previous is not None and previous.service is not None else []
+            self._regions[region_id] = region
+            self._regions.move_to_end(region_id)
+            released += self._evict_over_budget(keep=region_id)
+            self._save_index()
+        self._notify_released(released)
+
+        logger.info(
+            "Region %s: %d węzłów, %d krawędzi (~%.1f MB)",
+            region_id, region.nodes, region.edges, region.estimated_bytes / 2**20,
+        )
+        return region
+
+    def register_snapshot(
+        self, region_id: str, bbox: BBox, snapshot_path: Path, nodes: int, edges: int
+    ) -> Region:
+        """
+        Dopisuje region z gotowego zrzutu (np. z python -m src.core.osm_ingest)
+        bez wczytywania grafu – wczyta się przy pierwszym zapytaniu.
+        """
+        region = Region(
+            region_id=region_id,
+            bbox=bbox,
+            snapshot_path=Path(snapshot_path),
+            nodes=nodes,
+            edges=edges,
+        )
+        with self._lock:
+            previous = self._regions.pop(region_id, None)
+            self._regions[region_id] = region
+            self._save_index()
+        if previous is not None and previous.service is not None:
+            self._notify_released([previous.service])
+        return region
+
+    def get(self, region_id: str) -> EvacService:
+        """Serwis regionu (wczytany ze zrzutu, jeśli był zwolniony). KeyError, jeśli brak."""
+        with self._lock:
+            region = self._regions[region_id]
+            region.last_used = time.time()
+            self._regions.move_to_end(region_id)
+            released = []
+            if region.service is None:
+                logger.info("Wczytuję region %s ze zrzutu %s", region_id, region.snapshot_path)
+                region.service = self._new_service(region.snapshot_path, region.bbox)
+                released = self._evict_over_budget(keep=region_id)
+            service = region.service
+        self._notify_released(released)
+
+        # samo wczytanie grafu (EvacService.ensure_loaded) poza blokadą rejestru
+        service.ensure_loaded()
+        return service
+
+    def find(self, points: Iterable[Tuple[float, float]]) -> Optional[str]:
+        """
+        Region zawierający wszystkie punkty (najmniejszy, jeśli kilka
+        się pokrywa) albo None – wtedy obowiązuje graf domyślny.
+        """
+        points = list(points)
+        with self._lock:
+            candidates = [
+                r for r in self._regions.values()
+                if all(r.contains(p) for p in points)
+            ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda r: r.area).region_id
+
+    def delete(self, region_id: str) -> bool:
+        with self._lock:
+            region = self._regions.pop(region_id, None)
+            if region is None:
+                return False
+            self._save_index()
+        region.snapshot_path.unlink(missing_ok=True)
+        if region.service is not None:
+            self._notify_released([region.service])
+        return True
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r.summary() for r in reversed(self._regions.values())]
+
+    @property
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return sum(r.estimated_bytes for r in self._regions.values() if r.service is not None)
+
+    def set_shelters(self, shelters: List[Dict[str, Any]]) -> None:
+        """Przekazuje nową listę schronów wczytanym regionom (każdy dostaje swoje)."""
+        with self._lock:
+            self._shelters = list(shelters)
+            loaded = [r for r in self._regions.values() if r.service is not None]
+        for region in loaded:
+            region.service.set_shelters(self._shelters_in(region.bbox))
+
+    def refresh_flood(self) -> int:
+        """
+        Nakłada aktualny plik flood na wczytane regiony – po aktualizacji
+        flood, żeby ich listenery (np. subskrypcje tras) dostały zmianę od
+        razu, a nie dopiero przy następnym zapytaniu do regionu.
+        Zwraca łączną liczbę przełączonych krawędzi.
+        """
+        with self._lock:
+            loaded = [(r.region_id, r.service) for r in self._regions.values() if r.service is not None]
+
+        flipped = 0
+        for region_id, service in loaded:
+            try:
+                diff = service.refresh_flood()
+            except Exception:
+                logger.exception("Nie udało się odświeżyć flood w regionie %s", region_id)
+                continue
+            flipped += diff.flipped if diff else 0
+        return flipped
+
+    def add_evict_listener(self, listener: Callable[[EvacService], None]) -> None:
+        """Rejestruje callback wołany z serwisem regionu zwolnionego z pamięci."""
+        self._evict_listeners.append(listener)
+
+    # --------------- pomocnicze ----------------
+
+    def _notify_released(self, services: List[EvacService]) -> None:
+        # wołane poza self._lock – listener może sięgać do rejestru
+        for service in services:
+            for listener in self._evict_listeners:
+                try:
+                    listener(service)
+                except Exception:
+                    logger.exception("Błąd w listenerze zwolnienia regionu")
+
+    def _shelters_in(self, bbox: BBox) -> List[Dict[str, Any]]:
+        south, west, north, east = bbox
+        return [
+            sh for sh in self._shelters
+            if south <= sh["lat"] <= north and west <= sh["lon"] <= east
+        ]
+
+    def _new_service(self, snapshot_path: Path, bbox: BBox) -> EvacService:
+        # flood (i seria czasowa) jest wspólny – poligony poza regionem
+        # po prostu niczego nie blokują
+        service = EvacService(
+            snapshot_path,
+            self.flood_path,
+            flood_series_dir=self.flood_series_dir,
+            scenario_store=self.scenario_store,
+        )
+        service.set_shelters(self._shelters_in(bbox))
+        return service
+
+    def _evict_over_budget(self, keep: str) -> List[EvacService]:
+        # wołane pod self._lock; od najdawniej używanych. Zwraca serwisy
+        # zwolnionych regionów (dla listenerów – po zwolnieniu blokady)
+        released = []
+        used = sum(r.estimated_bytes for r in self._regions.values() if r.service is not None)
+        for region in list(self._regions.values()):
+            if used <= self.memory_budget_bytes:
+                break
+            if region.region_id == keep or region.service is None:
+                continue
+            logger.info(
+                "Zwalniam region %s (~%.1f MB) – przekroczony budżet pamięci %.0f MB",
+                region.region_id, region.estimated_bytes / 2**20, self.memory_budget_bytes / 2**20,
+            )
+            released.append(region.service)
+            region.service = None
+            used -= region.estimated_bytes
+        return released
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+REGIONS_DIR = PROJECT_ROOT / "data" / "regions"
+
+
+def _create_default_registry() -> RegionRegistry:
+    from src.services.evac_service import FLOOD_PATH, FLOOD_SERIES_DIR, evac_service_singleton
+
+    return RegionRegistry(
+        REGIONS_DIR,
+        FLOOD_PATH,
+        shelters=evac_service_singleton.shelters,
+        flood_series_dir=FLOOD_SERIES_DIR,
+        scenario_store=evac_service_singleton.scenario_store,
+    )
+
+
+region_registry_singleton = _create_default_registry()
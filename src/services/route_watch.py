@@ -0,0 +1,240 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Set, Tuple
+
+from src.core.flood_intersector import FloodDiff
+from src.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# górna granica aktywnych subskrypcji (każda to otwarte połączenie SSE)
+MAX_SUBSCRIPTIONS = 1000
+
+ROUTE_RECOMPUTES = counter(
+    "evac_subscription_recomputes_total",
+    "Przeliczenia subskrybowanych tras po zmianie flood (reason: blocked / unblocked / graph)",
+)
+
+Event = Dict[str, Any]
+
+
+@dataclass
+class RouteSubscription:
+    """
+    Aktywna trasa klienta. edge_ids to krawędzie aktualnej trasy –
+    po nich indeks krawędź -> subskrypcje znajduje trasy do przeliczenia.
+    """
+    sub_id: int
+    service: Any  # EvacService
+    start: Tuple[float, float]
+    end: Tuple[float, float]
+    notify: Callable[[Event], None]
+    graph_generation: int = 0
+    edge_ids: FrozenSet[int] = field(default_factory=frozenset)
+
+
+class RouteWatcher:
+    """
+    Subskrypcje tras z powiadamianiem po zmianie flood.
+
+    Po każdej zmianie stanu krawędzi (listener FloodDiff serwisu) przeliczane
+    są tylko trasy, które przechodzą przez nowo zablokowane krawędzie
+    (indeks krawędź -> subskrypcje), oraz subskrypcje bez trasy, gdy jakaś
+    krawędź została odblokowana. Pozostałe trasy nic nie kosztują.
+    Po przeładowaniu grafu (listener grafu serwisu) przeliczane są wszystkie
+    trasy tego serwisu – eid w indeksie odnoszą się do poprzedniego grafu.
+    Przeliczenia idą w osobnym wątku, żeby nie opóźniać aktualizacji flood.
+    Subskrypcje serwisu, który przestaje być używany (region zwolniony
+    z pamięci), są zamykane – drop_service – żeby go nie trzymać przy życiu.
+    """
+
+    def __init__(self, max_subscriptions: int = MAX_SUBSCRIPTIONS):
+        self.max_subscriptions = max_subscriptions
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subs: Dict[int, RouteSubscription] = {}
+        self._by_edge: Dict[int, Set[int]] = {}
+        self._unroutable: Set[int] = set()
+        self._services: Dict[int, Any] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="route-watch")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def subscribe(
+        self,
+        service,
+        start: Tuple[float, float],
+        end: Tuple[float, float],
+        notify: Callable[[Event], None],
+    ) -> RouteSubscription:
+        """
+        Rejestruje trasę i od razu wysyła pierwsze zdarzenie z trasą.
+        RuntimeError, gdy przekroczono limit subskrypcji.
+        """
+        with self._lock:
+            if len(self._subs) >= self.max_subscriptions:
+                raise RuntimeError("Przekroczono limit subskrypcji tras")
+            sub = RouteSubscription(next(self._ids), service, start, end, notify)
+            self._subs[sub.sub_id] = sub
+            if id(service) not in self._services:
+                self._services[id(service)] = service
+                service.add_flood_listener(
+                    lambda diff, service=service: self._executor.submit(self._on_flood_diff, service, diff)
+                )
+                service.add_graph_listener(
+                    lambda generation, service=service: self._on_graph_reload(service, generation)
+                )
+
+        self._recompute(sub, "initial")
+        return sub
+
+    def unsubscribe(self, sub_id: int) -> None:
+        with self._lock:
+            sub = self._subs.pop(sub_id, None)
+            if sub is not None:
+                self._unindex(sub)
+
+    def drop_service(self, service) -> None:
+        """
+        Zamyka subskrypcje serwisu, który przestaje być używany (np. region
+        zwolniony z pamięci), i zapomina o nim. Klient dostaje zdarzenie
+        "closed" – może zasubskrybować trasę ponownie.
+        """
+        with self._lock:
+            self._services.pop(id(service), None)
+            subs = [sub for sub in self._subs.values() if sub.service is service]
+            for sub in subs:
+                del self._subs[sub.sub_id]
+                self._unindex(sub)
+
+        if subs:
+            logger.info("Serwis zwolniony: zamykam %d subskrybowanych tras", len(subs))
+        for sub in subs:
+            sub.notify({"type": "closed", "subscription": sub.sub_id, "reason": "released"})
+
+    def wait_idle(self) -> None:
+        """Czeka, aż zakolejkowane przeliczenia się skończą (np. w testach)."""
+        self._executor.submit(lambda: None).result()
+
+    # --------------- zmiany flood ----------------
+
+    def _on_flood_diff(self, service, diff: FloodDiff) -> None:
+        affected: Dict[int, str] = {}
+        with self._lock:
+            for eid in diff.newly_blocked:
+                for sub_id in self._by_edge.get(eid, ()):
+                    affected[sub_id] = "blocked"
+            if diff.newly_unblocked:
+                for sub_id in self._unroutable:
+                    affected.setdefault(sub_id, "unblocked")
+            subs = [
+                (self._subs[sub_id], reason) for sub_id, reason in affected.items()
+                if sub_id in self._subs and self._subs[sub_id].service is service
+            ]
+
+        if subs:
+            logger.info(
+                "Zmiana flood (%d krawędzi): przeliczam %d z %d subskrybowanych tras",
+                diff.flipped, len(subs), len(self),
+            )
+        for sub, reason in subs:
+            ROUTE_RECOMPUTES.inc(reason=reason)
+            self._recompute(sub, reason)
+
+    def _on_graph_reload(self, service, graph_generation: int) -> None:
+        # wołane w wątku przeładowania: trasy ze starego grafu od razu
+        # wypadają z indeksu (ich eid wskazywałyby teraz inne krawędzie),
+        # a przeliczenie idzie do kolejki jak po zmianie flood
+        with self._lock:
+            subs = [
+                sub for sub in self._subs.values()
+                if sub.service is service and sub.graph_generation != graph_generation
+            ]
+            for sub in subs:
+                self._unindex(sub)
+                sub.edge_ids = frozenset()
+
+        if subs:
+            logger.info("Przeładowano graf: przeliczam %d subskrybowanych tras", len(subs))
+        for sub in subs:
+            self._executor.submit(self._recompute_after_reload, sub)
+
+    def _recompute_after_reload(self, sub: RouteSubscription) -> None:
+        ROUTE_RECOMPUTES.inc(reason="graph")
+        self._recompute(sub, "graph")
+
+    def _recompute(self, sub: RouteSubscription, reason: str) -> None:
+        try:
+            # flood nakładamy przed odczytem generacji – inaczej zmiana
+            # wczytana dopiero w get_route wyglądałaby na równoległą
+            sub.service.refresh_flood()
+            graph_generation = sub.service.graph_generation
+            flood_generation = sub.service.flood_generation
+            result = sub.service.get_route(sub.start, sub.end)
+        except Exception:
+            logger.exception("Nie udało się przeliczyć subskrybowanej trasy %d", sub.sub_id)
+            return
+
+        if result is None:
+            edge_ids: List[int] = []
+            event = {"type": "route", "subscription": sub.sub_id, "reason": reason, "route": None}
+        else:
+            route_line, meta = result
+            edge_ids = meta["edge_ids"]
+            event = {
+                "type": "route",
+                "subscription": sub.sub_id,
+                "reason": reason,
+                "route": {
+                    "type": "Feature",
+                    "geometry": route_line.__geo_interface__,
+                    "properties": {
+                        "length_m": meta["length_m"],
+                        "segments": meta["segments"],
+                    },
+                },
+                "meta": {"blocked_edges_count": meta["blocked_edges_count"]},
+            }
+
+        with self._lock:
+            if sub.sub_id not in self._subs:
+                return  # klient odłączył się w trakcie liczenia
+            self._unindex(sub)
+            sub.graph_generation = graph_generation
+            sub.edge_ids = frozenset(edge_ids)
+            self._index(sub, routable=result is not None)
+
+        sub.notify(event)
+
+        # flood albo graf zmienił się w trakcie liczenia, zanim trasa trafiła
+        # do indeksu – zmiana mogła ją ominąć, więc liczymy jeszcze raz
+        if sub.service.graph_generation != graph_generation:
+            self._executor.submit(self._recompute, sub, "graph")
+        elif sub.service.flood_generation != flood_generation:
+            self._executor.submit(self._recompute, sub, "blocked")
+
+    def _index(self, sub: RouteSubscription, routable: bool) -> None:
+        # wołane pod self._lock
+        for eid in sub.edge_ids:
+            self._by_edge.setdefault(eid, set()).add(sub.sub_id)
+        if not routable:
+            self._unroutable.add(sub.sub_id)
+
+    def _unindex(self, sub: RouteSubscription) -> None:
+        # wołane pod self._lock
+        for eid in sub.edge_ids:
+            subs = self._by_edge.get(eid)
+            if subs is not None:
+                subs.discard(sub.sub_id)
+                if not subs:
+                    del self._by_edge[eid]
+        self._unroutable.discard(sub.sub_id)
+
+
+route_watcher_singleton = RouteWatcher()
+
@@ -6,6 +6,16 @@ from src.main import app
 client = TestClient(app)
 
 
+@pytest.fixture
+def tmp_flood_path(tmp_path, monkeypatch):
+    """Testowy flood trafia do katalogu tymczasowego, nie do data/."""
+    from src.api.routes import get_evac_service
+
+    path = tmp_path / "flood.geojson"
+    monkeypatch.setattr(get_evac_service(), "flood_path", path)
+    return path
+
+
 def test_healthcheck_docs_available():
     """
     Sprawdza, czy aplikacja FastAPI uruchamia sie poprawnie
@@ -23,7 +33,7 @@ def test_update_roads_invalid_payload():
     assert response.status_code in (400, 422)
 
 
-def test_set_test_flood_rect():
+def test_set_test_flood_rect(tmp_flood_path):
     """
     Sprawdza, czy testowy prostokat flood moze zostac wygenerowany.
     """
@@ -36,6 +46,7 @@ def test_set_test_flood_rect():
 
     response = client.post("/api/admin/set-test-flood-rect", json=payload)
     assert response.status_code == 200
+    assert tmp_flood_path.exists()
 
     data = response.json()
     assert "message" in data or "status" in data
@@ -70,3 +81,169 @@ def test_route_with_invalid_params():
     )
 
     assert response.status_code == 422
+
+
+def test_batch_matrix_has_row_per_origin():
+    """
+    Sprawdza, czy endpoint wsadowy zwraca macierz origin x destination.
+    """
+    payload = {
+        "origins": [[52.229, 21.012], [52.230, 21.013]],
+        "destinations": [[52.231, 21.015]],
+    }
+
+    response = client.post("/api/evac/batch", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert len(data["matrix"]) == 2
+    assert all(len(row) == 1 for row in data["matrix"])
+
+
+def test_metrics_exposes_stage_histogram(tmp_flood_path):
+    """
+    Sprawdza, czy /metrics zwraca histogram czasow etapow w formacie Prometheusa.
+    """
+    client.post("/api/admin/set-test-flood-rect", json={
+        "south": 52.20, "west": 20.90, "north": 52.30, "east": 21.00
+    })
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE evac_stage_duration_seconds histogram" in response.text
+
+
+def test_profiled_route_lands_in_ring_buffer(monkeypatch):
+    """
+    Sprawdza, czy przy EVAC_PROFILE=1 zapytanie o trase dostaje profil,
+    ktory mozna pobrac jako plik .prof.
+    """
+    import src.main as main
+
+    monkeypatch.setattr(main, "PROFILE_ALL", True)
+
+    response = client.get("/api/evac/route", params={"start": "52.0,21.0", "end": "52.1,21.1"})
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/api/admin/profiles").json()["profiles"]
+    assert listed[0]["id"] == int(profile_id)
+    assert listed[0]["path"] == "/api/evac/route"
+
+    download = client.get(f"/api/admin/profiles/{profile_id}")
+    assert download.status_code == 200
+    assert download.headers["content-type"] == "application/octet-stream"
+
+
+def test_admin_flag_profiles_route_with_travel_profile(monkeypatch):
+    """
+    Sprawdza, czy flaga administratora ?_profile=1 profiluje zapytanie o trase
+    i nie koliduje z parametrem profile (profil ruchu).
+    """
+    import src.main as main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "PROFILE_ALL", False)
+
+    response = client.get(
+        "/api/evac/route",
+        params={"start": "52.0,21.0", "end": "52.1,21.1", "profile": "car", "_profile": "1"},
+        headers={"X-Admin-Token": "secret"},
+    )
+    assert response.status_code != 422
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/api/admin/profiles", headers={"X-Admin-Token": "secret"}).json()["profiles"]
+    assert listed[0]["id"] == int(profile_id)
+    assert listed[0]["path"] == "/api/evac/route"
+
+
+def test_liveness_and_readiness_after_warmup():
+    """
+    Sprawdza, czy liveness odpowiada od razu, a readiness zwraca 200
+    po wczytaniu grafu w tle (lifespan).
+    """
+    import time
+
+    with TestClient(app) as live_client:
+        assert live_client.get("/health/live").status_code == 200
+
+        deadline = time.time() + 30
+        while live_client.get("/health/ready").status_code != 200:
+            assert time.time() < deadline
+            time.sleep(0.05)
+
+
+def test_blocked_edges_etag_returns_304():
+    """
+    Sprawdza, czy blocked-edges zwraca FeatureCollection z ETagiem,
+    a ponowne zapytanie z If-None-Match konczy sie 304 bez ciala.
+    """
+    response = client.get("/api/debug/blocked-edges")
+    assert response.status_code == 200
+    assert response.json()["type"] == "FeatureCollection"
+
+    etag = response.headers["ETag"]
+    cached = client.get("/api/debug/blocked-edges", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    binary = client.get("/api/debug/blocked-edges", params={"format": "binary", "bbox": "52.2,20.9,52.3,21.0"})
+    assert binary.status_code == 200
+    assert binary.content[:4] == b"EVBE"
+    assert binary.headers["ETag"] != etag
+
+
+def test_tile_endpoint_returns_geojson_and_validates_coords():
+    """
+    Sprawdza, czy kafel warstwy zwraca FeatureCollection,
+    a kafel spoza zakresu zoomu konczy sie bledem 400.
+    """
+    response = client.get("/api/tiles/flood/14/9148/5394")
+    assert response.status_code == 200
+    assert response.json()["type"] == "FeatureCollection"
+    assert "ETag" in response.headers
+
+    response = client.get("/api/tiles/roads/3/9/0")
+    assert response.status_code == 400
+
+
+def test_route_polyline_encoding_rejects_bad_precision():
+    """
+    Sprawdza walidacje parametru precision dla kodowania polyline.
+    """
+    response = client.get(
+        "/api/evac/route",
+        params={"start": "52.229,21.012", "end": "52.231,21.015", "encoding": "polyline", "precision": 9},
+    )
+    assert response.status_code == 422
+
+
+def test_admin_memory_reports_structures():
+    """Raport pamieci ma graf, flood, cache i stan tracemalloc."""
+    response = client.get("/api/admin/memory")
+    assert response.status_code == 200
+
+    data = response.json()
+    for name in ("networkx", "edge_geometries", "graph_index"):
+        assert set(data["graph"][name]) == {"bytes", "bytes_per_node", "bytes_per_edge"}
+    assert "live" in data["flood"] and "components" in data["caches"]
+    assert data["tracemalloc"]["enabled"] in (True, False)
+
+
+def test_unknown_scenario_is_404_but_internal_key_error_is_not(monkeypatch):
+    """
+    Nieznany scenariusz daje 404, a KeyError z wnetrza serwisu nie jest
+    maskowany jako brak scenariusza.
+    """
+    from src.services.evac_service import EvacService
+
+    params = {"start": "52.0,21.0", "end": "52.1,21.1"}
+    response = client.get("/api/evac/route", params={**params, "scenario": "nie-ma-takiego"})
+    assert response.status_code == 404
+
+    def broken(self, *args, **kwargs):
+        return {}["length_m"]
+
+    monkeypatch.setattr(EvacService, "get_route", broken)
+    with pytest.raises(KeyError):
+        client.get("/api/evac/route", params=params)
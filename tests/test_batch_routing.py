@@ -0,0 +1,66 @@
+import io
+import json
+
+import pytest
+
+from benchmarks import synthetic
+from src.core.graph_snapshot import save_snapshot
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.services.batch_routing import run_batch
+from src.services.evac_service import EvacService
+
+
+@pytest.fixture
+def service(tmp_path):
+    roads = synthetic.roads("grid", 400)
+    path = save_snapshot(RoadGraphBuilderWithDict(roads).build_graph(), tmp_path / "roads.npz")
+    svc = EvacService(path, tmp_path / "flood.geojson")
+    svc.ensure_loaded()
+    return svc, synthetic.roads_bbox(roads)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_matches_single_routes(service, workers):
+    """
+    Wyniki wsadowe (takze z pula procesow) sa w kolejnosci wejscia
+    i zgadzaja sie z pojedynczymi trasami; bledny wiersz nie przerywa wsadu.
+    """
+    svc, (south, west, north, east) = service
+    pairs = [
+        ((south + 0.001 * i, west + 0.0005), (north - 0.0005, east - 0.001 * i))
+        for i in range(7)
+    ]
+    lines = [json.dumps({"id": f"p{i}", "start": list(a), "end": f"{b[0]},{b[1]}"}) for i, (a, b) in enumerate(pairs)]
+    lines.insert(3, '{"id": "zly", "start": [1]}')
+
+    router, _ = svc.make_router()
+    out = io.StringIO()
+    stats = run_batch(router, io.StringIO("\n".join(lines)), out, workers=workers, chunk_size=2)
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["id"] for r in results] == ["p0", "p1", "p2", 3, "p3", "p4", "p5", "p6"]
+    assert stats.pairs == 8 and stats.errors == 1 and stats.reachable == 7
+
+    expected = [svc.get_route(a, b)[1] for a, b in pairs]
+    routed = [r for r in results if "error" not in r]
+    for r, meta in zip(routed, expected):
+        assert r["length_m"] == pytest.approx(meta["length_m"], abs=0.01)
+        assert r["segments"] == meta["segments"]
+
+
+def test_batch_csv_roundtrip(service):
+    """
+    CSV na wejsciu daje CSV na wyjsciu z kolumnami wynikow.
+    """
+    svc, (south, west, north, east) = service
+    source = io.StringIO(
+        "id,start_lat,start_lon,end_lat,end_lon\n"
+        f"a,{south + 0.001},{west + 0.001},{north - 0.001},{east - 0.001}\n"
+    )
+    router, _ = svc.make_router(profile="car")
+    out = io.StringIO()
+    run_batch(router, source, out, in_format="csv")
+
+    header, row = out.getvalue().splitlines()
+    assert header == "id,reachable,length_m,segments,duration_s,error"
+    assert row.startswith("a,True,")
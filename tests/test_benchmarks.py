@@ -0,0 +1,50 @@
+import pytest
+
+from benchmarks import synthetic
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.core.osm_to_geojson import osm_to_roads_geojson
+
+
+@pytest.mark.parametrize("layout", synthetic.LAYOUTS)
+def test_synthetic_roads_have_requested_scale(layout):
+    """
+    Syntetyczna siec ma liczbe krawedzi zblizona do zadanej
+    i przechodzi przez osm_to_roads_geojson bez strat.
+    """
+    roads = synthetic.roads(layout, 2000, seed=1)
+    graph = RoadGraphBuilderWithDict(roads).build_graph()
+    assert 0.8 * 2000 <= graph.number_of_edges() <= 1.2 * 2000
+
+    parsed = osm_to_roads_geojson(synthetic.roads_to_osm_xml(roads))
+    assert len(parsed["features"]) == len(roads["features"])
+
+
+def test_synthetic_flood_mask_is_deterministic():
+    a = synthetic.flood_mask((64, 64), seed=3)
+    b = synthetic.flood_mask((64, 64), seed=3)
+    assert (a == b).all()
+    assert 0.05 < a.mean() < 0.3
+
+
+def test_standin_servers_replace_overpass_and_wms(tmp_path):
+    """
+    Zastepcze serwery Overpass i WMS obsluguja pobieranie drog i flood
+    po wstrzyknieciu ich adresow.
+    """
+    from benchmarks import standins
+    from src.core.osm_downloader import download_osm_roads
+    from src.core.sentinel_flood_ogc_client import SentinelOGCConfig, SentinelOGCFloodClient
+
+    bbox = (52.20, 20.95, 52.26, 21.05)
+    with standins.overpass_server(edges=500) as overpass, standins.wms_server() as wms:
+        roads = osm_to_roads_geojson(download_osm_roads(bbox, url=overpass.url))
+        assert roads["features"]
+        south, west, north, east = synthetic.roads_bbox(roads)
+        assert south >= bbox[0] and north <= bbox[2]
+
+        client = SentinelOGCFloodClient(
+            SentinelOGCConfig(instance_id="standin", base_url=wms.url),
+            flood_path=tmp_path / "flood.geojson",
+        )
+        assert client.update_flood_for_bbox(bbox) > 0
+        assert (tmp_path / "flood.geojson").exists()
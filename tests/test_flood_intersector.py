@@ -46,3 +46,69 @@ def test_mark_blocked_edges_does_not_block_when_overlap_too_small():
 
     assert blocked == 0
     assert G.edges[a, b]["blocked"] is False
+
+
+def test_update_blocked_edges_reevaluates_only_changed_region():
+    from src.core.flood_intersector import update_blocked_edges
+    from src.core.graph_index import GraphIndex
+
+    G = nx.Graph()
+
+    # dwie odległe krawędzie: jedna przy lon=0, druga przy lon=100
+    a, b = (0.0, 0.0), (0.0, 10.0)
+    c, d = (0.0, 100.0), (0.0, 110.0)
+    G.add_edge(a, b, geometry=LineString([(0.0, 0.0), (10.0, 0.0)]), blocked=False)
+    G.add_edge(c, d, geometry=LineString([(100.0, 0.0), (110.0, 0.0)]), blocked=False)
+
+    index = GraphIndex(G)
+
+    poly_ab = Polygon([(2.0, -1.0), (8.0, -1.0), (8.0, 1.0), (2.0, 1.0)])
+    old = gpd.GeoDataFrame({"geometry": [poly_ab]}, crs="EPSG:4326")
+
+    first = update_blocked_edges(G, index, None, old)
+    assert first.newly_blocked == [G.edges[a, b]["eid"]]
+
+    # dokładamy poligon tylko przy drugiej krawędzi
+    poly_cd = Polygon([(101.0, -1.0), (109.0, -1.0), (109.0, 1.0), (101.0, 1.0)])
+    new = gpd.GeoDataFrame({"geometry": [poly_ab, poly_cd]}, crs="EPSG:4326")
+
+    diff = update_blocked_edges(G, index, first.flood, new)
+
+    assert diff.changed_polygons == 1
+    assert diff.evaluated_edges == 1
+    assert diff.flipped == 1
+    assert diff.newly_blocked == [G.edges[c, d]["eid"]]
+    assert G.edges[a, b]["blocked"] is True
+    assert G.edges[c, d]["blocked"] is True
+
+
+def test_blocked_export_binary_arrays_are_aligned():
+    """
+    Tablice formatu binarnego zaczynaja sie na granicy 4 B i daja
+    te same eid i wspolrzedne co eksport (odczyt bez kopiowania).
+    """
+    import numpy as np
+
+    from src.core.blocked_export import HEADER_SIZE, build_blocked_export
+    from src.core.edge_bitset import EdgeBitset
+    from src.core.graph_index import GraphIndex
+
+    G = nx.Graph()
+    for i in range(3):
+        u, v = (52.0, 21.0 + i * 0.001), (52.0, 21.001 + i * 0.001)
+        G.add_edge(u, v, geometry=LineString([(u[1], u[0]), (v[1], v[0])]), length_m=68.0)
+    index = GraphIndex(G)
+    export = build_blocked_export(index, EdgeBitset.from_eids(index.edge_count, [0, 2]))
+
+    body = export.binary
+    n = int(np.frombuffer(body, dtype="<u4", count=1, offset=8)[0])
+    assert HEADER_SIZE % 4 == 0 and n == 2
+    eids = np.frombuffer(body, dtype="<u4", count=n, offset=HEADER_SIZE)
+    offsets = np.frombuffer(body, dtype="<u4", count=n + 1, offset=HEADER_SIZE + 4 * n)
+    coords_at = HEADER_SIZE + 8 * n + 4
+    coords = np.frombuffer(body, dtype="<f4", offset=coords_at).reshape(-1, 2)
+
+    assert coords_at % 4 == 0
+    assert eids.tolist() == [0, 2]
+    assert offsets[-1] == len(coords) == 4
+    assert np.allclose(coords, export.coords, atol=1e-5)
@@ -0,0 +1,115 @@
+from datetime import date
+
+import numpy as np
+
+from src.core.flood_series import FloodSeries, new_version_dir, open_series, publish_version, time_slices
+from src.services.evac_service import TIME_SCENARIO_PREFIX, EvacService
+
+
+def _write_series(base_dir, bbox, masks, times):
+    version_dir, generation = new_version_dir(base_dir)
+    stack = FloodSeries.create(version_dir, bbox, masks[0].shape, times, generation)
+    for i, mask in enumerate(masks):
+        FloodSeries.write_mask(stack, i, mask)
+    stack.flush()
+    publish_version(base_dir, version_dir)
+
+
+def test_series_roundtrip_and_time_lookup(tmp_path):
+    """
+    Maski zapisane bitowo (szerokosc niepodzielna przez 8) wracaja bez zmian,
+    a data wybiera przedzial, w ktorym lezy.
+    """
+    rng = np.random.default_rng(0)
+    masks = [rng.random((10, 13)) > 0.5 for _ in range(3)]
+    times = time_slices(date(2024, 5, 1), date(2024, 5, 21), 7)
+    _write_series(tmp_path, (52.0, 21.0, 52.1, 21.1), masks, times)
+
+    series = open_series(tmp_path)
+
+    assert series.times == ["2024-05-01/2024-05-07", "2024-05-08/2024-05-14", "2024-05-15/2024-05-21"]
+    assert series.nbytes == 3 * 10 * 2
+    for i, mask in enumerate(masks):
+        assert np.array_equal(series.mask(i), mask)
+    assert series.index_of("2024-05-09") == 1
+    assert series.index_of("2024-05-15/2024-05-21") == 2
+
+
+def test_time_scenario_selects_series_slice(tmp_path):
+    """
+    Parametr time wybiera warstwe serii: droga zalana w pierwszej
+    warstwie jest zablokowana, w drugiej (sucha) juz nie.
+    """
+    bbox = (52.0, 21.0, 52.01, 21.01)
+    wet = np.zeros((32, 32), dtype=bool)
+    wet[12:20, :] = True
+    _write_series(tmp_path / "series", bbox, [wet, np.zeros_like(wet)], ["2024-05-01/2024-05-07", "2024-05-08/2024-05-14"])
+
+    service = EvacService(tmp_path / "roads.geojson", tmp_path / "flood.geojson", flood_series_dir=tmp_path / "series")
+    service.reload_graph({
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": {},
+            "geometry": {"type": "LineString", "coordinates": [[21.001, 52.005], [21.009, 52.005]]},
+        }],
+    })
+
+    blocked, key = service.resolve_blocked(TIME_SCENARIO_PREFIX + "2024-05-03")
+    assert blocked.count() == 1
+    assert key[1] == TIME_SCENARIO_PREFIX + "2024-05-01/2024-05-07"
+
+    dry, _ = service.resolve_blocked(TIME_SCENARIO_PREFIX + "2024-05-10")
+    assert dry.count() == 0
+
+
+def test_parallel_series_versions_do_not_collide(tmp_path):
+    """
+    Dwa rownolegle pobrania dostaja rozne katalogi, a starsza wersja
+    opublikowana po nowszej nie cofa "current".
+    """
+    bbox = (52.0, 21.0, 52.1, 21.1)
+    first_dir, first = new_version_dir(tmp_path)
+    second_dir, second = new_version_dir(tmp_path)
+    assert first_dir != second_dir and second == first + 1
+
+    for version_dir, generation, value in ((first_dir, first, False), (second_dir, second, True)):
+        stack = FloodSeries.create(version_dir, bbox, (4, 4), ["2024-05-01"], generation)
+        FloodSeries.write_mask(stack, 0, np.full((4, 4), value))
+        stack.flush()
+
+    assert publish_version(tmp_path, second_dir)
+    assert not publish_version(tmp_path, first_dir)
+
+    series = open_series(tmp_path)
+    assert series.generation == second
+    assert series.mask(0).all()
+
+
+def test_failed_series_fetch_leaves_no_version_dir(tmp_path, monkeypatch):
+    """
+    Blad pobierania jednej warstwy usuwa niedokonczony katalog wersji,
+    a opublikowana wczesniej seria zostaje aktualna.
+    """
+    import pytest
+    from PIL import Image
+
+    from src.core.sentinel_flood_ogc_client import SentinelOGCConfig, SentinelOGCFloodClient
+
+    bbox = (52.0, 21.0, 52.1, 21.1)
+    _write_series(tmp_path, bbox, [np.zeros((4, 4), dtype=bool)], ["2024-05-01"])
+    published = open_series(tmp_path).generation
+
+    def fetch(self, bbox, time=None):
+        if time == "2024-05-08":
+            raise RuntimeError("WMS niedostepny")
+        return Image.new("RGBA", (512, 512))
+
+    monkeypatch.setattr(SentinelOGCFloodClient, "_fetch_wms_png", fetch)
+    client = SentinelOGCFloodClient(SentinelOGCConfig(instance_id="test"), tmp_path / "flood.geojson")
+
+    with pytest.raises(RuntimeError):
+        client.fetch_time_series(bbox, ["2024-05-01", "2024-05-08"], tmp_path, max_workers=1)
+
+    assert [p.name for p in tmp_path.iterdir() if p.is_dir()] == [f"{published:06d}"]
+    assert open_series(tmp_path).generation == published
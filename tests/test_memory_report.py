@@ -0,0 +1,77 @@
+import json
+import tracemalloc
+
+import pytest
+from shapely.geometry import LineString
+
+from benchmarks import synthetic
+from src.core import memory_report
+from src.core.memory_report import deep_sizeof, geometry_bytes, trace_diffs, traced
+from src.services.evac_service import EvacService
+
+
+@pytest.fixture
+def service(tmp_path):
+    roads = synthetic.roads("grid", 2000)
+    svc = EvacService(tmp_path / "roads.geojson", tmp_path / "flood.geojson")
+    svc.reload_graph(roads)
+    (tmp_path / "flood.geojson").write_text(
+        json.dumps(synthetic.flood_polygons(synthetic.roads_bbox(roads), count=5)), encoding="utf-8"
+    )
+    return svc, synthetic.roads_bbox(roads)
+
+
+def test_report_covers_graph_flood_and_caches(service):
+    """
+    Raport ma bajty kazdej struktury grafu, a suma na wezel / krawedz
+    odtwarza calosc; flood i cache rosna po ich uzyciu.
+    """
+    svc, (south, west, north, east) = service
+    report = svc.memory_report()
+    graph = report["graph"]
+    assert graph["nodes"] > 0 and graph["edges"] > 0
+
+    parts = [graph[name] for name in ("networkx", "edge_geometries", "graph_index")]
+    assert all(part["bytes"] > 0 for part in parts)
+    assert graph["total_bytes"] == pytest.approx(sum(part["bytes"] for part in parts), abs=3)
+    assert graph["total_bytes"] == pytest.approx(
+        graph["bytes_per_node"] * graph["nodes"] + graph["bytes_per_edge"] * graph["edges"], rel=1e-3
+    )
+    assert report["flood"]["live"]["polygons"] == 0
+
+    svc.refresh_flood()
+    svc.get_route((south + 0.001, west + 0.001), (north - 0.001, east - 0.001))
+    report = svc.memory_report()
+    assert report["flood"]["live"]["polygons"] == 5
+    assert report["flood"]["total_bytes"] > 0
+    assert report["caches"]["components"]["entries"] == 1
+    assert report["caches"]["total_bytes"] > 0
+    assert report["total_bytes"] == (
+        graph["total_bytes"] + report["flood"]["total_bytes"] + report["caches"]["total_bytes"]
+    )
+
+
+def test_size_estimates():
+    line = LineString([(0, 0), (1, 1), (2, 0)])
+    assert geometry_bytes([line, None]) == memory_report.GEOS_GEOM_BYTES + 3 * memory_report.GEOS_COORD_BYTES
+
+    shared = [1.5] * 10
+    # elementy wspolne liczone raz
+    assert deep_sizeof({"a": shared, "b": shared}) < deep_sizeof({"a": shared, "b": list(shared)})
+
+
+def test_traced_records_allocation_diff():
+    """Diff tracemalloc pokazuje, co operacja zaalokowala; sledzenie jest wylaczane."""
+    with traced("test_alloc", enabled=True):
+        kept = [float(i) for i in range(200_000)]
+
+    diff = trace_diffs()[0]
+    assert diff["operation"] == "test_alloc"
+    assert diff["size_diff_bytes"] > 200_000 * 24
+    assert any("test_memory_report.py" in entry["where"] for entry in diff["top"])
+    assert not tracemalloc.is_tracing()
+    assert len(kept) == 200_000
+
+    with traced("disabled", enabled=False):
+        pass
+    assert trace_diffs()[0]["operation"] == "test_alloc"
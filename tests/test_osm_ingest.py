@@ -0,0 +1,59 @@
+import bz2
+import gzip
+
+import pytest
+
+from benchmarks import synthetic
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.core.graph_snapshot import load_snapshot
+from src.core.osm_ingest import ingest_osm_extract
+from src.core.osm_to_geojson import osm_to_roads_geojson
+
+
+@pytest.mark.parametrize("suffix, opener", [(".osm", open), (".osm.gz", gzip.open), (".osm.bz2", bz2.open)])
+def test_ingest_matches_overpass_graph(tmp_path, suffix, opener):
+    """
+    Zrzut z wyciagu (takze skompresowanego) daje ten sam graf,
+    co sciezka Overpass -> GeoJSON -> RoadGraphBuilder.
+    """
+    osm_xml = synthetic.roads_to_osm_xml(synthetic.roads("grid", 300))
+    extract = tmp_path / f"extract{suffix}"
+    with opener(extract, "wb") as f:
+        f.write(osm_xml.encode("utf-8"))
+
+    result = ingest_osm_extract(extract, tmp_path / "roads.npz")
+
+    expected = RoadGraphBuilderWithDict(osm_to_roads_geojson(osm_xml)).build_graph()
+    G = load_snapshot(result.path)
+    assert set(G.nodes) == set(expected.nodes)
+    assert G.number_of_edges() == expected.number_of_edges() == result.edges
+    for u, v, data in expected.edges(data=True):
+        assert G.edges[u, v]["length_m"] == pytest.approx(data["length_m"])
+        assert G.edges[u, v].get("highway") == data.get("highway")
+
+
+def test_ingest_skips_non_routable_ways_and_clips_to_bbox(tmp_path):
+    """
+    Drogi planowane (highway=proposed) i place (area=yes) sa pomijane,
+    a z bbox zostaja tylko odcinki w srodku.
+    """
+    extract = tmp_path / "extract.osm"
+    extract.write_text(
+        '<?xml version="1.0"?><osm version="0.6">'
+        '<node id="1" lat="52.0" lon="21.0"/><node id="2" lat="52.0" lon="21.001"/>'
+        '<node id="3" lat="52.0" lon="21.002"/><node id="4" lat="52.001" lon="21.0"/>'
+        '<node id="5" lat="52.0" lon="21.5"/>'
+        '<way id="1"><nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="5"/><tag k="highway" v="residential"/></way>'
+        '<way id="2"><nd ref="1"/><nd ref="4"/><tag k="highway" v="proposed"/></way>'
+        '<way id="3"><nd ref="2"/><nd ref="4"/><nd ref="1"/><nd ref="2"/>'
+        '<tag k="highway" v="pedestrian"/><tag k="area" v="yes"/></way>'
+        '<way id="4"><nd ref="4"/><nd ref="99"/><tag k="highway" v="footway"/></way>'
+        "</osm>",
+        encoding="utf-8",
+    )
+
+    result = ingest_osm_extract(extract, tmp_path / "roads.npz", bbox=(51.9, 20.9, 52.1, 21.1))
+
+    G = load_snapshot(result.path)
+    assert set(G.edges) == {((52.0, 21.0), (52.0, 21.001)), ((52.0, 21.001), (52.0, 21.002))}
+    assert result.ways == 2
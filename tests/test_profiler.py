@@ -0,0 +1,59 @@
+import asyncio
+
+from src.core.profiler import RequestProfiler
+
+
+def _other_request_work():
+    return sum(range(1000))
+
+
+def test_async_profile_skips_other_coroutines():
+    """Profil endpointu async nie obejmuje innych korutyn dzialajacych w trakcie jego await."""
+    profiler = RequestProfiler()
+
+    async def handler():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def other_request():
+        for _ in range(5):
+            _other_request_work()
+            await asyncio.sleep(0.005)
+
+    wrapped = profiler.wrap(handler)
+
+    async def main():
+        with profiler.session("POST", "/api/admin/update-roads", "") as profile:
+            result, _ = await asyncio.gather(wrapped(), other_request())
+        return result, profile
+
+    result, profile = asyncio.run(main())
+
+    assert result == "ok"
+    functions = {name for _, _, name in profile.stats}
+    assert "handler" in functions
+    assert "_other_request_work" not in functions
+
+
+def test_concurrent_async_profiles_are_separate():
+    """Dwa rownolegle profilowane zapytania async dostaja osobne profile."""
+    profiler = RequestProfiler()
+
+    async def handler(delay):
+        await asyncio.sleep(delay)
+        return delay
+
+    wrapped = profiler.wrap(handler)
+
+    async def one(delay):
+        with profiler.session("POST", "/api/admin/update-roads", "") as profile:
+            return await wrapped(delay=delay), profile
+
+    async def main():
+        return await asyncio.gather(one(0.02), one(0.03))
+
+    results = asyncio.run(main())
+
+    assert [delay for delay, _ in results] == [0.02, 0.03]
+    assert all(profile.stats for _, profile in results)
+    assert len(profiler.summaries()) == 2
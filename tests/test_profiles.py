@@ -0,0 +1,107 @@
+import pytest
+
+from src.core.graph_builder import RoadGraphBuilderWithDict, contract_degree2_chains
+from src.core.graph_index import GraphIndex
+from src.core.graph_snapshot import load_snapshot, save_snapshot
+from src.core.profiles import parse_maxspeed
+from src.core.router import EvacRouter
+
+
+def _road(coords, highway, maxspeed=None):
+    properties = {"highway": highway}
+    if maxspeed is not None:
+        properties["maxspeed"] = maxspeed
+    return {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in coords]},
+    }
+
+
+# z a do c: krotka sciezka piesza przez b albo dluzsza droga przez d
+A, B, C, D = (52.0, 21.0), (52.0, 21.002), (52.0, 21.004), (52.002, 21.002)
+ROADS = {
+    "type": "FeatureCollection",
+    "features": [
+        _road([A, B, C], "footway"),
+        _road([A, D, C], "primary", "70"),
+    ],
+}
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("50", 50.0), ("30 mph", pytest.approx(48.28, abs=0.01)), ("PL:urban", 50.0),
+    ("50;70", 50.0), ("none", None), (None, None),
+])
+def test_parse_maxspeed(value, expected):
+    """
+    maxspeed z OSM: liczby, mph, limity strefowe i kilka wartosci.
+    """
+    assert parse_maxspeed(value) == expected
+
+
+def test_profiles_choose_different_routes_on_same_graph():
+    """
+    Pieszy idzie krotka sciezka, samochod jedzie dluzsza droga
+    (sciezka jest dla niego niedostepna) – na tym samym GraphIndex.
+    """
+    G = RoadGraphBuilderWithDict(ROADS).build_graph()
+    index = GraphIndex(G)
+
+    def route(profile=None):
+        weights = index.profile_weights[profile] if profile else None
+        blocked = index.profile_forbidden[profile] if profile else None
+        return EvacRouter(G, blocked=blocked, index=index, weights=weights).find_route(A, C)[1]
+
+    shortest, foot, car = route(), route("foot"), route("car")
+    assert foot["length_m"] == pytest.approx(shortest["length_m"])
+    assert car["length_m"] > foot["length_m"]
+    assert car["duration_s"] == pytest.approx(car["length_m"] * 3.6 / 70)
+    assert foot["duration_s"] == pytest.approx(foot["length_m"] * 3.6 / 5)
+    assert "duration_s" not in shortest
+
+
+def test_snapshot_and_contraction_keep_road_class(tmp_path):
+    """
+    Klasa drogi przetrwa zrzut .npz, a sciaganie lancuchow nie skleja
+    odcinkow o roznej klasie.
+    """
+    features = [_road([A, B], "residential"), _road([B, C], "primary", "70")]
+    G = RoadGraphBuilderWithDict({"type": "FeatureCollection", "features": features}).build_graph()
+
+    G2 = load_snapshot(save_snapshot(G, tmp_path / "g.npz"))
+    assert G2.edges[B, C]["highway"] == "primary"
+    assert G2.edges[B, C]["maxspeed"] == 70.0
+    assert "maxspeed" not in G2.edges[A, B]
+
+    H = contract_degree2_chains(G2)
+    assert H.number_of_edges() == 2
+
+
+def test_car_pair_split_by_footway_is_rejected_without_search(tmp_path, monkeypatch):
+    """
+    Dwie drogi polaczone tylko kladka piesza: pieszy dostaje trase,
+    a dla samochodu para odpada na skladowych, bez wyszukiwania.
+    """
+    from src.services.evac_service import EvacService
+
+    west, east = (52.0, 21.0), (52.0, 21.01)
+    roads = {
+        "type": "FeatureCollection",
+        "features": [
+            _road([(52.0, 20.99), west], "primary", "50"),
+            _road([west, east], "footway"),
+            _road([east, (52.0, 21.02)], "primary", "50"),
+        ],
+    }
+    svc = EvacService(tmp_path / "roads.geojson", tmp_path / "flood.geojson")
+    svc.load_graph(RoadGraphBuilderWithDict(roads).build_graph())
+    start, end = (52.0001, 20.995), (52.0001, 21.015)
+
+    assert svc.get_route(start, end, profile="foot") is not None
+
+    def no_search(self, *args, **kwargs):
+        raise AssertionError("wyszukiwanie nie powinno ruszyc")
+
+    monkeypatch.setattr(EvacRouter, "_search", no_search)
+    assert svc.get_route(start, end, profile="car") is None
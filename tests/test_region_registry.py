@@ -0,0 +1,161 @@
+import pytest
+from shapely.geometry import LineString
+
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.core.graph_snapshot import load_snapshot, save_snapshot
+from src.services.region_registry import RegionRegistry
+
+
+def _roads(lon0, lat0, n=5):
+    """Prosta droga z n odcinkow zaczynajaca sie w (lon0, lat0)."""
+    coords = [[lon0 + i * 0.001, lat0] for i in range(n + 1)]
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": coords}}
+        ],
+    }
+
+
+def test_snapshot_roundtrip_keeps_graph(tmp_path):
+    """
+    Graf wczytany ze zrzutu .npz ma te same wezly, dlugosci i geometrie.
+    """
+    G = RoadGraphBuilderWithDict(_roads(21.0, 52.0)).build_graph()
+    G.add_edge((52.0, 21.0), (52.001, 21.0), length_m=111.0,
+               geometry=LineString([(21.0, 52.0), (21.0005, 52.0005), (21.0, 52.001)]), blocked=True)
+
+    G2 = load_snapshot(save_snapshot(G, tmp_path / "g.npz"))
+
+    assert set(G2.nodes) == set(G.nodes)
+    assert G2.number_of_edges() == G.number_of_edges()
+    for u, v, data in G.edges(data=True):
+        other = G2.edges[u, v]
+        assert other["length_m"] == data["length_m"]
+        assert other["geometry"].equals(data["geometry"])
+        assert other["blocked"] is False
+
+
+def test_registry_evicts_lru_region_and_reloads_from_snapshot(tmp_path):
+    """
+    Przy budzecie na jeden region wczytanie drugiego zwalnia pierwszy,
+    a zapytanie do zwolnionego regionu wczytuje go ze zrzutu.
+    """
+    registry = RegionRegistry(tmp_path / "regions", tmp_path / "flood.geojson", memory_budget_bytes=1)
+
+    registry.put("a", (51.99, 20.99, 52.01, 21.01), _roads(21.0, 52.0))
+    registry.put("b", (53.99, 17.99, 54.01, 18.01), _roads(18.0, 54.0))
+
+    loaded = {r["region"]: r["loaded"] for r in registry.summaries()}
+    assert loaded == {"a": False, "b": True}
+
+    assert registry.find([(52.0, 21.001), (52.0, 21.004)]) == "a"
+    assert registry.find([(52.0, 21.001), (54.0, 18.001)]) is None
+
+    service = registry.get("a")
+    result = service.get_route((52.0, 21.0), (52.0, 21.005))
+    assert result is not None
+    assert {r["region"]: r["loaded"] for r in registry.summaries()} == {"a": True, "b": False}
+
+    # lista regionow przetrwa ponowne utworzenie rejestru
+    reopened = RegionRegistry(tmp_path / "regions", tmp_path / "flood.geojson")
+    assert {r["region"] for r in reopened.summaries()} == {"a", "b"}
+
+
+def test_scenarios_are_shared_with_regions(tmp_path):
+    """
+    Scenariusz dodany w serwisie domyslnym dziala w regionach – takze
+    wczytanych pozniej – a jego usuniecie znika wszedzie.
+    """
+    from src.services.evac_service import EvacService
+
+    default = EvacService(tmp_path / "roads.geojson", tmp_path / "flood.geojson")
+    default.load_graph(RoadGraphBuilderWithDict(_roads(18.0, 54.0)).build_graph())
+    registry = RegionRegistry(
+        tmp_path / "regions", tmp_path / "flood.geojson", scenario_store=default.scenario_store
+    )
+    registry.put("a", (51.99, 20.99, 52.01, 21.01), _roads(21.0, 52.0))
+
+    # zalany srodek drogi regionu a
+    ring = [[21.0021, 51.999], [21.0029, 51.999], [21.0029, 52.001], [21.0021, 52.001], [21.0021, 51.999]]
+    flood = {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}],
+    }
+    default.set_scenario("wave", flood)
+    assert [sc["name"] for sc in default.list_scenarios()] == ["wave"]
+
+    region = registry.get("a")
+    assert region.get_route((52.0, 21.0), (52.0, 21.005)) is not None
+    assert region.get_route((52.0, 21.0), (52.0, 21.005), scenario="wave") is None
+
+    registry.put("b", (53.99, 17.99, 54.01, 18.01), _roads(18.0, 54.0))
+    assert registry.get("b").resolve_blocked("wave")[0].count() == 0
+
+    default.delete_scenario("wave")
+    with pytest.raises(KeyError):
+        region.resolve_blocked("wave")
+
+
+def _write_flood(path, west, south, east, north):
+    import json
+
+    ring = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+    path.write_text(json.dumps({
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}],
+    }), encoding="utf-8")
+
+
+def test_flood_refresh_reaches_region_subscribers(tmp_path):
+    """
+    Po aktualizacji flood rejestr odswieza wczytane regiony, wiec subskrybent
+    trasy w regionie dostaje zmiane bez zapytania do regionu.
+    """
+    from src.services.route_watch import RouteWatcher
+
+    flood_path = tmp_path / "flood.geojson"
+    registry = RegionRegistry(tmp_path / "regions", flood_path)
+    registry.put("a", (51.99, 20.99, 52.01, 21.01), _roads(21.0, 52.0))
+
+    watcher = RouteWatcher()
+    events = []
+    watcher.subscribe(registry.get("a"), (52.0, 21.0), (52.0, 21.005), events.append)
+    assert events[0]["route"] is not None
+
+    _write_flood(flood_path, 21.0021, 51.999, 21.0029, 52.001)
+    assert registry.refresh_flood() == 1
+    watcher.wait_idle()
+
+    assert [e["reason"] for e in events] == ["initial", "blocked"]
+    assert events[1]["route"] is None
+
+
+def test_evicted_region_closes_subscriptions_and_is_freed(tmp_path):
+    """
+    Zwolnienie regionu z pamieci zamyka jego subskrypcje (zdarzenie closed),
+    a watcher nie trzyma juz serwisu regionu.
+    """
+    import gc
+    import weakref
+
+    from src.services.route_watch import RouteWatcher
+
+    registry = RegionRegistry(tmp_path / "regions", tmp_path / "flood.geojson", memory_budget_bytes=1)
+    watcher = RouteWatcher()
+    registry.add_evict_listener(watcher.drop_service)
+
+    registry.put("a", (51.99, 20.99, 52.01, 21.01), _roads(21.0, 52.0))
+    service = registry.get("a")
+    events = []
+    watcher.subscribe(service, (52.0, 21.0), (52.0, 21.005), events.append)
+    watcher.wait_idle()
+    service_ref = weakref.ref(service)
+    del service
+
+    registry.put("b", (53.99, 17.99, 54.01, 18.01), _roads(18.0, 54.0))
+
+    assert [e["type"] for e in events] == ["route", "closed"]
+    assert len(watcher) == 0
+    gc.collect()
+    assert service_ref() is None
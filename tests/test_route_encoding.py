@@ -0,0 +1,29 @@
+from shapely.geometry import LineString
+
+from src.core.route_encoding import decode_polyline, encode_polyline, simplify_line
+
+
+def test_polyline_matches_reference_encoding():
+    """
+    Sprawdza kodowanie na przykladzie z dokumentacji algorytmu
+    (precyzja 5) i dekodowanie z powrotem.
+    """
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+    text = encode_polyline(points)
+
+    assert text == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline(text) == points
+
+
+def test_simplify_line_keeps_ends_and_drops_small_wiggles():
+    """
+    Sprawdza, czy Douglas-Peucker w metrach usuwa zalamania mniejsze
+    od tolerancji, a zostawia konce trasy.
+    """
+    # odchylenie srodkowego punktu ok. 1 m
+    line = LineString([(21.0, 52.0), (21.001, 52.00001), (21.002, 52.0)])
+
+    assert len(simplify_line(line, 0.5).coords) == 3
+    simplified = simplify_line(line, 5.0)
+    assert list(simplified.coords) == [(21.0, 52.0), (21.002, 52.0)]
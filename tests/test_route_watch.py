@@ -0,0 +1,111 @@
+import json
+
+from src.services.evac_service import EvacService
+from src.services.route_watch import RouteWatcher
+
+
+def _line(*coords):
+    return {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": list(coords)}}
+
+
+def _write_flood(path, west, south, east, north):
+    ring = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+    path.write_text(json.dumps({
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}],
+    }), encoding="utf-8")
+
+
+def test_flood_update_recomputes_only_routes_on_blocked_edges(tmp_path):
+    """
+    Zalanie odcinka trasy A wysyla jej nowa trase objazdem,
+    a trasa B (na innej drodze) nie jest przeliczana.
+    """
+    flood_path = tmp_path / "flood.geojson"
+    service = EvacService(tmp_path / "roads.geojson", flood_path)
+    service.reload_graph({
+        "type": "FeatureCollection",
+        "features": [
+            # trasa A: krotko przez (21.001, 52.0) albo objazdem przez (21.001, 52.001)
+            _line([21.0, 52.0], [21.001, 52.0], [21.002, 52.0]),
+            _line([21.0, 52.0], [21.001, 52.001], [21.002, 52.0]),
+            # trasa B: osobna droga dalej na polnoc
+            _line([21.0, 52.01], [21.001, 52.01], [21.002, 52.01]),
+        ],
+    })
+
+    watcher = RouteWatcher()
+    events_a, events_b = [], []
+    watcher.subscribe(service, (52.0, 21.0), (52.0, 21.002), events_a.append)
+    watcher.subscribe(service, (52.01, 21.0), (52.01, 21.002), events_b.append)
+    assert [e["reason"] for e in events_a] == ["initial"]
+
+    # zalewamy srodek krotkiej drogi trasy A
+    _write_flood(flood_path, 21.0008, 51.9998, 21.0012, 52.0002)
+    service.refresh_flood()
+    watcher.wait_idle()
+
+    assert [e["reason"] for e in events_a] == ["initial", "blocked"]
+    assert events_a[1]["route"]["properties"]["length_m"] > events_a[0]["route"]["properties"]["length_m"]
+    assert [e["reason"] for e in events_b] == ["initial"]
+
+
+def test_graph_reload_recomputes_subscriptions_without_flood_change(tmp_path):
+    """
+    Przeladowanie grafu przelicza trasy od razu (bez zmiany flood), a indeks
+    krawedzi wskazuje potem krawedzie nowego grafu.
+    """
+    flood_path = tmp_path / "flood.geojson"
+    service = EvacService(tmp_path / "roads.geojson", flood_path)
+    service.reload_graph({
+        "type": "FeatureCollection",
+        "features": [_line([21.0, 52.0], [21.001, 52.0], [21.002, 52.0])],
+    })
+
+    watcher = RouteWatcher()
+    events = []
+    watcher.subscribe(service, (52.0, 21.0), (52.0, 21.002), events.append)
+
+    # nowy graf: ta sama droga i objazd – eid krawedzi sa inne
+    service.reload_graph({
+        "type": "FeatureCollection",
+        "features": [
+            _line([21.0, 52.0], [21.001, 52.001], [21.002, 52.0]),
+            _line([21.0, 52.0], [21.001, 52.0], [21.002, 52.0]),
+        ],
+    })
+    watcher.wait_idle()
+    assert [e["reason"] for e in events] == ["initial", "graph"]
+
+    # zalanie krotkiej drogi nowego grafu trafia w te subskrypcje
+    _write_flood(flood_path, 21.0008, 51.9998, 21.0012, 52.0002)
+    service.refresh_flood()
+    watcher.wait_idle()
+
+    assert [e["reason"] for e in events] == ["initial", "graph", "blocked"]
+    assert events[2]["route"]["properties"]["length_m"] > events[1]["route"]["properties"]["length_m"]
+
+
+def test_flood_refresh_swaps_bitset_instead_of_mutating(tmp_path):
+    """
+    Zmiana flood daje nowy bitset z nowa generacja; bitset pobrany wczesniej
+    (np. przez trwajace zapytanie) zostaje w stanie poprzedniej generacji.
+    """
+    flood_path = tmp_path / "flood.geojson"
+    service = EvacService(tmp_path / "roads.geojson", flood_path)
+    service.reload_graph({
+        "type": "FeatureCollection",
+        "features": [_line([21.0, 52.0], [21.001, 52.0], [21.002, 52.0])],
+    })
+
+    before, key_before = service.resolve_blocked()
+    assert before.count() == 0
+
+    _write_flood(flood_path, 21.0008, 51.9998, 21.0012, 52.0002)
+    service.refresh_flood()
+    after, key_after = service.resolve_blocked()
+
+    assert after is not before
+    assert before.count() == 0
+    assert after.count() == 1
+    assert key_after != key_before
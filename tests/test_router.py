@@ -1,4 +1,5 @@
 import networkx as nx
+import pytest
 from shapely.geometry import LineString
 
 from src.core.router import EvacRouter
@@ -27,3 +28,166 @@ def test_router_returns_length_m_sum():
     route_line, meta = res
     assert meta["length_m"] == 123.0
     assert meta["segments"] == 1
+
+
+def test_router_respects_blocked_bitset_without_touching_graph():
+    from src.core.edge_bitset import EdgeBitset
+    from src.core.graph_index import GraphIndex
+
+    G = nx.Graph()
+
+    # dwie drogi z a do c: krótka przez b i dłuższa przez d
+    a, b, c, d = (52.0, 21.0), (52.0, 21.001), (52.0, 21.002), (52.001, 21.001)
+    for u, v, length in [(a, b, 10.0), (b, c, 10.0), (a, d, 30.0), (d, c, 30.0)]:
+        G.add_edge(
+            u, v,
+            length_m=length,
+            geometry=LineString([(u[1], u[0]), (v[1], v[0])]),
+            blocked=False,
+        )
+
+    index = GraphIndex(G)
+    blocked = EdgeBitset.from_eids(index.edge_count, [G.edges[a, b]["eid"]])
+
+    route_line, meta = EvacRouter(G, blocked=blocked).find_route(a, c)
+
+    assert meta["length_m"] == 60.0
+    assert meta["blocked_edges_count"] == 1
+    assert G.edges[a, b]["blocked"] is False
+
+    # bez bitsetu graf nadal daje krótką trasę
+    _, meta_live = EvacRouter(G).find_route(a, c)
+    assert meta_live["length_m"] == 20.0
+
+
+def test_router_snaps_to_edge_on_contracted_graph():
+    from src.core.graph_builder import contract_degree2_chains
+
+    G = nx.Graph()
+
+    # jedna droga z trzema punktami pośrednimi: po ściągnięciu to 1 krawędź
+    nodes = [(52.0, 21.0 + i * 0.001) for i in range(5)]
+    for u, v in zip(nodes, nodes[1:]):
+        G.add_edge(
+            u, v,
+            length_m=10.0,
+            geometry=LineString([(u[1], u[0]), (v[1], v[0])]),
+            blocked=False,
+        )
+
+    H = contract_degree2_chains(G)
+    assert H.number_of_edges() == 1
+    assert H.edges[nodes[0], nodes[4]]["length_m"] == 40.0
+
+    # punkty w połowie pierwszego i trzeciego odcinka, lekko obok drogi
+    start = (52.0001, 21.0005)
+    end = (51.9999, 21.0025)
+
+    for graph in (G, H):
+        route_line, meta = EvacRouter(graph).find_route(start, end)
+        assert abs(meta["length_m"] - 20.0) < 1e-6
+        assert abs(route_line.coords[0][0] - 21.0005) < 1e-9
+        assert abs(route_line.coords[-1][0] - 21.0025) < 1e-9
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_contraction_keeps_all_roads(seed):
+    """Sciaganie lancuchow nie gubi drog: ta sama suma dlugosci i pokrycie geometrii."""
+    import random
+
+    from shapely.ops import unary_union
+
+    from src.core.graph_builder import contract_degree2_chains
+
+    # losowo przerzedzona siatka 10x10 – dużo łańcuchów i równoległych dróg
+    rng = random.Random(seed)
+    G = nx.Graph()
+    for i in range(10):
+        for j in range(10):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di >= 10 or j + dj >= 10 or rng.random() < 0.35:
+                    continue
+                u = (52.0 + i * 0.001, 21.0 + j * 0.001)
+                v = (52.0 + (i + di) * 0.001, 21.0 + (j + dj) * 0.001)
+                G.add_edge(
+                    u, v,
+                    length_m=100.0,
+                    geometry=LineString([(u[1], u[0]), (v[1], v[0])]),
+                    blocked=False,
+                )
+
+    H = contract_degree2_chains(G)
+
+    def total_length(graph):
+        return sum(data["length_m"] for _, _, data in graph.edges(data=True))
+
+    assert total_length(H) == pytest.approx(total_length(G))
+    covered = unary_union([data["geometry"] for _, _, data in H.edges(data=True)])
+    for u, v, data in G.edges(data=True):
+        assert data["geometry"].difference(covered).length < 1e-9, (u, v)
+
+
+def test_router_alternatives_are_distinct_routes():
+    G = nx.Graph()
+
+    # dwie rozłączne drogi z a do c: przez b (20 m) i przez d (24 m)
+    a, b, c, d = (52.0, 21.0), (52.0, 21.001), (52.0, 21.002), (52.001, 21.001)
+    for u, v, length in [(a, b, 10.0), (b, c, 10.0), (a, d, 12.0), (d, c, 12.0)]:
+        G.add_edge(
+            u, v,
+            length_m=length,
+            geometry=LineString([(u[1], u[0]), (v[1], v[0])]),
+            blocked=False,
+        )
+
+    routes = EvacRouter(G).find_alternatives(a, c, k=3)
+
+    assert [meta["length_m"] for _, meta in routes] == [20.0, 24.0]
+    assert (21.001, 52.001) in list(routes[1][0].coords)
+
+
+def test_service_endpoints_agree_with_route_on_contracted_graph(tmp_path, monkeypatch):
+    """
+    Trasy wsadowe, trasa do schronu, zasieg i skladowe dociagaja punkty
+    do krawedzi jak get_route – takze na grafie ze sciagnietymi lancuchami.
+    """
+    import random
+
+    from benchmarks import synthetic
+    from src.core.graph_builder import RoadGraphBuilderWithDict
+    from src.services import evac_service
+    from src.services.evac_service import EvacService
+
+    monkeypatch.setattr(evac_service, "CONTRACT_DEGREE2", True)
+    roads = synthetic.roads("rural", 600)
+    svc = EvacService(tmp_path / "roads.geojson", tmp_path / "flood.geojson")
+    svc.load_graph(RoadGraphBuilderWithDict(roads).build_graph())
+
+    rng = random.Random(0)
+    south, west, north, east = synthetic.roads_bbox(roads)
+    points = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(6)]
+    origins, destinations = points[:3], points[3:]
+
+    rows = list(svc.batch_routes(origins, destinations, with_geometry=True))
+    for origin, row in zip(origins, rows):
+        for dest, length, route in zip(destinations, row["lengths"], row["routes"]):
+            result = svc.get_route(origin, dest)
+            assert (result is None) == (length is None)
+            if result is None:
+                continue
+            line, meta = result
+            assert length == pytest.approx(meta["length_m"], rel=1e-9)
+            assert list(route["geometry"]["coordinates"]) == list(line.coords)
+
+    origin, shelter = origins[0], destinations[0]
+    svc.set_shelters([{"name": "S", "lat": shelter[0], "lon": shelter[1]}])
+    line, meta = svc.route_to_nearest_shelter(origin)
+    expected_line, expected = svc.get_route(origin, shelter)
+    assert meta["length_m"] == pytest.approx(expected["length_m"], rel=1e-9)
+    assert len(line.coords) == len(expected_line.coords)
+
+    # zasieg z punktu w srodku dlugiej krawedzi zawiera jej okolice
+    edges, _ = svc.reachable_edges(origin, 50.0)
+    snap = svc.graph_index.nearest_edge(origin, svc.live_blocked)
+    assert snap.eid in {eid for eid, _ in edges}
+    assert svc.locate_component(origin)["component"] == 0
@@ -0,0 +1,87 @@
+import networkx as nx
+from shapely.geometry import LineString
+
+from src.core.edge_bitset import EdgeBitset
+from src.core.graph_index import GraphIndex
+from src.core.search import multi_source_dijkstra
+
+
+def _line_graph():
+    G = nx.Graph()
+    nodes = [(52.0, 21.0 + i * 0.001) for i in range(5)]
+    for u, v in zip(nodes, nodes[1:]):
+        G.add_edge(
+            u, v,
+            length_m=10.0,
+            geometry=LineString([(u[1], u[0]), (v[1], v[0])]),
+            blocked=False,
+        )
+    return G, nodes
+
+
+def test_multi_source_dijkstra_assigns_nearest_source():
+    G, nodes = _line_graph()
+    index = GraphIndex(G)
+
+    sources = [(index.node_ids[nodes[0]], 0.0), (index.node_ids[nodes[4]], 0.0)]
+    tree = multi_source_dijkstra(index, sources)
+
+    mid = index.node_ids[nodes[1]]
+    assert tree.distance(mid) == 10.0
+    assert tree.root_of(mid) == 0
+
+    node_ids, eids = tree.path_to_root(index.node_ids[nodes[3]])
+    assert node_ids == [index.node_ids[nodes[3]], index.node_ids[nodes[4]]]
+    assert len(eids) == 1
+
+
+def test_multi_source_dijkstra_skips_blocked_edges():
+    G, nodes = _line_graph()
+    index = GraphIndex(G)
+
+    blocked = EdgeBitset.from_eids(index.edge_count, [G.edges[nodes[1], nodes[2]]["eid"]])
+    tree = multi_source_dijkstra(index, [(index.node_ids[nodes[0]], 0.0)], blocked=blocked)
+
+    assert tree.reachable(index.node_ids[nodes[1]])
+    assert not tree.reachable(index.node_ids[nodes[2]])
+
+
+def test_multi_source_dijkstra_stops_at_cutoff():
+    G, nodes = _line_graph()
+    index = GraphIndex(G)
+
+    tree = multi_source_dijkstra(index, [(index.node_ids[nodes[0]], 0.0)], cutoff=15.0)
+
+    assert tree.settled == 2
+    assert not tree.reachable(index.node_ids[nodes[2]])
+
+
+def test_multi_source_dijkstra_tree_holds_only_settled_nodes():
+    """Drzewo przy cutoff / celach ma tablice tylko dla rozliczonych wezlow, nie dla calego grafu."""
+    G, nodes = _line_graph()
+    index = GraphIndex(G)
+    start = index.node_ids[nodes[0]]
+
+    tree = multi_source_dijkstra(index, [(start, 0.0)], targets=[index.node_ids[nodes[1]]])
+
+    assert tree.nodes.tolist() == [start, index.node_ids[nodes[1]]]
+    assert len(tree.dist) == len(tree.pred_node) == len(tree.root) == tree.settled == 2
+    far = index.node_ids[nodes[4]]
+    assert tree.distance(far) == float("inf")
+    assert tree.root_of(far) == -1
+    assert tree.path_to_root(far) == ([far], [])
+
+
+def test_connected_components_split_by_blocked_edge():
+    from src.core.search import connected_components
+
+    G, nodes = _line_graph()
+    index = GraphIndex(G)
+
+    # blokada krawędzi 3-4 odcina ostatni węzeł od reszty
+    blocked = EdgeBitset.from_eids(index.edge_count, [G.edges[nodes[3], nodes[4]]["eid"]])
+    labels = connected_components(index, blocked)
+
+    assert labels[index.node_ids[nodes[0]]] == 0
+    assert labels[index.node_ids[nodes[3]]] == 0
+    assert labels[index.node_ids[nodes[4]]] == 1
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks import synthetic
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.core.graph_snapshot import save_snapshot
+from src.core.single_flight import COALESCED, SingleFlight, bbox_key
+from src.services.evac_service import EvacService
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "przekroczono czas oczekiwania"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_computation():
+    """Rownolegle wywolania z tym samym kluczem licza wynik raz."""
+    flight = SingleFlight("test_shared")
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"value": 42}
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "k", compute)]
+        # pozostali dolaczaja, gdy pierwszy liczy
+        _wait_for(lambda: flight.in_flight() == 1)
+        futures += [pool.submit(flight.do, "k", compute) for _ in range(3)]
+        _wait_for(lambda: COALESCED.value(kind="test_shared") == 3)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r[0] is results[0][0] for r in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert COALESCED.value(kind="test_shared") == 3
+    assert flight.in_flight() == 0
+
+    # po zakonczeniu klucz jest wolny – kolejne wywolanie liczy od nowa
+    assert flight.do("k", compute) == ({"value": 42}, False)
+    assert len(calls) == 2
+
+
+def test_error_propagates_to_waiting_callers():
+    """Wyjatek lidera dostaja tez czekajacy; nowe wywolanie liczy ponownie."""
+    flight = SingleFlight("test_error")
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("WMS niedostepny")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, "k", fail)]
+        _wait_for(lambda: flight.in_flight() == 1)
+        futures += [pool.submit(flight.do, "k", fail) for _ in range(2)]
+        _wait_for(lambda: COALESCED.value(kind="test_error") == 2)
+        release.set()
+        for f in futures:
+            with pytest.raises(RuntimeError):
+                f.result()
+
+    assert flight.in_flight() == 0
+    assert flight.do("k", lambda: 1) == (1, False)
+
+
+def test_different_keys_are_independent():
+    flight = SingleFlight("test_keys")
+    results = [flight.do(key, lambda key=key: key * 2) for key in (1, 2)]
+    assert results == [(2, False), (4, False)]
+    assert COALESCED.value(kind="test_keys") == 0
+
+
+def test_bbox_key_normalizes_precision():
+    assert bbox_key((52.1, 21.0, 52.2, 21.1)) == bbox_key((52.1000001, 21.0, 52.2, 21.0999999))
+    assert bbox_key((52.1, 21.0, 52.2, 21.1)) != bbox_key((52.1, 21.0, 52.2, 21.2))
+
+
+def test_identical_route_requests_coalesce(tmp_path, monkeypatch):
+    """
+    Rownolegle zapytania o te sama trase (punkty dociagniete do tego samego
+    miejsca) licza wyszukiwanie raz; kazde dostaje wlasne meta.
+    """
+    from src.core.router import EvacRouter
+
+    roads = synthetic.roads("grid", 400)
+    path = save_snapshot(RoadGraphBuilderWithDict(roads).build_graph(), tmp_path / "roads.npz")
+    svc = EvacService(path, tmp_path / "flood.geojson")
+    svc.ensure_loaded()
+    south, west, north, east = synthetic.roads_bbox(roads)
+    start, end = (south + 0.0005, west + 0.0005), (north - 0.0005, east - 0.0005)
+
+    searches = []
+    barrier = threading.Barrier(4, timeout=5)
+    original = EvacRouter.find_route
+
+    def slow_find_route(self, *args, **kwargs):
+        searches.append(1)
+        # lider czeka, az pozostali dolacza do lotu
+        _wait_for(lambda: COALESCED.value(kind="route") - before == 3)
+        return original(self, *args, **kwargs)
+
+    before = COALESCED.value(kind="route")
+    monkeypatch.setattr(EvacRouter, "find_route", slow_find_route)
+
+    def request(_):
+        barrier.wait()
+        return svc.get_route(start, end)
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(request, range(4)))
+
+    assert len(searches) == 1
+    assert COALESCED.value(kind="route") - before == 3
+    lines = {id(line) for line, _ in results}
+    assert len(lines) == 1
+    metas = [meta for _, meta in results]
+    assert len({id(m) for m in metas}) == 4
+    assert all(m["length_m"] == metas[0]["length_m"] for m in metas)
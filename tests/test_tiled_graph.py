@@ -0,0 +1,102 @@
+import json
+import random
+
+import pytest
+
+from benchmarks import synthetic
+from src.core.graph_builder import RoadGraphBuilderWithDict
+from src.core.graph_index import GraphIndex
+from src.core.graph_snapshot import load_snapshot, save_snapshot
+from src.core.flood_intersector import compute_blocked_bitset
+from src.core.router import EvacRouter
+from src.core.tiled_graph import MANIFEST_FILE, TiledGraph, TiledRouter, build_tiles, is_tiled
+
+TILE_DEG = 0.004
+
+
+@pytest.fixture
+def tiled(tmp_path):
+    roads = synthetic.roads("grid", 1500)
+    snapshot = save_snapshot(RoadGraphBuilderWithDict(roads).build_graph(), tmp_path / "roads.npz")
+    manifest = build_tiles(snapshot, tmp_path / "tiles", tile_deg=TILE_DEG)
+    return tmp_path / "tiles", load_snapshot(snapshot), synthetic.roads_bbox(roads), manifest
+
+
+def _pairs(bbox, count, seed=0):
+    rng = random.Random(seed)
+    south, west, north, east = bbox
+
+    def point():
+        return rng.uniform(south, north), rng.uniform(west, east)
+
+    return [(point(), point()) for _ in range(count)]
+
+
+def test_tiles_cover_graph_with_stitched_boundaries(tiled):
+    """Kazda krawedz jest w kaflu swoich koncow; krawedzie graniczne w dwoch."""
+    path, G, _, manifest = tiled
+    assert is_tiled(path)
+    assert json.loads((path / MANIFEST_FILE).read_text())["edges"] == G.number_of_edges()
+    assert len(manifest["tiles"]) > 4
+
+    boundary = sum(tile["boundary_edges"] for tile in manifest["tiles"])
+    stored = sum(tile["edges"] for tile in manifest["tiles"])
+    assert boundary > 0
+    assert stored == G.number_of_edges() + boundary // 2
+
+
+def test_tiled_routes_match_in_memory_router(tiled):
+    """
+    Trasy po kaflach (takze przez granice kafli i przy LRU mniejszym niz
+    liczba kafli) maja te sama dlugosc co trasy EvacRouter na calym grafie.
+    """
+    path, G, bbox, manifest = tiled
+    router = EvacRouter(G)
+    graph = TiledGraph(path, max_tiles=3)
+    tiled_router = TiledRouter(graph)
+
+    for start, end in _pairs(bbox, 15):
+        expected = router.find_route(start, end)
+        result = tiled_router.find_route(start, end)
+        assert (result is None) == (expected is None)
+        if expected is None:
+            continue
+        line, meta = result
+        assert meta["length_m"] == pytest.approx(expected[1]["length_m"], rel=1e-9)
+        assert line.length == pytest.approx(expected[0].length, rel=1e-6)
+        assert graph.resident_tiles <= 3
+
+    assert graph.loads > len(manifest["tiles"]) / 2
+
+
+def test_short_route_loads_only_nearby_tiles(tiled):
+    """Krotka trasa wczytuje tylko kafle wokol startu i celu."""
+    path, _, (south, west, north, east), manifest = tiled
+    graph = TiledGraph(path)
+    lat, lon = (south + north) / 2, (west + east) / 2
+
+    _, meta = TiledRouter(graph).find_route((lat, lon), (lat + 0.001, lon + 0.001), with_geometry=False)
+    assert meta["tiles_loaded"] == graph.resident_tiles < len(manifest["tiles"]) / 2
+    assert meta["segments"] > 0
+
+
+def test_flood_blocks_same_edges_as_graph_index(tiled):
+    """Blokady flood z kafli = blokady z GraphIndex; trasy je omijaja."""
+    path, G, bbox, _ = tiled
+    flood = synthetic.flood_polygons(bbox, count=6, coverage=0.1)
+    index = GraphIndex(G)
+    expected = compute_blocked_bitset(index, flood)
+
+    graph = TiledGraph(path, max_tiles=4)
+    blocked = graph.blocked_bitset(flood)
+    assert blocked.count() == expected.count() > 0
+
+    router = EvacRouter(G, blocked=expected, index=index)
+    tiled_router = TiledRouter(graph, blocked)
+    for start, end in _pairs(bbox, 10, seed=1):
+        expected_route = router.find_route(start, end)
+        result = tiled_router.find_route(start, end, with_geometry=False)
+        assert (result is None) == (expected_route is None)
+        if result is not None:
+            assert result[1]["length_m"] == pytest.approx(expected_route[1]["length_m"], rel=1e-9)
+            assert not any(blocked.is_set(eid) for eid in result[1]["edge_ids"])
@@ -0,0 +1,31 @@
+import json
+
+import numpy as np
+from shapely.geometry import LineString
+
+from src.core.tiles import merge_lines, render_tile, tile_bounds
+
+
+def test_tile_clips_and_merges_lines():
+    """
+    Sprawdza, czy linie sa przycinane do kafla, a przy laczeniu
+    odcinki stykajace sie koncami tworza jedna linie.
+    """
+    west, south, east, north = tile_bounds(14, 9148, 5394)
+    lat = (south + north) / 2
+    dx = (east - west) / 4
+
+    # dwa odcinki w jednej linii, drugi wychodzi daleko poza kafel
+    geoms = np.empty(2, dtype=object)
+    geoms[:] = [
+        LineString([(west + dx, lat), (west + 2 * dx, lat)]),
+        LineString([(west + 2 * dx, lat), (east + 10 * dx, lat)]),
+    ]
+
+    tile = json.loads(render_tile(merge_lines(geoms), ['{"edges":2}'], (west, south, east, north)))
+
+    assert len(tile["features"]) == 1
+    coords = tile["features"][0]["geometry"]["coordinates"]
+    assert tile["features"][0]["geometry"]["type"] == "LineString"
+    assert len(coords) == 2
+    assert coords[-1][0] < east + dx